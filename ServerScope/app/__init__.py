@@ -1,7 +1,6 @@
 # __init__.py(app): Initialize the Flask app and extensions4
 import os
 from flask import Flask, render_template
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager, current_user
 from dotenv import load_dotenv
@@ -9,14 +8,19 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize extensions globally, but don't bind them to the app yet
-db = SQLAlchemy()
+# Initialize extensions globally, but don't bind them to the app yet; the models own the database
+from app.models import db
 migrate = Migrate()
 login_manager = LoginManager()
 
-def create_app():
-    """Factory function to create and configure the Flask app."""
-    app = Flask(__name__)
+def create_app(test_config=None):
+    """
+    Factory function to create and configure the Flask app.
+    - test_config: Optional settings applied over the defaults before the extensions are
+      bound, e.g. an in-memory SQLALCHEMY_DATABASE_URI for tests.
+    """
+    # Templates and static files live next to run.py, outside the package
+    app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
     # General configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'mysecretkey')  # For secure session management
@@ -55,6 +59,9 @@ def create_app():
         else:  # Default to SQLite if no DB_TYPE is provided or unknown DB_TYPE
             app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///serverscope.db'
 
+    if test_config:
+        app.config.update(test_config)
+
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
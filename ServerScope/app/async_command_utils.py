@@ -0,0 +1,288 @@
+# async_command_utils.py
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.command_utils import CommandExecutor, LINUX_OS_TYPES, WINDOWS_OS_TYPES
+from app.connection_pool import _credential_digest
+from app.fingerprint_utils import transport_for
+from app.health_utils import HealthCollector
+
+try:
+    import asyncssh
+except ImportError:  # Only required when the asyncio backend is used
+    asyncssh = None
+
+ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', 1000))
+ASYNC_MAX_CHANNELS_PER_HOST = int(os.getenv('ASYNC_MAX_CHANNELS_PER_HOST', 8))  # stay under sshd MaxSessions
+ASYNC_WINRM_THREADS = int(os.getenv('ASYNC_WINRM_THREADS', 16))
+ASYNC_IDLE_TIMEOUT = int(os.getenv('ASYNC_IDLE_TIMEOUT', 300))  # seconds
+ASYNC_EVICT_INTERVAL = int(os.getenv('ASYNC_EVICT_INTERVAL', 60))  # seconds between idle connection sweeps
+SSH_CONNECT_TIMEOUT = int(os.getenv('SSH_CONNECT_TIMEOUT', 10))  # seconds
+
+
+class _AsyncSSHConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.last_used = time.monotonic()
+        self.channels = asyncio.Semaphore(ASYNC_MAX_CHANNELS_PER_HOST)
+
+
+class AsyncCommandExecutor:
+    def __init__(self, max_concurrency=ASYNC_MAX_CONCURRENCY, connect_timeout=SSH_CONNECT_TIMEOUT,
+                 idle_timeout=ASYNC_IDLE_TIMEOUT, winrm_threads=ASYNC_WINRM_THREADS):
+        """
+        asyncio counterpart of CommandExecutor. SSH sessions are multiplexed on one
+        event loop through asyncssh, with one shared connection per (host, port, username)
+        and password.
+        pywinrm has no asyncio API, so WinRM calls run on a small bounded thread pool.
+        - max_concurrency: Maximum number of commands in flight at once.
+        - connect_timeout: Seconds allowed for connecting and authenticating.
+        - idle_timeout: Seconds an unused SSH connection is kept open.
+        - winrm_threads: Threads used for blocking WinRM calls.
+        """
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._connections = {}  # (host, port, username, credential digest) -> _AsyncSSHConnection
+        self._connect_locks = {}  # key -> asyncio.Lock, only while a connection is open or being opened
+        self._winrm_executor = ThreadPoolExecutor(max_workers=winrm_threads, thread_name_prefix='winrm')
+
+    async def _get_connection(self, host, port, username, password):
+        """Return the shared connection for a host, connecting on first use."""
+        if asyncssh is None:
+            raise RuntimeError("The asyncio backend requires the 'asyncssh' package.")
+        key = (host, port, username, _credential_digest(password))
+        lock = self._connect_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                entry = self._connections.get(key)
+                if entry is None:
+                    conn = await asyncio.wait_for(
+                        asyncssh.connect(host, port=port, username=username, password=password,
+                                         known_hosts=None, keepalive_interval=30),
+                        timeout=self.connect_timeout
+                    )
+                    entry = _AsyncSSHConnection(conn)
+                    self._connections[key] = entry
+        finally:
+            self._forget_lock(key)
+        entry.last_used = time.monotonic()
+        return key, entry
+
+    def _forget_lock(self, key):
+        """Drop the connect lock of a key with no connection and nobody waiting on it."""
+        lock = self._connect_locks.get(key)
+        if lock is not None and key not in self._connections and not lock.locked():
+            del self._connect_locks[key]
+
+    def _drop_connection(self, key, entry):
+        if self._connections.get(key) is entry:
+            del self._connections[key]
+        self._forget_lock(key)
+        entry.conn.close()
+
+    async def _start_process(self, server_ip, port, username, password, command):
+        """
+        Start a command on the shared connection. A reused connection may have died since its
+        last use, so failing to open the channel is retried once on a fresh connection; nothing
+        has run on the server at that point.
+        - Returns: The connection entry (whose channel slot the caller must release) and the process.
+        """
+        for attempt in range(2):
+            key, entry = await self._get_connection(server_ip, port, username, password)
+            await entry.channels.acquire()
+            try:
+                return entry, await entry.conn.create_process(command)
+            except (asyncssh.ChannelOpenError, asyncssh.ConnectionLost, ConnectionError):
+                entry.channels.release()
+                self._drop_connection(key, entry)
+                if attempt:
+                    raise
+            except BaseException:
+                entry.channels.release()
+                raise
+
+    async def execute_ssh_command(self, server_ip, username, password, command, port=22, timeout=None):
+        """
+        Execute a command on a Linux server via SSH without blocking the event loop. Once the
+        command has started it is never sent again, even if the connection drops.
+        """
+        async with self._semaphore:
+            try:
+                entry, process = await self._start_process(server_ip, port, username, password, command)
+                try:
+                    result = await process.wait(check=False, timeout=timeout)
+                finally:
+                    process.close()
+                    entry.channels.release()
+                output = result.stdout or ''
+                error = result.stderr or ''
+                if error:
+                    return f"Error: {error}"
+                return output
+            except asyncio.TimeoutError:
+                return f"Error connecting to {server_ip} via SSH: timed out"
+            except Exception as e:
+                return f"Error connecting to {server_ip} via SSH: {str(e)}"
+
+    async def execute_winrm_command(self, server_ip, username, password, command):
+        """Execute a command on a Windows server via WinRM on the bounded thread pool"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._winrm_executor, CommandExecutor.execute_winrm_command,
+                                              server_ip, username, password, command)
+
+    async def execute_command(self, server_ip, username, password, command, os_type, timeout=None):
+        """Execute a command over SSH or WinRM depending on the server's os_type (see CommandExecutor.execute_command)."""
+        os_type = (os_type or '').lower()
+        transport = transport_for(server_ip)
+        if os_type in LINUX_OS_TYPES or (os_type not in WINDOWS_OS_TYPES and transport == 'ssh'):
+            return await self.execute_ssh_command(server_ip, username, password, command, timeout=timeout)
+        if os_type in WINDOWS_OS_TYPES or transport in ('winrm', 'winrm-https'):
+            return await self.execute_winrm_command(server_ip, username, password, command)
+        return "Error: Unsupported or unrecognized OS. Please check the server configuration."
+
+    async def get_server_health(self, server_ip, username, password, os_type='Linux', timeout=None):
+        """
+        Collect health metrics via SSH, or WinRM for Windows servers.
+        - Returns: A health record dictionary (see HealthCollector.parse).
+        """
+        command = HealthCollector.command_for(os_type)
+        if (os_type or '').lower() in WINDOWS_OS_TYPES:
+            output = await self.execute_winrm_command(server_ip, username, password, command)
+        else:
+            output = await self.execute_ssh_command(server_ip, username, password, command, timeout=timeout)
+        return HealthCollector.parse(output, os_type)
+
+    async def get_fleet_health(self, servers):
+        """
+        Run health checks on many servers concurrently.
+        - servers: Iterable of (server_id, server_ip, username, password, os_type) tuples.
+        - Returns: A dictionary mapping server_id to its health record.
+        """
+        servers = list(servers)
+        outputs = await asyncio.gather(*(self.get_server_health(ip, username, password, os_type=os_type)
+                                         for _, ip, username, password, os_type in servers))
+        return {server[0]: output for server, output in zip(servers, outputs)}
+
+    async def evict_idle(self):
+        """Close SSH connections that have not been used within the idle timeout."""
+        now = time.monotonic()
+        expired = [(key, entry) for key, entry in self._connections.items()
+                   if now - entry.last_used > self.idle_timeout]
+        for key, entry in expired:
+            self._drop_connection(key, entry)
+        return len(expired)
+
+    async def close(self):
+        """Close every SSH connection."""
+        for key, entry in list(self._connections.items()):
+            self._drop_connection(key, entry)
+
+
+class SyncCommandExecutor:
+    def __init__(self, executor=None, evict_interval=ASYNC_EVICT_INTERVAL):
+        """
+        Blocking facade over AsyncCommandExecutor for Flask routes and APScheduler jobs.
+        Coroutines are submitted to one event loop running in a background thread, which
+        also closes idle SSH connections every evict_interval seconds.
+        - executor: The AsyncCommandExecutor to drive (a new one by default).
+        - evict_interval: Seconds between evict_idle runs.
+        """
+        self._executor = executor
+        self.evict_interval = evict_interval
+        self._evictor = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    # Create the executor inside the loop thread so its primitives bind to it
+                    if self._executor is None:
+                        self._executor = AsyncCommandExecutor()
+                    self._evictor = loop.create_task(self._evict_periodically())
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='async-command-loop', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            try:
+                await self._executor.evict_idle()
+            except Exception as e:
+                print(f"Failed to close idle SSH connections: {e}")
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the background loop and wait for its result."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Start an AsyncCommandExecutor method on the background loop without waiting for it.
+        - method: Name of the coroutine method, e.g. 'get_server_health'.
+        - Returns: A concurrent.futures.Future with its result; cancelling it cancels the call.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(getattr(self._executor, method)(*args, **kwargs), loop)
+
+    def execute_ssh_command(self, server_ip, username, password, command, port=22, timeout=None):
+        """Execute a command on a Linux server via SSH"""
+        self._ensure_loop()
+        return self.run(self._executor.execute_ssh_command(server_ip, username, password, command,
+                                                          port=port, timeout=timeout))
+
+    def execute_winrm_command(self, server_ip, username, password, command):
+        """Execute a command on a Windows server via WinRM"""
+        self._ensure_loop()
+        return self.run(self._executor.execute_winrm_command(server_ip, username, password, command))
+
+    def execute_command(self, server_ip, username, password, command, os_type, timeout=None):
+        """Execute a command over SSH or WinRM depending on the server's os_type"""
+        self._ensure_loop()
+        return self.run(self._executor.execute_command(server_ip, username, password, command, os_type,
+                                                       timeout=timeout))
+
+    def get_server_health(self, server_ip, username, password, os_type='Linux', timeout=None):
+        """Retrieve server health via SSH or WinRM"""
+        self._ensure_loop()
+        return self.run(self._executor.get_server_health(server_ip, username, password, os_type=os_type,
+                                                         timeout=timeout))
+
+    def get_fleet_health(self, servers):
+        """Run health checks on many servers concurrently (see AsyncCommandExecutor.get_fleet_health)."""
+        self._ensure_loop()
+        return self.run(self._executor.get_fleet_health(servers))
+
+    def close(self):
+        """Close all connections and stop the background loop."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._evictor.cancel)
+        self.run(self._executor.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        with self._lock:
+            self._loop = None
+            self._thread = None
+
+
+# Shared entry point for the 'asyncio' backend of FleetExecutor and HealthSweeper
+async_command_executor = SyncCommandExecutor()
@@ -1,6 +1,6 @@
 # backup_utils.py
 import paramiko
-from command_utils import CommandExecutor  # Import CommandExecutor from its module
+from app.command_utils import CommandExecutor
 
 def run_backup(server_ip, username, password):
     command = "tar -czf /backup/server_backup.tar.gz /important/data"
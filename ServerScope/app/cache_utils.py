@@ -0,0 +1,116 @@
+# cache_utils.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 4096))
+RESULT_CACHE_DEFAULT_TTL = int(os.getenv('RESULT_CACHE_DEFAULT_TTL', 30))  # seconds, max age when the caller gives none
+
+
+class _InFlight:
+    """A call in progress that concurrent identical requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, default_ttl=RESULT_CACHE_DEFAULT_TTL):
+        """
+        Size-bounded LRU cache for results of read-only remote queries, keyed by (server, command).
+        Each entry records when it was stored and every read decides with its own max_age whether
+        that is fresh enough. Concurrent misses for the same key share one call.
+        - max_entries: Entries kept before the least recently used one is evicted.
+        - default_ttl: Max age in seconds when the caller gives none.
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # (server, command) -> (stored_at, result)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    def get_or_call(self, server, command, func, max_age=None, cache_if=None):
+        """
+        Return a cached result stored at most max_age seconds ago, or call func() once and cache
+        what it returns (replacing the older entry).
+        - server: The server the command runs on (e.g. its IP address).
+        - command: The read-only command, or any name identifying the query.
+        - func: Zero-argument callable producing the result.
+        - max_age: Oldest acceptable result in seconds (default_ttl if omitted); 0 always calls
+          func(), without joining a call already in flight, and stores the fresh result.
+        - cache_if: Optional predicate; results it rejects (e.g. errors) are returned but not cached.
+        """
+        key = (server, command)
+        max_age = self.default_ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and max_age > 0 and time.monotonic() - entry[0] < max_age:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            pending = self._in_flight.get(key)
+            if pending is not None and max_age > 0:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                pending = self._in_flight[key] = _InFlight()
+                self._stats['misses'] += 1
+                leader = True
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        try:
+            pending.result = func()
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                # Skip storing when the entry was invalidated, or a forced call replaced this one, meanwhile
+                if pending.error is None and self._in_flight.get(key) is pending \
+                        and (cache_if is None or cache_if(pending.result)):
+                    self._entries[key] = (time.monotonic(), pending.result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats['evictions'] += 1
+                if self._in_flight.get(key) is pending:
+                    del self._in_flight[key]
+            pending.done.set()
+        return pending.result
+
+    def invalidate(self, server, command=None):
+        """
+        Drop cached results for a server, or for one of its commands.
+        Calls already in flight still return to their callers but are not cached.
+        - Returns: The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == server and (command is None or key[1] == command)]
+            for key in keys:
+                del self._entries[key]
+            for key in [key for key in self._in_flight if key[0] == server and (command is None or key[1] == command)]:
+                del self._in_flight[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+
+# Shared cache in front of CommandExecutor and NFSUtils read-only queries
+result_cache = ResultCache()
@@ -1,42 +1,230 @@
+import os
+import time
+import codecs
+import select
 import paramiko
-import winrm
-# revisit this to auto configure the http 85 or 86 depending on the server
+from app.connection_pool import ssh_pool, winrm_pool
+from app.fingerprint_utils import transport_for
+from app.health_utils import HealthCollector
+from app.cache_utils import result_cache
+
+# os_type values (lower-cased) that map to each transport
+LINUX_OS_TYPES = ('linux', 'debian', 'ubuntu', 'redhat', 'centos')
+WINDOWS_OS_TYPES = ('windows', 'win')
+
+SSH_OUTPUT_CHUNK_SIZE = 32768
+SSH_MAX_OUTPUT_BYTES = int(os.getenv('SSH_MAX_OUTPUT_BYTES', 10 * 1024 * 1024))  # per stream, per command
+SSH_BATCH_MAX_CHANNELS = int(os.getenv('SSH_BATCH_MAX_CHANNELS', 8))  # stay under sshd MaxSessions (10)
+HEALTH_CACHE_TTL = int(os.getenv('HEALTH_CACHE_TTL', 15))  # seconds a health result may be served from cache
 
 class CommandExecutor:
 
     @staticmethod
-    def execute_ssh_command(server_ip, username, password, command):
-        """Execute a command on a Linux server via SSH"""
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    def iter_channel_output(channel, chunk_size=SSH_OUTPUT_CHUNK_SIZE, max_bytes=SSH_MAX_OUTPUT_BYTES,
+                            timeout=None, poll_interval=1.0):
+        """
+        Read stdout and stderr of a running command chunk by chunk, as they arrive.
+        Both streams are drained in turn, so a full stderr window can never stall stdout.
+        - channel: The paramiko channel the command runs on.
+        - max_bytes: Bytes per stream passed on to the caller; the rest is read and discarded.
+        - timeout: Seconds without any output before giving up (None waits forever).
+        - Yields: ('stdout' | 'stderr', text) tuples, a ('truncated', stream_name) tuple the
+          first time a stream hits max_bytes, and finally ('exit', exit_status).
+        """
+        decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace') for name in ('stdout', 'stderr')}
+        received = {'stdout': 0, 'stderr': 0}
+        readers = (('stdout', channel.recv_ready, channel.recv),
+                   ('stderr', channel.recv_stderr_ready, channel.recv_stderr))
+        last_activity = time.monotonic()
+
+        while True:
+            got_data = False
+            for name, ready, recv in readers:
+                if not ready():
+                    continue
+                data = recv(chunk_size)
+                if not data:
+                    continue
+                got_data = True
+                allowed = max_bytes - received[name]
+                received[name] += len(data)
+                if allowed > 0:
+                    text = decoders[name].decode(data[:allowed])
+                    if text:
+                        yield name, text
+                    if len(data) > allowed:
+                        yield 'truncated', name
+
+            if got_data:
+                last_activity = time.monotonic()
+                continue
+            if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                break
+            if timeout is not None and time.monotonic() - last_activity > timeout:
+                raise TimeoutError(f"No output for {timeout} seconds")
+            # The channel's fileno becomes readable when either stream has data
+            select.select([channel], [], [], poll_interval)
+
+        for name, decoder in decoders.items():
+            tail = decoder.decode(b'', final=True)
+            if tail and received[name] <= max_bytes:
+                yield name, tail
+        yield 'exit', channel.recv_exit_status()
+
+    @staticmethod
+    def stream_ssh_command(server_ip, username, password, command, port=22, timeout=None,
+                           max_bytes=SSH_MAX_OUTPUT_BYTES):
+        """
+        Execute a command via SSH and yield its output incrementally (see iter_channel_output).
+        Connection failures are yielded as a final ('error', message) tuple.
+        """
         try:
-            client.connect(server_ip, username=username, password=password)
-            stdin, stdout, stderr = client.exec_command(command)
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-            client.close()
-            if error:
-                return f"Error: {error}"
-            return output
+            with ssh_pool.connection(server_ip, username, password, port=port) as client:
+                stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+                stdin.close()
+                for event in CommandExecutor.iter_channel_output(stdout.channel, max_bytes=max_bytes,
+                                                                 timeout=timeout):
+                    yield event
         except Exception as e:
-            return f"Error connecting to {server_ip} via SSH: {str(e)}"
+            yield 'error', f"Error connecting to {server_ip} via SSH: {str(e)}"
+
+    @staticmethod
+    def execute_ssh_command(server_ip, username, password, command, port=22, timeout=None, callback=None):
+        """
+        Execute a command on a Linux server via SSH, reusing a pooled connection.
+        - callback: Optional callable(stream_name, text) invoked for every chunk as it arrives.
+        """
+        output = []
+        error = []
+        for stream, data in CommandExecutor.stream_ssh_command(server_ip, username, password, command,
+                                                                 port=port, timeout=timeout):
+            if stream == 'error':
+                return data
+            if callback is not None and stream in ('stdout', 'stderr'):
+                callback(stream, data)
+            if stream == 'stdout':
+                output.append(data)
+            elif stream == 'stderr':
+                error.append(data)
+            elif stream == 'truncated':
+                (output if data == 'stdout' else error).append("\n[output truncated]\n")
+        if error:
+            return f"Error: {''.join(error)}"
+        return ''.join(output)
+
+    @staticmethod
+    def execute_ssh_batch(server_ip, username, password, commands, port=22, timeout=None,
+                          max_channels=SSH_BATCH_MAX_CHANNELS, max_bytes=SSH_MAX_OUTPUT_BYTES):
+        """
+        Execute several commands over one pooled SSH connection, each on its own channel.
+        Up to max_channels commands run on the host at the same time.
+        - commands: Dict (or list of pairs) mapping a name to a command.
+        - max_channels: Channels open at once; lowered automatically if the server refuses more.
+        - Returns: A dict mapping each name, in order, to
+          {'stdout': str, 'stderr': str, 'exit_status': int or None, 'error': str or None}.
+        """
+        commands = list(commands.items() if isinstance(commands, dict) else commands)
+        results = {name: {'stdout': '', 'stderr': '', 'exit_status': None, 'error': None} for name, _ in commands}
+        try:
+            with ssh_pool.connection(server_ip, username, password, port=port) as client:
+                transport = client.get_transport()
+                queue = list(commands)
+                while queue:
+                    wave = []
+                    while queue and len(wave) < max_channels:
+                        name, command = queue[0]
+                        try:
+                            channel = transport.open_session(timeout=timeout)
+                        except paramiko.ChannelException:
+                            if not wave:
+                                raise
+                            # The server limits sessions per connection; run the rest in smaller waves
+                            max_channels = len(wave)
+                            break
+                        queue.pop(0)
+                        channel.exec_command(command)
+                        channel.shutdown_write()
+                        wave.append((name, channel))
+
+                    for name, channel in wave:
+                        result = results[name]
+                        try:
+                            output, error = [], []
+                            for stream, data in CommandExecutor.iter_channel_output(channel, max_bytes=max_bytes,
+                                                                                    timeout=timeout):
+                                if stream == 'stdout':
+                                    output.append(data)
+                                elif stream == 'stderr':
+                                    error.append(data)
+                                elif stream == 'truncated':
+                                    (output if data == 'stdout' else error).append("\n[output truncated]\n")
+                                elif stream == 'exit':
+                                    result['exit_status'] = data
+                            result['stdout'] = ''.join(output)
+                            result['stderr'] = ''.join(error)
+                        except TimeoutError as e:
+                            result['error'] = f"Error: {name} timed out: {str(e)}"
+                        finally:
+                            channel.close()
+        except Exception as e:
+            message = f"Error connecting to {server_ip} via SSH: {str(e)}"
+            for result in results.values():
+                if result['exit_status'] is None and result['error'] is None:
+                    result['error'] = message
+        return results
 
     @staticmethod
     def execute_winrm_command(server_ip, username, password, command):
-        """Execute a command on a Windows server via WinRM"""
+        """
+        Execute a command on a Windows server via WinRM, reusing a pooled shell, over HTTPS
+        when the fingerprint scan found the host's HTTPS listener. A non-zero exit status is
+        an error; stderr alone is not, since PowerShell also writes progress records and
+        warnings there.
+        """
         try:
-            session = winrm.Session(f'http://{server_ip}:5985/wsman', auth=(username, password))
-            result = session.run_cmd(command)
+            result = winrm_pool.run_cmd(server_ip, username, password, command,
+                                        https=transport_for(server_ip) == 'winrm-https')
             output = result.std_out.decode('utf-8')
             error = result.std_err.decode('utf-8')
-            if error:
-                return f"Error: {error}"
+            if result.status_code != 0:
+                return f"Error: {error or output}"
             return output
         except Exception as e:
             return f"Error connecting to {server_ip} via WinRM: {str(e)}"
 
     @staticmethod
-    def get_server_health(server_ip, username, password):
-        """Retrieve server health via SSH"""
-        command = "top -bn1 | grep 'Cpu\\|Mem\\|Swap' && df -h"
-        return CommandExecutor.execute_ssh_command(server_ip, username, password, command)
+    def execute_command(server_ip, username, password, command, os_type, timeout=None):
+        """
+        Execute a command over SSH or WinRM depending on the server's os_type. When the
+        os_type is not recognised, the transport found by the fingerprint scan is used.
+        """
+        os_type = (os_type or '').lower()
+        transport = transport_for(server_ip)
+        if os_type in LINUX_OS_TYPES or (os_type not in WINDOWS_OS_TYPES and transport == 'ssh'):
+            return CommandExecutor.execute_ssh_command(server_ip, username, password, command, timeout=timeout)
+        if os_type in WINDOWS_OS_TYPES or transport in ('winrm', 'winrm-https'):
+            return CommandExecutor.execute_winrm_command(server_ip, username, password, command)
+        return "Error: Unsupported or unrecognized OS. Please check the server configuration."
+
+    @staticmethod
+    def get_server_health(server_ip, username, password, os_type='Linux', timeout=None, max_age=None):
+        """
+        Collect CPU, load, memory, swap and disk metrics from a server in one remote call.
+        - os_type: The server's os_type; selects the /proc (SSH) or CIM (WinRM) collector.
+        - max_age: If given, a result up to this many seconds old may come from result_cache,
+          and concurrent requests for the same server share one remote call.
+        - Returns: A health record dictionary (see HealthCollector.parse).
+        """
+        command = HealthCollector.command_for(os_type)
+
+        def collect():
+            if (os_type or '').lower() in WINDOWS_OS_TYPES:
+                output = CommandExecutor.execute_winrm_command(server_ip, username, password, command)
+            else:
+                output = CommandExecutor.execute_ssh_command(server_ip, username, password, command, timeout=timeout)
+            return HealthCollector.parse(output, os_type)
+
+        if max_age is None:
+            return collect()
+        return result_cache.get_or_call(server_ip, command, collect, max_age=max_age,
+                                        cache_if=lambda health: health['status'] not in ('Unreachable', 'Unknown'))
@@ -0,0 +1,429 @@
+# connection_pool.py
+
+import os
+import hmac
+import time
+import atexit
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import paramiko
+import winrm
+from winrm.exceptions import WinRMError, WinRMTransportError, InvalidCredentialsError
+
+# Pool limits can be tuned per deployment through the environment
+SSH_POOL_MAX_PER_HOST = int(os.getenv('SSH_POOL_MAX_PER_HOST', 4))
+SSH_POOL_MAX_TOTAL = int(os.getenv('SSH_POOL_MAX_TOTAL', 256))
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv('SSH_POOL_IDLE_TIMEOUT', 300))  # seconds
+SSH_POOL_ACQUIRE_TIMEOUT = int(os.getenv('SSH_POOL_ACQUIRE_TIMEOUT', 30))  # seconds
+SSH_CONNECT_TIMEOUT = int(os.getenv('SSH_CONNECT_TIMEOUT', 10))  # seconds
+SSH_KEEPALIVE_INTERVAL = int(os.getenv('SSH_KEEPALIVE_INTERVAL', 30))  # seconds
+
+WINRM_POOL_MAX_PER_HOST = int(os.getenv('WINRM_POOL_MAX_PER_HOST', 2))  # stay well under MaxShellsPerUser
+WINRM_POOL_MAX_TOTAL = int(os.getenv('WINRM_POOL_MAX_TOTAL', 128))
+WINRM_POOL_IDLE_TIMEOUT = int(os.getenv('WINRM_POOL_IDLE_TIMEOUT', 300))  # seconds, below the server's shell IdleTimeout
+WINRM_POOL_ACQUIRE_TIMEOUT = int(os.getenv('WINRM_POOL_ACQUIRE_TIMEOUT', 30))  # seconds
+WINRM_CERT_VALIDATION = os.getenv('WINRM_CERT_VALIDATION', 'validate')  # 'ignore' for self-signed HTTPS listeners
+
+# Per-process key for the credential digests in pool keys, so they cannot be matched offline
+_CREDENTIAL_KEY = os.urandom(32)
+
+
+def _credential_digest(password):
+    """Digest of a password telling pooled connections opened with different credentials apart."""
+    return hmac.new(_CREDENTIAL_KEY, (password or '').encode('utf-8'), 'sha256').hexdigest()
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class PooledSSHConnection:
+    def __init__(self, key, client):
+        """
+        Wrap an authenticated paramiko client owned by the pool.
+        - key: The (host, port, username, credential digest) tuple the connection belongs to.
+        - client: A connected paramiko.SSHClient.
+        """
+        self.key = key
+        self.client = client
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    def is_alive(self):
+        """Check whether the underlying transport is still usable."""
+        try:
+            transport = self.client.get_transport()
+            return transport is not None and transport.is_active()
+        except Exception:
+            return False
+
+    def close(self):
+        """Close the underlying client, ignoring errors on already dead transports."""
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+class PooledWinRMShell:
+    def __init__(self, key, session, shell_id):
+        """
+        Wrap a WinRM session and a remote shell kept open by the pool.
+        - key: The (host, username, credential digest) tuple the shell belongs to.
+        - session: An authenticated winrm.Session.
+        - shell_id: ID of the remote cmd shell opened on the session.
+        """
+        self.key = key
+        self.session = session
+        self.shell_id = shell_id
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.broken = False
+        self.started = False  # whether the last command reached the server
+
+    def is_alive(self):
+        """WinRM has no cheap liveness probe; a shell counts as alive until a command fails on it."""
+        return not self.broken
+
+    def run_cmd(self, command, args=()):
+        """
+        Run a command in the open shell.
+        - Returns: A winrm.Response with std_out, std_err and status_code.
+        """
+        protocol = self.session.protocol
+        self.started = False
+        try:
+            command_id = protocol.run_command(self.shell_id, command, args)
+            self.started = True
+            try:
+                return winrm.Response(protocol.get_command_output(self.shell_id, command_id))
+            finally:
+                protocol.cleanup_command(self.shell_id, command_id)
+        except Exception:
+            self.broken = True
+            raise
+
+    def close(self):
+        """Close the remote shell and the HTTP session, ignoring errors on dead shells."""
+        try:
+            self.session.protocol.close_shell(self.shell_id)
+        except Exception:
+            pass
+        try:
+            self.session.protocol.transport.close_session()
+        except Exception:
+            pass
+
+
+class KeyedConnectionPool(ABC):
+    def __init__(self, max_per_host, max_total, idle_timeout, acquire_timeout):
+        """
+        Keep open connections per key and hand them out one user at a time.
+        Subclasses implement _open(key, password) to create a pooled connection
+        object exposing key, last_used, uses, is_alive() and close().
+        - max_per_host: Maximum open connections per key.
+        - max_total: Maximum open connections across all keys.
+        - idle_timeout: Seconds an unused connection is kept before it is closed.
+        - acquire_timeout: Seconds to wait for a free slot before giving up.
+        """
+        self.max_per_host = max_per_host
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._cond = threading.Condition()
+        self._idle = {}    # key -> list of idle connections, most recently used last
+        self._counts = {}  # key -> number of open connections (idle + checked out)
+        self._total = 0
+
+    @abstractmethod
+    def _open(self, key, password):
+        """Open a new connection for key."""
+
+    def _forget_locked(self, key):
+        """Give back the slot of a closed connection. Caller holds the lock."""
+        remaining = self._counts.get(key, 0) - 1
+        if remaining > 0:
+            self._counts[key] = remaining
+        else:
+            self._counts.pop(key, None)
+        self._total -= 1
+
+    def _collect_expired_locked(self, now):
+        """Remove idle connections past their idle timeout. Caller holds the lock."""
+        expired = []
+        for key in list(self._idle):
+            fresh = []
+            for conn in self._idle[key]:
+                if now - conn.last_used > self.idle_timeout:
+                    expired.append(conn)
+                    self._forget_locked(conn.key)
+                else:
+                    fresh.append(conn)
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+        return expired
+
+    def _collect_lru_locked(self):
+        """Remove the least recently used idle connection of any host. Caller holds the lock."""
+        oldest = None
+        for conns in self._idle.values():
+            if conns and (oldest is None or conns[0].last_used < oldest.last_used):
+                oldest = conns[0]
+        if oldest is None:
+            return None
+        self._idle[oldest.key].remove(oldest)
+        if not self._idle[oldest.key]:
+            del self._idle[oldest.key]
+        self._forget_locked(oldest.key)
+        return oldest
+
+    def _checkout(self, key, password):
+        """
+        Check out a connection for key, opening one if needed.
+        - Returns: A pooled connection that must be handed back with release().
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        to_close = []
+        try:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    to_close.extend(self._collect_expired_locked(now))
+
+                    # Reuse the most recently used idle connection, skipping dead ones
+                    idle = self._idle.get(key)
+                    while idle:
+                        conn = idle.pop()
+                        if not idle:
+                            del self._idle[key]
+                        if conn.is_alive():
+                            conn.uses += 1
+                            return conn
+                        to_close.append(conn)
+                        self._forget_locked(conn.key)
+                        idle = self._idle.get(key)
+
+                    if self._counts.get(key, 0) < self.max_per_host:
+                        if self._total >= self.max_total:
+                            victim = self._collect_lru_locked()
+                            if victim is not None:
+                                to_close.append(victim)
+                        if self._total < self.max_total:
+                            # Reserve the slot, then connect outside the lock
+                            self._counts[key] = self._counts.get(key, 0) + 1
+                            self._total += 1
+                            break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"Timed out waiting for a pooled connection to {key[0]}")
+                    self._cond.wait(remaining)
+        finally:
+            for conn in to_close:
+                conn.close()
+
+        try:
+            conn = self._open(key, password)
+        except Exception:
+            with self._cond:
+                self._forget_locked(key)
+                self._cond.notify_all()
+            raise
+        conn.uses = 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Return a checked-out connection to the pool.
+        - discard: Close the connection instead of keeping it (e.g. after an error).
+        """
+        keep = not discard and conn.is_alive()
+        with self._cond:
+            if keep:
+                conn.last_used = time.monotonic()
+                self._idle.setdefault(conn.key, []).append(conn)
+            else:
+                self._forget_locked(conn.key)
+            self._cond.notify_all()
+        if not keep:
+            conn.close()
+
+    def evict_idle(self):
+        """Close idle connections past their idle timeout or with a dead transport."""
+        with self._cond:
+            to_close = self._collect_expired_locked(time.monotonic())
+            for key in list(self._idle):
+                alive = []
+                for conn in self._idle[key]:
+                    if conn.is_alive():
+                        alive.append(conn)
+                    else:
+                        to_close.append(conn)
+                        self._forget_locked(conn.key)
+                if alive:
+                    self._idle[key] = alive
+                else:
+                    del self._idle[key]
+            if to_close:
+                self._cond.notify_all()
+        for conn in to_close:
+            conn.close()
+        return len(to_close)
+
+    def close_all(self):
+        """
+        Close every idle connection. Checked-out connections are left alone and go back
+        to the pool when released; they are closed by a later evict_idle or close_all.
+        """
+        with self._cond:
+            to_close = [conn for conns in self._idle.values() for conn in conns]
+            for conn in to_close:
+                self._forget_locked(conn.key)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in to_close:
+            conn.close()
+
+    def stats(self):
+        """Return a snapshot of pool usage."""
+        with self._cond:
+            idle = sum(len(conns) for conns in self._idle.values())
+            return {
+                'open': self._total,
+                'idle': idle,
+                'in_use': self._total - idle,
+                'hosts': len(self._counts)
+            }
+
+
+class SSHConnectionPool(KeyedConnectionPool):
+    def __init__(self, max_per_host=SSH_POOL_MAX_PER_HOST, max_total=SSH_POOL_MAX_TOTAL,
+                 idle_timeout=SSH_POOL_IDLE_TIMEOUT, acquire_timeout=SSH_POOL_ACQUIRE_TIMEOUT,
+                 connect_timeout=SSH_CONNECT_TIMEOUT):
+        """
+        Keep authenticated SSH transports alive and hand them out per command.
+        Every command still gets its own channel; only the TCP connection, key
+        exchange and authentication are shared.
+        - max_per_host: Maximum open connections per (host, port, username, password).
+        - max_total: Maximum open connections across all hosts.
+        - idle_timeout: Seconds an unused connection is kept before it is closed.
+        - acquire_timeout: Seconds to wait for a free slot before giving up.
+        - connect_timeout: TCP/SSH handshake timeout for new connections.
+        """
+        super().__init__(max_per_host, max_total, idle_timeout, acquire_timeout)
+        self.connect_timeout = connect_timeout
+
+    def _open(self, key, password):
+        """Open and authenticate a new SSH client."""
+        host, port, username, _ = key
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(host, port=port, username=username, password=password,
+                           timeout=self.connect_timeout)
+            transport = client.get_transport()
+            if transport is not None and SSH_KEEPALIVE_INTERVAL:
+                transport.set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        except Exception:
+            client.close()
+            raise
+        return PooledSSHConnection(key, client)
+
+    def acquire(self, host, username, password, port=22):
+        """
+        Check out a connection for (host, port, username), opening one if needed. Connections
+        are keyed by a digest of the password too, so one opened with another password is
+        never handed out.
+        - Returns: A PooledSSHConnection that must be handed back with release().
+        """
+        return self._checkout((host, port, username, _credential_digest(password)), password)
+
+    @contextmanager
+    def connection(self, host, username, password, port=22):
+        """
+        Context manager yielding a connected paramiko.SSHClient from the pool.
+        The connection is discarded if the block raises or is abandoned midway
+        (e.g. a generator streaming from it is closed).
+        """
+        conn = self.acquire(host, username, password, port=port)
+        try:
+            yield conn.client
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+
+class WinRMShellPool(KeyedConnectionPool):
+    def __init__(self, max_per_host=WINRM_POOL_MAX_PER_HOST, max_total=WINRM_POOL_MAX_TOTAL,
+                 idle_timeout=WINRM_POOL_IDLE_TIMEOUT, acquire_timeout=WINRM_POOL_ACQUIRE_TIMEOUT):
+        """
+        Keep authenticated WinRM sessions with an open remote shell per (host, username),
+        so commands skip re-authentication and shell creation/teardown. Callers say whether
+        the host listens on HTTPS (see fingerprint_utils.transport_for).
+        - max_per_host: Maximum open shells per (host, username, password).
+        - max_total: Maximum open shells across all hosts.
+        - idle_timeout: Seconds an unused shell is kept before it is closed.
+        - acquire_timeout: Seconds to wait for a free shell before giving up.
+        """
+        super().__init__(max_per_host, max_total, idle_timeout, acquire_timeout)
+
+    def _open(self, key, password):
+        """Authenticate a new WinRM session and open a shell on it."""
+        host, username, _, https = key
+        if https:
+            session = winrm.Session(f'https://{host}:5986/wsman', auth=(username, password),
+                                    server_cert_validation=WINRM_CERT_VALIDATION)
+        else:
+            session = winrm.Session(f'http://{host}:5985/wsman', auth=(username, password))
+        shell_id = session.protocol.open_shell()
+        return PooledWinRMShell(key, session, shell_id)
+
+    def acquire(self, host, username, password, https=False):
+        """
+        Check out a shell for (host, username), opening one if needed. Shells are keyed by a
+        digest of the password too, so one opened with another password is never handed out.
+        - https: Connect to the HTTPS listener on 5986 instead of HTTP on 5985.
+        - Returns: A PooledWinRMShell that must be handed back with release().
+        """
+        return self._checkout((host, username, _credential_digest(password), bool(https)), password)
+
+    def run_cmd(self, host, username, password, command, args=(), https=False):
+        """
+        Run a command in a pooled shell. A reused shell that fails before the command
+        starts (e.g. it was reaped on the server) is discarded and the command is retried
+        once in a fresh shell; once it has started the command is never run twice.
+        - https: Connect to the HTTPS listener on 5986 instead of HTTP on 5985.
+        - Returns: A winrm.Response.
+        """
+        for attempt in range(2):
+            shell = self.acquire(host, username, password, https=https)
+            try:
+                result = shell.run_cmd(command, args)
+            except InvalidCredentialsError:
+                self.release(shell, discard=True)
+                raise
+            except (WinRMError, WinRMTransportError, OSError):
+                self.release(shell, discard=True)
+                if attempt or shell.uses == 1 or shell.started:
+                    raise
+                continue
+            except BaseException:
+                self.release(shell, discard=True)
+                raise
+            self.release(shell)
+            return result
+
+
+# Shared pools used by CommandExecutor and the other remote helpers
+ssh_pool = SSHConnectionPool()
+winrm_pool = WinRMShellPool()
+atexit.register(ssh_pool.close_all)
+atexit.register(winrm_pool.close_all)
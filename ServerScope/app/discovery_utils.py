@@ -0,0 +1,134 @@
+# discovery_utils.py
+
+import os
+import time
+import socket
+import asyncio
+import threading
+
+DISCOVERY_BACKEND = os.getenv('DISCOVERY_BACKEND', 'nmap')  # 'nmap' or 'tcp'
+DISCOVERY_TCP_PORTS = [int(port) for port in os.getenv('DISCOVERY_TCP_PORTS', '22,5985,445').split(',') if port.strip()]
+DISCOVERY_TCP_CONCURRENCY = int(os.getenv('DISCOVERY_TCP_CONCURRENCY', 4096))  # sockets open at once
+DISCOVERY_TCP_TIMEOUT = float(os.getenv('DISCOVERY_TCP_TIMEOUT', 1.0))  # seconds per host
+DISCOVERY_TCP_MAX_RATE = int(os.getenv('DISCOVERY_TCP_MAX_RATE', 0))  # connection attempts per second, 0 = no limit
+DISCOVERY_RESOLVE_HOSTNAMES = os.getenv('DISCOVERY_RESOLVE_HOSTNAMES', '1') == '1'
+DISCOVERY_RESOLVE_TIMEOUT = float(os.getenv('DISCOVERY_RESOLVE_TIMEOUT', 1.0))  # seconds
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        """
+        Token bucket spacing events 1/rate seconds apart. Thread-safe, so one limiter
+        can be shared by the event loops of several worker threads.
+        - rate: Events per second; 0 disables the limit.
+        """
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserve the next slot and return the seconds to wait for it."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+            return slot - now
+
+    async def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class TcpDiscoveryEngine:
+    def __init__(self, ports=None, concurrency=DISCOVERY_TCP_CONCURRENCY, timeout=DISCOVERY_TCP_TIMEOUT,
+                 max_rate=DISCOVERY_TCP_MAX_RATE, resolve_hostnames=DISCOVERY_RESOLVE_HOSTNAMES,
+                 refused_is_up=True):
+        """
+        Host discovery with asyncio TCP connect probes, an alternative to `nmap -sn`
+        that needs neither the nmap binary nor raw socket privileges.
+        A host is up when any port accepts the connection or, with refused_is_up,
+        answers with a reset (a closed port still proves the host exists).
+        - ports: TCP ports probed on every host, in parallel.
+        - concurrency: Maximum number of sockets open at once per scan.
+        - timeout: Seconds a host is given to answer on any port.
+        - max_rate: Global connection attempts per second, shared by every scan of this engine.
+        - resolve_hostnames: Look up the PTR name of hosts found up.
+        - refused_is_up: Count a refused connection as a live host.
+        """
+        self.ports = list(ports or DISCOVERY_TCP_PORTS)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.limiter = RateLimiter(max_rate)
+        self.resolve_hostnames = resolve_hostnames
+        self.refused_is_up = refused_is_up
+
+    async def probe_port(self, address, port, semaphore):
+        """
+        Attempt one TCP connection.
+        - Returns: 'open', 'closed' (refused) or None (timed out or unreachable).
+        """
+        async with semaphore:
+            await self.limiter.wait()
+            loop = asyncio.get_running_loop()
+            sock = socket.socket(socket.AF_INET6 if ':' in address else socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (address, port)), self.timeout)
+                return 'open'
+            except ConnectionRefusedError:
+                return 'closed'
+            except (asyncio.TimeoutError, OSError):
+                return None
+            finally:
+                sock.close()
+
+    async def probe_host(self, address, semaphore):
+        """
+        Probe every port of a host in parallel, stopping at the first answer.
+        - Returns: True when the host is up.
+        """
+        pending = {asyncio.ensure_future(self.probe_port(address, port, semaphore)) for port in self.ports}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    state = task.result()
+                    if state == 'open' or (state == 'closed' and self.refused_is_up):
+                        return True
+            return False
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def resolve(self, address):
+        """Reverse DNS name of an address, or "Unknown"."""
+        loop = asyncio.get_running_loop()
+        try:
+            hostname, _ = await asyncio.wait_for(
+                loop.getnameinfo((address, 0), socket.NI_NAMEREQD), DISCOVERY_RESOLVE_TIMEOUT)
+            return hostname
+        except (asyncio.TimeoutError, OSError):
+            return "Unknown"
+
+    async def scan_async(self, addresses):
+        """
+        Probe addresses concurrently.
+        - addresses: List of IP address strings.
+        - Returns: Result dictionaries ('ip', 'hostname', 'status') of the hosts found up,
+          in the order of addresses, like NetworkScanner.scan_shard.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        states = await asyncio.gather(*(self.probe_host(address, semaphore) for address in addresses))
+        up = [address for address, state in zip(addresses, states) if state]
+        if self.resolve_hostnames:
+            hostnames = await asyncio.gather(*(self.resolve(address) for address in up))
+        else:
+            hostnames = ["Unknown"] * len(up)
+        return [{'ip': address, 'hostname': hostname, 'status': 'up'} for address, hostname in zip(up, hostnames)]
+
+    def scan(self, addresses):
+        """Blocking wrapper of scan_async; each call runs its own event loop."""
+        return asyncio.run(self.scan_async(list(addresses)))
@@ -0,0 +1,208 @@
+# fingerprint_utils.py
+
+import os
+import asyncio
+from datetime import datetime, timedelta
+from flask import has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import HostFingerprint, Server, db
+from app.ingest_utils import INGEST_CHUNK_SIZE, _chunks, upsert_statement
+from app.cache_utils import ResultCache
+
+FINGERPRINT_TIMEOUT = float(os.getenv('FINGERPRINT_TIMEOUT', 2.0))  # seconds per port
+FINGERPRINT_CONCURRENCY = int(os.getenv('FINGERPRINT_CONCURRENCY', 256))  # hosts probed at once
+FINGERPRINT_TTL = int(os.getenv('FINGERPRINT_TTL', 7 * 86400))  # seconds a cached fingerprint is trusted
+DISCOVERY_FINGERPRINT = os.getenv('DISCOVERY_FINGERPRINT', '0') == '1'  # fingerprint new or changed hosts after a scan
+HOST_TRANSPORT_CACHE_SIZE = int(os.getenv('HOST_TRANSPORT_CACHE_SIZE', 4096))  # stored fingerprints kept in memory
+HOST_TRANSPORT_CACHE_TTL = int(os.getenv('HOST_TRANSPORT_CACHE_TTL', 300))  # seconds a stored fingerprint is reused
+
+SSH_PORT = 22
+WINRM_HTTP_PORT = 5985
+WINRM_HTTPS_PORT = 5986
+SMB_PORT = 445
+
+FINGERPRINT_COLUMNS = ('ip_address', 'transport', 'os_type', 'ssh_banner', 'open_ports', 'checked_at')
+
+# Transport learned for a host by the fingerprint scan: 'ssh', 'winrm' (HTTP 5985) or
+# 'winrm-https' (HTTPS 5986).
+host_transports = {}
+
+# Transports of hosts fingerprinted by another process, read from HostFingerprint
+stored_transports = ResultCache(max_entries=HOST_TRANSPORT_CACHE_SIZE, default_ttl=HOST_TRANSPORT_CACHE_TTL)
+
+
+def _stored_transport(host):
+    try:
+        fingerprint = HostFingerprint.query.filter_by(ip_address=host).first()
+    except SQLAlchemyError:
+        return None
+    return fingerprint.transport if fingerprint else None
+
+
+def transport_for(host):
+    """
+    Transport learned for a host by the fingerprint scan. host_transports only holds the
+    hosts this process scanned; others are looked up in HostFingerprint (within an app
+    context) through a bounded cache.
+    - Returns: 'ssh', 'winrm', 'winrm-https' or None.
+    """
+    transport = host_transports.get(host)
+    if transport is not None or not has_app_context():
+        return transport
+    return stored_transports.get_or_call(host, 'transport', lambda: _stored_transport(host))
+
+
+class Fingerprinter:
+    def __init__(self, timeout=FINGERPRINT_TIMEOUT, concurrency=FINGERPRINT_CONCURRENCY, ttl=FINGERPRINT_TTL):
+        """
+        Find how a host is managed by probing its management ports: the SSH banner on 22,
+        WinRM on 5985/5986 and SMB on 445. Results are cached per IP in HostFingerprint.
+        - timeout: Seconds allowed per port.
+        - concurrency: Maximum number of hosts probed at the same time.
+        - ttl: Seconds a cached fingerprint is used before the host is probed again.
+        """
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.ttl = ttl
+
+    async def read_banner(self, address, port):
+        """
+        Connect and read the first line the server sends (SSH servers announce themselves).
+        - Returns: (open, banner); banner is None if the port is closed or stays silent.
+        """
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return False, None
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            banner = line.decode('utf-8', 'replace').strip()[:255]
+            return True, banner or None
+        except (asyncio.TimeoutError, OSError):
+            return True, None
+        finally:
+            writer.close()
+
+    async def port_open(self, address, port):
+        """Connect without reading, for services that wait for the client to speak first."""
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return False
+        writer.close()
+        return True
+
+    @staticmethod
+    def classify(banner, open_ports):
+        """
+        Infer the transport and OS family.
+        WinRM wins over SSH because Windows hosts with OpenSSH are still managed over WinRM here.
+        - Returns: (transport, os_type).
+        """
+        if WINRM_HTTP_PORT in open_ports:
+            return 'winrm', 'Windows'
+        if WINRM_HTTPS_PORT in open_ports:
+            return 'winrm-https', 'Windows'
+        if banner and banner.startswith('SSH-'):
+            return 'ssh', 'Windows' if 'windows' in banner.lower() else 'Linux'
+        if SMB_PORT in open_ports:
+            return None, 'Windows'
+        return None, 'unknown'
+
+    async def probe_host(self, address, semaphore, now):
+        async with semaphore:
+            (ssh_open, banner), winrm_http, winrm_https, smb = await asyncio.gather(
+                self.read_banner(address, SSH_PORT),
+                self.port_open(address, WINRM_HTTP_PORT),
+                self.port_open(address, WINRM_HTTPS_PORT),
+                self.port_open(address, SMB_PORT))
+        open_ports = [port for port, is_open in ((SSH_PORT, ssh_open), (WINRM_HTTP_PORT, winrm_http),
+                                                  (WINRM_HTTPS_PORT, winrm_https), (SMB_PORT, smb)) if is_open]
+        transport, os_type = Fingerprinter.classify(banner, open_ports)
+        return {
+            'ip_address': address,
+            'transport': transport,
+            'os_type': os_type,
+            'ssh_banner': banner,
+            'open_ports': ','.join(str(port) for port in open_ports),
+            'checked_at': now
+        }
+
+    async def probe_async(self, addresses, now):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self.probe_host(address, semaphore, now) for address in addresses))
+
+    def probe(self, addresses, now=None):
+        """
+        Probe hosts without using the cache.
+        - Returns: A list of fingerprint dictionaries (see FINGERPRINT_COLUMNS).
+        """
+        return asyncio.run(self.probe_async(list(addresses), now or datetime.utcnow()))
+
+    def cached(self, addresses, now=None):
+        """
+        Read fresh cached fingerprints, one query per INGEST_CHUNK_SIZE addresses.
+        - Returns: A dictionary mapping IP address to fingerprint dictionary.
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.ttl)
+        records = {}
+        for chunk in _chunks(sorted(set(addresses)), INGEST_CHUNK_SIZE):
+            for row in HostFingerprint.query.filter(HostFingerprint.ip_address.in_(chunk),
+                                                    HostFingerprint.checked_at >= cutoff):
+                records[row.ip_address] = {column: getattr(row, column) for column in FINGERPRINT_COLUMNS}
+        return records
+
+    def store(self, records):
+        """Upsert fingerprints into the cache."""
+        table = HostFingerprint.__table__
+        for chunk in _chunks(list(records), INGEST_CHUNK_SIZE):
+            stmt = upsert_statement(table, chunk, ['ip_address'], lambda current, new: {
+                column: getattr(new, column) for column in FINGERPRINT_COLUMNS if column != 'ip_address'
+            })
+            if stmt is not None:
+                db.session.execute(stmt)
+            else:
+                for record in chunk:
+                    row = HostFingerprint.query.filter_by(ip_address=record['ip_address']).first()
+                    if row is None:
+                        row = HostFingerprint(ip_address=record['ip_address'])
+                        db.session.add(row)
+                    for column, value in record.items():
+                        setattr(row, column, value)
+        db.session.commit()
+
+    def fingerprint(self, addresses, now=None, force=False):
+        """
+        Fingerprint hosts, probing only those without a fresh cached result.
+        The transports found are registered in host_transports.
+        - force: Probe every host, ignoring the cache.
+        - Returns: A dictionary mapping IP address to fingerprint dictionary.
+        """
+        now = now or datetime.utcnow()
+        addresses = sorted(set(addresses))
+        records = {} if force else self.cached(addresses, now)
+        stale = [address for address in addresses if address not in records]
+        if stale:
+            probed = self.probe(stale, now)
+            self.store(probed)
+            records.update((record['ip_address'], record) for record in probed)
+        for address, record in records.items():
+            if record['transport']:
+                host_transports[address] = record['transport']
+        return records
+
+    @staticmethod
+    def apply_to_servers(records):
+        """
+        Set os_type on servers still marked 'unknown' (as created by scans) from their fingerprint.
+        - Returns: The number of servers updated.
+        """
+        known = {address: record for address, record in records.items() if record['os_type'] != 'unknown'}
+        updated = 0
+        for chunk in _chunks(sorted(known), INGEST_CHUNK_SIZE):
+            for server in Server.query.filter(Server.ip_address.in_(chunk), Server.os_type == 'unknown'):
+                server.os_type = known[server.ip_address]['os_type']
+                updated += 1
+        db.session.commit()
+        return updated
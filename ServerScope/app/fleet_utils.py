@@ -0,0 +1,186 @@
+# fleet_utils.py
+
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.models import Server, Tag, server_tags, db
+from app.command_utils import CommandExecutor
+from app.async_command_utils import async_command_executor
+
+FLEET_MAX_WORKERS = int(os.getenv('FLEET_MAX_WORKERS', 32))
+FLEET_COMMAND_TIMEOUT = int(os.getenv('FLEET_COMMAND_TIMEOUT', 60))  # seconds per host
+FLEET_BACKEND = os.getenv('FLEET_BACKEND', 'threads')  # 'threads' or 'asyncio' (needs asyncssh)
+
+
+class FleetExecutor:
+    def __init__(self, max_workers=FLEET_MAX_WORKERS, timeout=FLEET_COMMAND_TIMEOUT, run_on_host=None,
+                 backend=FLEET_BACKEND, async_executor=None):
+        """
+        Run one command across many servers on a bounded worker pool.
+        - max_workers: Maximum number of hosts contacted at the same time (threads backend).
+        - timeout: Seconds a single host may take before it is reported as timed out.
+        - run_on_host: Callable(server_ip, username, password, command, os_type, timeout)
+          used to reach a host. Defaults to CommandExecutor.execute_command.
+        - backend: 'threads' calls run_on_host on the worker pool; 'asyncio' runs every host on
+          the event loop of async_executor, bounded by its ASYNC_MAX_CONCURRENCY.
+        - async_executor: SyncCommandExecutor used by the asyncio backend (the shared one by default).
+        """
+        if backend not in ('threads', 'asyncio'):
+            raise ValueError(f"Unknown fleet backend: {backend}")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.run_on_host = run_on_host or CommandExecutor.execute_command
+        self.backend = backend
+        self.async_executor = async_executor or async_command_executor
+        self.poll_interval = min(1.0, timeout / 10.0) if timeout else 1.0
+
+    @staticmethod
+    def select_servers(server_ids=None, os_type=None, tag=None):
+        """
+        Select the target servers. Filters are combined with AND.
+        - server_ids: Optional list of server IDs.
+        - os_type: Optional os_type (case-insensitive), e.g. 'Linux'.
+        - tag: Optional tag name from the server_tags table.
+        - Returns: A list of Server objects.
+        """
+        query = Server.query
+        if server_ids:
+            query = query.filter(Server.id.in_(server_ids))
+        if os_type:
+            query = query.filter(db.func.lower(Server.os_type) == os_type.lower())
+        if tag:
+            query = (query.join(server_tags, server_tags.c.server_id == Server.id)
+                          .join(Tag, Tag.id == server_tags.c.tag_id)
+                          .filter(Tag.name == tag))
+        return query.order_by(Server.id).all()
+
+    @staticmethod
+    def _target(server):
+        """Copy the fields the workers need so no ORM object crosses threads."""
+        return {
+            'id': server.id,
+            'name': server.name,
+            'ip': server.ip_address,
+            'username': server.username,
+            'password': server.password,
+            'os_type': server.os_type
+        }
+
+    @staticmethod
+    def _result(target, status, output, latency):
+        return {
+            'server_id': target['id'],
+            'name': target['name'],
+            'ip': target['ip'],
+            'status': status,  # 'ok', 'error' or 'timeout'
+            'output': output,
+            'latency': round(latency, 4)
+        }
+
+    def _run_one(self, target, command, started):
+        """Worker body: run the command on one host and time it."""
+        begin = time.monotonic()
+        started[target['id']] = begin
+        try:
+            output = self.run_on_host(target['ip'], target['username'], target['password'],
+                                      command, target['os_type'], timeout=self.timeout)
+            status = 'error' if output.startswith('Error') else 'ok'
+        except Exception as e:
+            output = f"Error: {e}"
+            status = 'error'
+        return self._result(target, status, output, time.monotonic() - begin)
+
+    def _submit_async(self, target, command, started):
+        """
+        Start the command on one host on the asyncio backend.
+        - Returns: (future of the result dictionary, future of the call, for cancelling it).
+        """
+        begin = started[target['id']] = time.monotonic()
+        result = Future()
+
+        def done(call):
+            if call.cancelled():
+                return
+            try:
+                output = call.result()
+                status = 'error' if output.startswith('Error') else 'ok'
+            except Exception as e:
+                output = f"Error: {e}"
+                status = 'error'
+            result.set_result(self._result(target, status, output, time.monotonic() - begin))
+
+        call = self.async_executor.submit('execute_command', target['ip'], target['username'], target['password'],
+                                          command, target['os_type'], timeout=self.timeout)
+        call.add_done_callback(done)
+        return result, call
+
+    def run_command(self, servers, command):
+        """
+        Run a command on every server and yield results as each host finishes.
+        Hosts exceeding the timeout are reported as 'timeout' and no longer waited on.
+        - servers: Iterable of Server objects (see select_servers).
+        - command: The command to run.
+        - Returns: A generator of per-host result dictionaries.
+        """
+        targets = [self._target(server) for server in servers]
+        if not targets:
+            return
+
+        started = {}
+        pool = None
+        calls = []
+        try:
+            if self.backend == 'asyncio':
+                futures = {}
+                for target in targets:
+                    future, call = self._submit_async(target, command, started)
+                    futures[future] = target
+                    calls.append(call)
+            else:
+                pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets)),
+                                          thread_name_prefix='fleet')
+                futures = {pool.submit(self._run_one, target, command, started): target for target in targets}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+                if not self.timeout:
+                    continue
+                now = time.monotonic()
+                for future in list(pending):
+                    target = futures[future]
+                    begin = started.get(target['id'])
+                    if begin is not None and now - begin > self.timeout:
+                        pending.discard(future)
+                        yield self._result(target, 'timeout',
+                                           f"Error: Timed out after {self.timeout} seconds", now - begin)
+        finally:
+            # Stop queued hosts if the consumer goes away; running ones finish in the background
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            for call in calls:
+                call.cancel()
+
+    @staticmethod
+    def summarize(results):
+        """
+        Summarize a list of per-host results.
+        - Returns: A dictionary with status counts and latency percentiles in seconds.
+        """
+        latencies = sorted(result['latency'] for result in results)
+        summary = {
+            'total': len(results),
+            'ok': sum(1 for result in results if result['status'] == 'ok'),
+            'error': sum(1 for result in results if result['status'] == 'error'),
+            'timeout': sum(1 for result in results if result['status'] == 'timeout'),
+            'latency_p50': None,
+            'latency_p95': None,
+            'latency_max': None
+        }
+        if latencies:
+            summary['latency_p50'] = latencies[int(0.50 * (len(latencies) - 1))]
+            summary['latency_p95'] = latencies[int(0.95 * (len(latencies) - 1))]
+            summary['latency_max'] = latencies[-1]
+        return summary
@@ -0,0 +1,327 @@
+# health_utils.py
+
+import os
+from datetime import datetime
+
+# Seconds between the two /proc/stat samples used to compute CPU utilisation
+HEALTH_CPU_SAMPLE_SECONDS = float(os.getenv('HEALTH_CPU_SAMPLE_SECONDS', 0.5))
+
+# One remote invocation reading /proc directly instead of sampling with `top`.
+# `df -l` keeps NFS and other network mounts from hanging the check.
+LINUX_HEALTH_COMMAND = (
+    "echo '==stat=='; head -n1 /proc/stat; sleep " + str(HEALTH_CPU_SAMPLE_SECONDS) + "; head -n1 /proc/stat; "
+    "echo '==loadavg=='; cat /proc/loadavg; "
+    "echo '==nproc=='; grep -c ^processor /proc/cpuinfo; "
+    "echo '==meminfo=='; grep -E '^(MemTotal|MemFree|MemAvailable|Buffers|Cached|SwapTotal|SwapFree):' /proc/meminfo; "
+    "echo '==df=='; df -P -k -l 2>/dev/null; "
+    "echo '==dfi=='; df -P -i -l 2>/dev/null; true"
+)
+
+WINDOWS_HEALTH_COMMAND = (
+    'powershell -NoProfile -NonInteractive -Command "'
+    "$ProgressPreference = 'SilentlyContinue'; "
+    "$os = Get-CimInstance Win32_OperatingSystem; "
+    "$cpu = (Get-CimInstance Win32_Processor | Measure-Object -Property LoadPercentage -Average).Average; "
+    "$pf = @(Get-CimInstance Win32_PageFileUsage | Measure-Object -Property AllocatedBaseSize,CurrentUsage -Sum); "
+    "if ($pf.Count -lt 2) { $pf = @(@{Sum = 0}, @{Sum = 0}) }; "
+    "'cpu_percent=' + $cpu; "
+    "'cpu_count=' + (Get-CimInstance Win32_ComputerSystem).NumberOfLogicalProcessors; "
+    "'mem_total_kb=' + $os.TotalVisibleMemorySize; "
+    "'mem_free_kb=' + $os.FreePhysicalMemory; "
+    "'swap_total_mb=' + $pf[0].Sum; "
+    "'swap_used_mb=' + $pf[1].Sum; "
+    "Get-CimInstance Win32_LogicalDisk -Filter 'DriveType=3' | "
+    "ForEach-Object { 'disk=' + $_.DeviceID + ',' + $_.Size + ',' + $_.FreeSpace }"
+    '"'
+)
+
+# (warning, critical) thresholds, in percent except load_per_cpu
+HEALTH_THRESHOLDS = {
+    'cpu_percent': (85.0, 95.0),
+    'load_per_cpu': (1.5, 3.0),
+    'mem_used_percent': (85.0, 95.0),
+    'swap_used_percent': (50.0, 80.0),
+    'disk_max_used_percent': (85.0, 95.0),
+    'inode_max_used_percent': (85.0, 95.0)
+}
+
+# Pseudo filesystems that are not worth alerting on; prefixes match whole path components
+IGNORED_FILESYSTEMS = ('tmpfs', 'devtmpfs', 'udev', 'overlay', 'shm', 'none', 'efivarfs')
+IGNORED_MOUNT_PREFIXES = ('/dev', '/run', '/sys', '/proc', '/snap')
+
+
+def _to_int(value):
+    """Convert a field to int, or None if it is not a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    """Convert a field to float, or None if it is not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_ignored_mount(mount):
+    """Whether a mount point is one of IGNORED_MOUNT_PREFIXES or below one, e.g. /dev/shm but not /devdata."""
+    return any(mount == prefix or mount.startswith(prefix + '/') for prefix in IGNORED_MOUNT_PREFIXES)
+
+
+class HealthCollector:
+
+    @staticmethod
+    def command_for(os_type):
+        """Return the health collection command for an os_type."""
+        if (os_type or '').lower() in ('windows', 'win'):
+            return WINDOWS_HEALTH_COMMAND
+        return LINUX_HEALTH_COMMAND
+
+    @staticmethod
+    def empty_record():
+        """Return a health record with every metric unset."""
+        return {
+            'collected_at': datetime.utcnow(),
+            'cpu_percent': None,
+            'iowait_percent': None,
+            'cpu_count': None,
+            'load_1': None,
+            'load_5': None,
+            'load_15': None,
+            'mem_total_kb': None,
+            'mem_used_percent': None,
+            'swap_total_kb': None,
+            'swap_used_percent': None,
+            'disks': [],
+            'disk_max_used_percent': None,
+            'inode_max_used_percent': None,
+            'status': 'Unknown',
+            'alerts': [],
+            'error': None
+        }
+
+    @staticmethod
+    def error_record(message):
+        """Return a health record for a host that could not be checked."""
+        record = HealthCollector.empty_record()
+        record['status'] = 'Unreachable'
+        record['error'] = message
+        return record
+
+    @staticmethod
+    def parse(output, os_type='Linux'):
+        """
+        Parse the output of the health command into a health record.
+        - output: Raw output, or an "Error..." string from CommandExecutor.
+        - os_type: The server's os_type, selecting the parser.
+        - Returns: A dictionary of typed metrics with 'status' and 'alerts' filled in.
+        """
+        if output is None or output.startswith('Error'):
+            return HealthCollector.error_record(output or 'No output')
+        if (os_type or '').lower() in ('windows', 'win'):
+            record = HealthCollector.parse_windows_output(output)
+        else:
+            record = HealthCollector.parse_linux_output(output)
+        return HealthCollector.evaluate(record)
+
+    @staticmethod
+    def _sections(output):
+        """Split '==name==' delimited output into a dict of name -> list of lines."""
+        sections = {}
+        current = None
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith('==') and line.endswith('==') and len(line) > 4:
+                current = line[2:-2]
+                sections[current] = []
+            elif current is not None and line:
+                sections[current].append(line)
+        return sections
+
+    @staticmethod
+    def _percent(used, total):
+        if not total:
+            return None
+        return round(100.0 * used / total, 1)
+
+    @staticmethod
+    def parse_linux_output(output):
+        """
+        Parse the /proc based output of LINUX_HEALTH_COMMAND. Malformed lines and
+        fields are skipped, leaving the affected metrics unset.
+        """
+        record = HealthCollector.empty_record()
+        sections = HealthCollector._sections(output)
+
+        # CPU: difference between two /proc/stat samples
+        samples = []
+        for line in sections.get('stat', []):
+            if line.startswith('cpu '):
+                sample = [_to_int(v) for v in line.split()[1:9]]
+                if len(sample) >= 5 and None not in sample:
+                    samples.append(sample)
+        if len(samples) >= 2:
+            delta = [b - a for a, b in zip(samples[0], samples[-1])]
+            total = sum(delta)
+            if total > 0:
+                idle = delta[3] + delta[4]  # idle + iowait
+                record['cpu_percent'] = round(100.0 * (total - idle) / total, 1)
+                record['iowait_percent'] = round(100.0 * delta[4] / total, 1)
+
+        loadavg = sections.get('loadavg')
+        if loadavg:
+            parts = [_to_float(p) for p in loadavg[0].split()[:3]]
+            if len(parts) == 3 and None not in parts:
+                record['load_1'], record['load_5'], record['load_15'] = parts
+
+        nproc = sections.get('nproc')
+        if nproc and nproc[0].isdigit():
+            record['cpu_count'] = int(nproc[0])
+
+        meminfo = {}
+        for line in sections.get('meminfo', []):
+            name, _, value = line.partition(':')
+            value = _to_int(value.split()[0]) if value.split() else None
+            if value is not None:
+                meminfo[name] = value
+        if meminfo.get('MemTotal'):
+            available = meminfo.get('MemAvailable')
+            if available is None:
+                available = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+            record['mem_total_kb'] = meminfo['MemTotal']
+            record['mem_used_percent'] = HealthCollector._percent(meminfo['MemTotal'] - available, meminfo['MemTotal'])
+        if 'SwapTotal' in meminfo:
+            record['swap_total_kb'] = meminfo['SwapTotal']
+            record['swap_used_percent'] = HealthCollector._percent(
+                meminfo['SwapTotal'] - meminfo.get('SwapFree', 0), meminfo['SwapTotal']) or 0.0
+
+        # Disks: `df -P` lines are "Filesystem Size Used Avail Capacity Mounted-on"
+        disks = {}
+        for line in sections.get('df', [])[1:]:
+            parts = line.split()
+            if len(parts) < 6:
+                continue
+            filesystem, mount = parts[0], ' '.join(parts[5:])
+            if filesystem in IGNORED_FILESYSTEMS or is_ignored_mount(mount):
+                continue
+            size_kb, used_kb, available_kb = (_to_int(p) for p in parts[1:4])
+            if size_kb is None or used_kb is None or available_kb is None:
+                continue
+            disks[mount] = {
+                'mount': mount,
+                'size_kb': size_kb,
+                'used_percent': HealthCollector._percent(used_kb, used_kb + available_kb),
+                'inode_used_percent': None
+            }
+        for line in sections.get('dfi', [])[1:]:
+            parts = line.split()
+            mount = ' '.join(parts[5:])
+            if len(parts) >= 6 and mount in disks and parts[1].isdigit() and parts[2].isdigit() and int(parts[1]):
+                disks[mount]['inode_used_percent'] = HealthCollector._percent(int(parts[2]), int(parts[1]))
+        HealthCollector._set_disks(record, list(disks.values()))
+        return record
+
+    @staticmethod
+    def parse_windows_output(output):
+        """Parse the key=value output of WINDOWS_HEALTH_COMMAND."""
+        record = HealthCollector.empty_record()
+        values = {}
+        disks = []
+        for line in output.splitlines():
+            key, _, value = line.strip().partition('=')
+            if key == 'disk':
+                device, size, free = (value.split(',') + ['', ''])[:3]
+                if size.isdigit() and int(size) and (free.isdigit() or not free):
+                    size, free = int(size), int(free or 0)
+                    disks.append({
+                        'mount': device,
+                        'size_kb': size // 1024,
+                        'used_percent': HealthCollector._percent(size - free, size),
+                        'inode_used_percent': None
+                    })
+            elif value:
+                try:
+                    values[key] = float(value)
+                except ValueError:
+                    pass
+
+        if 'cpu_percent' in values:
+            record['cpu_percent'] = round(values['cpu_percent'], 1)
+        if 'cpu_count' in values:
+            record['cpu_count'] = int(values['cpu_count'])
+        if values.get('mem_total_kb'):
+            total = values['mem_total_kb']
+            record['mem_total_kb'] = int(total)
+            record['mem_used_percent'] = HealthCollector._percent(total - values.get('mem_free_kb', 0), total)
+        if 'swap_total_mb' in values:
+            record['swap_total_kb'] = int(values['swap_total_mb'] * 1024)
+            record['swap_used_percent'] = HealthCollector._percent(
+                values.get('swap_used_mb', 0), values['swap_total_mb']) or 0.0
+        HealthCollector._set_disks(record, disks)
+        return record
+
+    @staticmethod
+    def _set_disks(record, disks):
+        record['disks'] = disks
+        used = [d['used_percent'] for d in disks if d['used_percent'] is not None]
+        inodes = [d['inode_used_percent'] for d in disks if d['inode_used_percent'] is not None]
+        record['disk_max_used_percent'] = max(used) if used else None
+        record['inode_max_used_percent'] = max(inodes) if inodes else None
+
+    @staticmethod
+    def evaluate(record, thresholds=None):
+        """
+        Compare a record's metrics with the thresholds and set 'status' and 'alerts'.
+        - thresholds: Optional dict overriding HEALTH_THRESHOLDS.
+        """
+        thresholds = thresholds or HEALTH_THRESHOLDS
+        values = {
+            'cpu_percent': record['cpu_percent'],
+            'mem_used_percent': record['mem_used_percent'],
+            'swap_used_percent': record['swap_used_percent'] if record['swap_total_kb'] else None,
+            'disk_max_used_percent': record['disk_max_used_percent'],
+            'inode_max_used_percent': record['inode_max_used_percent'],
+            'load_per_cpu': None
+        }
+        if record['load_1'] is not None and record['cpu_count']:
+            values['load_per_cpu'] = round(record['load_1'] / record['cpu_count'], 2)
+
+        if all(value is None for value in values.values()):
+            record['status'] = 'Unknown'
+            record['error'] = record['error'] or 'Unrecognized health output'
+            return record
+
+        status = 'Healthy'
+        alerts = []
+        for name, value in values.items():
+            if value is None or name not in thresholds:
+                continue
+            warning, critical = thresholds[name]
+            if value >= critical:
+                status = 'Critical'
+                alerts.append(f"{name} is critical: {value}")
+            elif value >= warning:
+                if status != 'Critical':
+                    status = 'Warning'
+                alerts.append(f"{name} is high: {value}")
+        record['status'] = status
+        record['alerts'] = alerts
+        return record
+
+    @staticmethod
+    def format_record(record):
+        """Render a health record as short human readable text (for notifications)."""
+        if record['error'] and record['status'] in ('Unreachable', 'Unknown'):
+            return f"Status: {record['status']}\n{record['error']}"
+        lines = [
+            f"Status: {record['status']}",
+            f"CPU: {record['cpu_percent']}% (load {record['load_1']} on {record['cpu_count']} CPUs)",
+            f"Memory: {record['mem_used_percent']}% used, swap {record['swap_used_percent']}% used"
+        ]
+        for disk in record['disks']:
+            lines.append(f"Disk {disk['mount']}: {disk['used_percent']}% used, inodes {disk['inode_used_percent']}%")
+        lines.extend(record['alerts'])
+        return "\n".join(lines)
@@ -0,0 +1,262 @@
+# http_utils.py
+
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # Only required when HTTP/2 is enabled
+    httpx = None
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))  # seconds to open a connection
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))  # seconds to wait between bytes of a response
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 3))  # retries after a connection error, 429 or 5xx
+HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', 0.5))  # first wait between retries, doubled after each one
+HTTP_MAX_RETRY_AFTER = float(os.getenv('HTTP_MAX_RETRY_AFTER', 30))  # longest Retry-After waited for, in seconds
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))  # keep-alive connections kept per host
+HTTP_HTTP2 = os.getenv('HTTP_HTTP2', '0') == '1'  # use HTTP/2 through httpx (needs httpx[http2])
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A POST may already have acted, so it is only retried when the server asks for it
+POST_RETRY_STATUSES = (429, 503)
+
+
+def _post_retryable(status_code, retry_after):
+    return status_code in POST_RETRY_STATUSES and bool(retry_after)
+
+
+class _Retry(Retry):
+    """
+    Retry policy of the pooled sessions. GET and the other idempotent methods are retried
+    after connection and read errors and on RETRY_STATUSES. A POST is retried after failing
+    to connect, and on 429/503 only with a Retry-After header; never after a read error.
+    A response asking for a longer wait than max_retry_after is returned instead of retried.
+    """
+
+    def __init__(self, *args, max_retry_after=HTTP_MAX_RETRY_AFTER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs):
+        kwargs.setdefault('max_retry_after', self.max_retry_after)
+        return super().new(**kwargs)
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == 'POST':
+            return bool(self.total) and _post_retryable(status_code, has_retry_after)
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # With raise_on_status=False the pool hands back the response when retries are given up
+        if response is not None and self.respect_retry_after_header:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > self.max_retry_after:
+                raise MaxRetryError(_pool, url, ResponseError(
+                    f"Retry-After of {retry_after:g} seconds is above the {self.max_retry_after:g} second limit"))
+        return super().increment(method, url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace)
+
+
+class Http2Response:
+    """An httpx response with the parts of the requests.Response interface the integrations use."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def content(self):
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def iter_lines(self):
+        for line in self._response.iter_lines():
+            yield line.encode('utf-8')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpClient:
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT, retries=HTTP_RETRIES,
+                 backoff=HTTP_BACKOFF, pool_size=HTTP_POOL_SIZE, http2=HTTP_HTTP2,
+                 max_retry_after=HTTP_MAX_RETRY_AFTER):
+        """
+        Shared client for the outbound REST integrations (Splunk, Slack). Each host gets its own
+        keep-alive connection pool, so repeated calls skip DNS, TCP and TLS setup. Every request
+        has a timeout and is retried with exponential backoff after a connection error or a
+        429/5xx response (honouring Retry-After); latency and errors are recorded per endpoint.
+        A POST is only retried when it failed to connect or got a 429/503 with Retry-After.
+        - connect_timeout: Seconds to open a connection.
+        - read_timeout: Seconds to wait for the server between bytes of a response.
+        - retries: Retries after the first attempt.
+        - backoff: First wait between retries in seconds, doubled after each retry.
+        - pool_size: Keep-alive connections kept per host.
+        - http2: Use HTTP/2 through httpx; requires the 'httpx' package with its 'http2' extra.
+        - max_retry_after: Longest Retry-After in seconds that is waited for; a response asking
+          for more is returned to the caller straight away.
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.pool_size = pool_size
+        self.http2 = http2
+        self._sessions = {}  # scheme://host:port -> requests.Session or httpx.Client
+        self._metrics = {}  # endpoint -> counters
+        self._lock = threading.Lock()
+
+    def _retry(self):
+        return _Retry(total=self.retries, backoff_factor=self.backoff, status_forcelist=RETRY_STATUSES,
+                      respect_retry_after_header=True, raise_on_status=False, max_retry_after=self.max_retry_after)
+
+    def _new_session(self):
+        if self.http2:
+            if httpx is None:
+                raise RuntimeError("HTTP/2 requires the 'httpx' package with its 'http2' extra.")
+            try:
+                limits = httpx.Limits(max_keepalive_connections=self.pool_size, max_connections=self.pool_size)
+                return httpx.Client(transport=httpx.HTTPTransport(http2=True, limits=limits, retries=self.retries))
+            except ImportError:
+                raise RuntimeError("HTTP/2 requires the 'httpx' package with its 'http2' extra.")
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=self._retry())
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session(self, url):
+        """
+        - Returns: The pooled session (or HTTP/2 client) for the URL's host, created on first use.
+        """
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._new_session()
+            return session
+
+    def _record(self, endpoint, elapsed, error=None, status=None, retries=0):
+        with self._lock:
+            metric = self._metrics.setdefault(endpoint, {'requests': 0, 'errors': 0, 'retries': 0,
+                                                         'total_seconds': 0.0, 'max_seconds': 0.0,
+                                                         'last_status': None, 'last_error': None})
+            metric['requests'] += 1
+            metric['retries'] += retries
+            metric['total_seconds'] += elapsed
+            metric['max_seconds'] = max(metric['max_seconds'], elapsed)
+            metric['last_status'] = status
+            if error is not None:
+                metric['errors'] += 1
+                metric['last_error'] = error
+
+    def _send_http2(self, client, method, url, timeout, stream, **kwargs):
+        """
+        Send through httpx, retrying 429/5xx with backoff (httpx itself only retries connecting).
+        A POST is retried only on 429/503 with Retry-After, and a Retry-After above
+        max_retry_after is not waited for, as in _Retry.
+        """
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        timeout = httpx.Timeout(read, connect=connect)
+        if 'data' in kwargs and isinstance(kwargs['data'], dict):
+            kwargs['data'] = {key: str(value) for key, value in kwargs['data'].items()}
+        attempt = 0
+        while True:
+            try:
+                request = client.build_request(method, url, timeout=timeout, **kwargs)
+                response = client.send(request, stream=stream)
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(str(e))
+            except httpx.HTTPError as e:
+                raise requests.exceptions.ConnectionError(str(e))
+            retry_after = response.headers.get('Retry-After', '')
+            if method.upper() == 'POST':
+                retryable = _post_retryable(response.status_code, retry_after)
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+            delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+            if not retryable or attempt >= self.retries or delay > self.max_retry_after:
+                return Http2Response(response), attempt
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def request(self, method, url, endpoint=None, timeout=None, stream=False, **kwargs):
+        """
+        Send a request through the host's pool.
+        - endpoint: Name the latency and errors are recorded under (default: method and URL path).
+          Pass one for URLs containing IDs, such as a Splunk job's sid.
+        - timeout: Seconds, or (connect, read) seconds (default: the client's timeouts).
+        - stream: Do not read the body before returning; use the response as a context manager.
+        - kwargs: Passed to requests (headers, params, data, json).
+        - Returns: The response; a status of 400 or more counts as an error but is not raised.
+        """
+        endpoint = endpoint or f"{method.upper()} {urlsplit(url).netloc}{urlsplit(url).path}"
+        timeout = timeout or self.timeout
+        session = self.session(url)
+        started = time.monotonic()
+        try:
+            if self.http2:
+                response, retries = self._send_http2(session, method, url, timeout, stream, **kwargs)
+            else:
+                response = session.request(method, url, timeout=timeout, stream=stream, **kwargs)
+                history = getattr(getattr(response.raw, 'retries', None), 'history', None)
+                retries = len(history) if history else 0
+        except requests.exceptions.RequestException as e:
+            self._record(endpoint, time.monotonic() - started, error=str(e))
+            raise
+        error = f"HTTP {response.status_code}" if response.status_code >= 400 else None
+        self._record(endpoint, time.monotonic() - started, error=error, status=response.status_code, retries=retries)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def metrics(self):
+        """
+        - Returns: A dictionary mapping endpoint to its 'requests', 'errors', 'retries',
+          'avg_seconds', 'max_seconds', 'last_status' and 'last_error'.
+        """
+        with self._lock:
+            snapshot = {endpoint: dict(metric) for endpoint, metric in self._metrics.items()}
+        for metric in snapshot.values():
+            metric['avg_seconds'] = metric.pop('total_seconds') / max(1, metric['requests'])
+        return snapshot
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+# Shared by the outbound integrations
+http_client = HttpClient()
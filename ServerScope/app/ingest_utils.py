@@ -0,0 +1,201 @@
+# ingest_utils.py
+
+import os
+import time
+from datetime import datetime
+from sqlalchemy import insert, update, select, bindparam, func, case, or_
+from app.models import Server, DiscoveredHost, db
+
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 500))  # rows per statement and transaction
+
+# Server.status values written by scans; health check statuses are never overwritten by a scan
+SCAN_STATUSES = ('up', 'down')
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def dialect_insert(table):
+    """
+    Return a dialect-specific INSERT supporting upserts, or None when the database has none.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table)
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        return postgresql_insert(table)
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        return mysql_insert(table)
+    return None
+
+
+def upsert_statement(table, rows, index_elements, set_columns):
+    """
+    Build one multi-row INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE statement.
+    - rows: List of column dictionaries.
+    - index_elements: Column names of the unique key.
+    - set_columns: Callable(existing_columns, new_values) returning the dict of columns to update.
+    - Returns: The statement, or None when the dialect has no native upsert.
+    """
+    stmt = dialect_insert(table)
+    if stmt is None:
+        return None
+    stmt = stmt.values(rows)
+    if hasattr(stmt, 'on_duplicate_key_update'):
+        return stmt.on_duplicate_key_update(set_columns(table.c, stmt.inserted))
+    return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_columns(table.c, stmt.excluded))
+
+
+class ScanIngestor:
+    def __init__(self, chunk_size=INGEST_CHUNK_SIZE):
+        """
+        Bulk writer for scan results: rows are written with multi-row statements, one
+        transaction per chunk, instead of an add and commit per host.
+        - chunk_size: Rows per statement and transaction.
+        """
+        self.chunk_size = chunk_size
+        self.stats = {'rows': 0, 'seconds': 0.0}
+
+    def _timed(self, rows, started):
+        self.stats['rows'] += rows
+        self.stats['seconds'] += time.monotonic() - started
+
+    def rows_per_second(self):
+        return round(self.stats['rows'] / self.stats['seconds'], 1) if self.stats['seconds'] else None
+
+    def ingest_servers(self, scan_results):
+        """
+        Add servers for newly discovered IPs and refresh the scan status of known ones
+        with one upsert per chunk, keyed on the unique servers.ip_address index.
+        Servers that already carry a health check status keep it.
+        - scan_results: Result dictionaries from NetworkScanner.scan_network.
+        - Returns: A dictionary with 'existing_machines', 'new_machines' and 'total_machines'.
+        """
+        started = time.monotonic()
+        by_ip = {}
+        for result in scan_results:
+            by_ip[result['ip']] = result
+        ips = sorted(by_ip)
+        table = Server.__table__
+        existing_count = 0
+        new_count = 0
+
+        for chunk in _chunks(ips, self.chunk_size):
+            rows = [{
+                'name': by_ip[ip]['hostname'],
+                'ip_address': ip,
+                'username': "unknown",
+                'password': "unknown",
+                'os_type': "unknown",
+                'status': by_ip[ip]['status']
+            } for ip in chunk]
+            try:
+                # Read from the index only, for the existing/new counts
+                known = set(db.session.execute(
+                    select(table.c.ip_address).where(table.c.ip_address.in_(chunk))
+                ).scalars())
+                stmt = upsert_statement(table, rows, ['ip_address'], lambda current, new: {
+                    'status': case((or_(current.status.is_(None), current.status.in_(SCAN_STATUSES)), new.status),
+                                   else_=current.status)
+                })
+                if stmt is not None:
+                    db.session.execute(stmt)
+                else:
+                    self._ingest_servers_generic(table, rows, known)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            existing_count += len(known)
+            new_count += len(chunk) - len(known)
+        self._timed(len(ips), started)
+        return {
+            'existing_machines': existing_count,
+            'new_machines': new_count,
+            'total_machines': len(scan_results)
+        }
+
+    def _ingest_servers_generic(self, table, rows, known):
+        """Insert-then-update fallback for databases without a native upsert."""
+        new_rows = [row for row in rows if row['ip_address'] not in known]
+        updates = [{'b_ip_address': row['ip_address'], 'b_status': row['status']}
+                   for row in rows if row['ip_address'] in known]
+        if new_rows:
+            db.session.execute(insert(table).values(new_rows))
+        if updates:
+            db.session.execute(
+                update(table)
+                .where(table.c.ip_address == bindparam('b_ip_address'))
+                .where(or_(table.c.status.is_(None), table.c.status.in_(SCAN_STATUSES)))
+                .values(status=bindparam('b_status')),
+                updates
+            )
+
+    def upsert_discovered(self, probed, scan_results, now=None):
+        """
+        Write the discovery state of every probed address: hosts in scan_results are
+        up, the rest down. Uses a native upsert where the database has one.
+        - Returns: The number of rows written.
+        """
+        started = time.monotonic()
+        now = now or datetime.utcnow()
+        up = {result['ip']: result for result in scan_results if result['status'] == 'up'}
+        rows = []
+        for address in sorted(set(probed) | set(up)):
+            result = up.get(address)
+            hostname = result['hostname'] if result and result['hostname'] != "Unknown" else None
+            rows.append({
+                'ip_address': address,
+                'hostname': hostname,
+                'first_seen': now if result else None,
+                'last_seen': now if result else None,
+                'last_checked': now,
+                'last_status': 'up' if result else 'down'
+            })
+
+        table = DiscoveredHost.__table__
+        for chunk in _chunks(rows, self.chunk_size):
+            stmt = upsert_statement(table, chunk, ['ip_address'], lambda current, new: {
+                'hostname': func.coalesce(new.hostname, current.hostname),
+                'first_seen': func.coalesce(current.first_seen, new.first_seen),
+                'last_seen': func.coalesce(new.last_seen, current.last_seen),
+                'last_checked': new.last_checked,
+                'last_status': new.last_status
+            })
+            try:
+                if stmt is not None:
+                    db.session.execute(stmt)
+                else:
+                    self._upsert_discovered_generic(table, chunk)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        self._timed(len(rows), started)
+        return len(rows)
+
+    def _upsert_discovered_generic(self, table, chunk):
+        """Select-then-write fallback for databases without a native upsert."""
+        known = set(db.session.execute(
+            select(table.c.ip_address).where(table.c.ip_address.in_([row['ip_address'] for row in chunk]))
+        ).scalars())
+        new_rows = [row for row in chunk if row['ip_address'] not in known]
+        updates = [{'b_' + key: value for key, value in row.items()} for row in chunk if row['ip_address'] in known]
+        if new_rows:
+            db.session.execute(insert(table).values(new_rows))
+        if updates:
+            db.session.execute(
+                update(table)
+                .where(table.c.ip_address == bindparam('b_ip_address'))
+                .values(hostname=func.coalesce(bindparam('b_hostname'), table.c.hostname),
+                        first_seen=func.coalesce(table.c.first_seen, bindparam('b_first_seen')),
+                        last_seen=func.coalesce(bindparam('b_last_seen'), table.c.last_seen),
+                        last_checked=bindparam('b_last_checked'),
+                        last_status=bindparam('b_last_status')),
+                updates
+            )
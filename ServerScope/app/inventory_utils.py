@@ -0,0 +1,82 @@
+# inventory_utils.py
+
+from app.command_utils import CommandExecutor
+from app.health_utils import HealthCollector, LINUX_HEALTH_COMMAND
+from app.nfs_utils import NFSUtils, NFS_LIST_COMMAND
+
+OS_INFO_COMMAND = "cat /etc/os-release 2>/dev/null; echo '==uname=='; uname -srm; echo '==hostname=='; hostname"
+
+
+class InventoryProbe:
+
+    @staticmethod
+    def commands():
+        """The named commands making up one inventory probe."""
+        return {
+            'health': LINUX_HEALTH_COMMAND,
+            'nfs_exports': NFS_LIST_COMMAND,
+            'os_info': OS_INFO_COMMAND
+        }
+
+    @staticmethod
+    def probe(server_ip, username, password, port=22, timeout=None):
+        """
+        Collect health metrics, NFS exports and OS details from a Linux server with a
+        single SSH handshake (see CommandExecutor.execute_ssh_batch).
+        - Returns: A dictionary with 'health', 'nfs_shares', 'os_info' and per-command 'errors'.
+        """
+        results = CommandExecutor.execute_ssh_batch(server_ip, username, password, InventoryProbe.commands(),
+                                                    port=port, timeout=timeout)
+        errors = {name: result['error'] for name, result in results.items() if result['error']}
+
+        health = results['health']
+        if health['error']:
+            health_record = HealthCollector.error_record(health['error'])
+        else:
+            health_record = HealthCollector.parse(health['stdout'], 'Linux')
+
+        # showmount exits non-zero on hosts that do not run an NFS server
+        exports = results['nfs_exports']
+        nfs_shares = []
+        if not exports['error'] and exports['exit_status'] == 0 and "no exports" not in exports['stdout'].lower():
+            nfs_shares = NFSUtils.parse_nfs_output(exports['stdout'])
+
+        os_info = results['os_info']
+        return {
+            'health': health_record,
+            'nfs_shares': nfs_shares,
+            'os_info': InventoryProbe.parse_os_info(os_info['stdout']) if not os_info['error'] else {},
+            'errors': errors
+        }
+
+    @staticmethod
+    def parse_os_info(output):
+        """
+        Parse /etc/os-release, `uname -srm` and `hostname` output.
+        - Returns: A dictionary with name, version, pretty_name, kernel, arch and hostname.
+        """
+        info = {'name': None, 'version': None, 'pretty_name': None, 'kernel': None, 'arch': None, 'hostname': None}
+        section = 'os-release'
+        for line in output.splitlines():
+            line = line.strip()
+            if line in ('==uname==', '==hostname=='):
+                section = line.strip('=')
+                continue
+            if not line:
+                continue
+            if section == 'os-release':
+                key, _, value = line.partition('=')
+                value = value.strip('"\'')
+                if key == 'NAME':
+                    info['name'] = value
+                elif key == 'VERSION_ID':
+                    info['version'] = value
+                elif key == 'PRETTY_NAME':
+                    info['pretty_name'] = value
+            elif section == 'uname':
+                parts = line.split()
+                info['kernel'] = ' '.join(parts[:2]) if len(parts) >= 2 else line
+                info['arch'] = parts[2] if len(parts) >= 3 else None
+            elif section == 'hostname':
+                info['hostname'] = line
+        return info
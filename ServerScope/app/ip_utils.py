@@ -0,0 +1,60 @@
+# ip_utils.py
+#
+# 16-byte encoding of IP addresses for range queries. IPv4 addresses are stored as
+# IPv4-mapped IPv6 (::ffff:a.b.c.d), so every address has the same width, byte order
+# matches numeric order, and a CIDR block is one contiguous range of an indexed
+# binary column (BLOB in SQLite, bytea in PostgreSQL, VARBINARY in MySQL).
+
+import ipaddress
+from sqlalchemy import or_, false
+
+_IPV4_MAPPED = 0xffff << 32
+
+
+def pack_ip(value):
+    """
+    Encode an IP address as 16 bytes.
+    - value: IP address string or ipaddress object.
+    - Returns: The encoded bytes, or None when value is not an IP address.
+    """
+    try:
+        address = ipaddress.ip_address(value.strip() if isinstance(value, str) else value)
+    except ValueError:
+        return None
+    number = int(address) | _IPV4_MAPPED if address.version == 4 else int(address)
+    return number.to_bytes(16, 'big')
+
+
+def unpack_ip(packed):
+    """Decode 16 bytes from pack_ip back to an IP address string."""
+    address = ipaddress.IPv6Address(packed)
+    return str(address.ipv4_mapped or address)
+
+
+def cidr_range(cidr):
+    """
+    First and last encoded address of a CIDR block.
+    - Raises: ValueError when cidr is not a network.
+    """
+    network = ipaddress.ip_network(cidr.strip(), strict=False)
+    return pack_ip(network.network_address), pack_ip(network.broadcast_address)
+
+
+def parse_cidrs(value):
+    """
+    Split a comma or space separated list of CIDR blocks.
+    - Returns: A list of ipaddress networks; raises ValueError on an invalid entry.
+    """
+    return [ipaddress.ip_network(cidr, strict=False) for cidr in value.replace(',', ' ').split()]
+
+
+def cidr_filter(column, cidrs):
+    """
+    SQL condition matching a pack_ip column against CIDR blocks, one indexed range per block.
+    - column: A column holding pack_ip values.
+    - cidrs: Iterable of CIDR strings or ipaddress networks.
+    """
+    ranges = [cidr_range(str(cidr)) for cidr in cidrs]
+    if not ranges:
+        return false()
+    return or_(*(column.between(start, end) for start, end in ranges))
@@ -0,0 +1,378 @@
+# log_analysis_utils.py
+
+import os
+import re
+import json
+import random
+from bisect import bisect_right
+from operator import add
+from itertools import islice, accumulate, count
+from datetime import datetime, timezone
+import yaml
+
+LOG_SAMPLE_SIZE = int(os.getenv('LOG_SAMPLE_SIZE', 100))  # messages kept per severity as a uniform sample
+LOG_TOP_MESSAGES = int(os.getenv('LOG_TOP_MESSAGES', 20))  # most frequent distinct messages reported per severity
+LOG_TRACKED_MESSAGES = int(os.getenv('LOG_TRACKED_MESSAGES', 1000))  # counters kept per severity to find them
+LOG_TIME_BUCKET = int(os.getenv('LOG_TIME_BUCKET', 3600))  # seconds per time bucket
+LOG_CLASSIFY_BATCH = int(os.getenv('LOG_CLASSIFY_BATCH', 2000))  # messages classified per matcher pass
+LOG_SEVERITY_RULES = os.getenv('LOG_SEVERITY_RULES')  # optional YAML or JSON file overriding DEFAULT_SEVERITY_RULES
+
+SEVERITIES = ('errors', 'warnings', 'info')
+
+# Digit runs (timestamps, pids, ids) are masked so repeats of the same message count as one
+_DIGITS = re.compile(r'\d+')
+
+# Keywords match whole words, case-insensitively; suffix keywords also match at the end of a
+# CamelCase word (ValueError, NullPointerException) or of the last part of a name qualified with
+# '.' or ':' (java.lang.nullpointerexception), but not of a plain word ("terror"). A keyword
+# directly preceded by a negation ("no errors", "non-fatal"), followed by "free" ("error-free")
+# or by a zero count ("failed=0", "errors: 0") does not count. Patterns are regexes matched
+# against the lower-cased message; those starting with a literal keep the combined matcher fast.
+# An explicit level field (JSON "level": "...", logfmt level=..., syslog <PRI>) decides the
+# severity on its own; syslog level names such as alert, crit and emerg count only there, since
+# as words they are common in ordinary messages ("user alert settings saved").
+DEFAULT_SEVERITY_RULES = {
+    'errors': {
+        'keywords': ['error', 'errors', 'err', 'fatal', 'critical', 'panic', 'exception', 'traceback',
+                     'failed', 'failure', 'segfault'],
+        'patterns': [r'out of memory', r'killed process \d+']
+    },
+    'warnings': {
+        'keywords': ['warn', 'warning', 'warnings', 'deprecated'],
+        'patterns': []
+    },
+    'suffix_keywords': ['error', 'exception'],
+    'negations': ['no', 'not', 'non', 'zero', '0', 'without'],
+    'level_fields': ['level', 'severity', 'loglevel', 'log_level'],
+    'levels': {
+        'errors': ['emerg', 'emergency', 'alert', 'crit', 'critical', 'err', 'error', 'fatal', 'severe', 'panic'],
+        'warnings': ['warn', 'warning']
+    }
+}
+
+SEVERITY_RANK = {'info': 0, 'warnings': 1, 'errors': 2}
+_RANKED = ('info', 'warnings', 'errors')
+_WORD_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789_')
+
+
+def _trie_alternatives(words):
+    """
+    Regex alternatives matching any of the words, factored by common prefixes so each
+    position is tested once per first character.
+    - Returns: One alternative per distinct first character.
+    """
+    root = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return [re.escape(char) + emit(child) for char, child in sorted(root.items()) if char]
+
+
+def splunk_time_to_epoch(value):
+    """
+    Convert a Splunk _time value (ISO 8601 string or epoch seconds) to epoch seconds.
+    - Returns: A float, or None when the value is missing or not a time.
+    """
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                moment = datetime.fromisoformat(value)
+                if moment.tzinfo is None:
+                    moment = moment.replace(tzinfo=timezone.utc)
+                return moment.timestamp()
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def substring_classify(message):
+    """Severity of a message, as analyze_logs classified it before SeverityClassifier."""
+    lowered = message.lower()
+    if "error" in lowered:
+        return 'errors'
+    if "warn" in lowered:
+        return 'warnings'
+    return 'info'
+
+
+class SeverityClassifier:
+    def __init__(self, rules=None):
+        """
+        Classify log messages by severity with one combined matcher compiled from a rule set.
+        Keywords and level-field markers are compiled into a single prefix-factored regex run
+        over a whole batch of lower-cased messages, so messages without any marker cost no
+        Python work; only matches are inspected. It is still about 12x slower than the plain
+        substring check it replaced (roughly 0.3M against 3.7M messages per second in
+        benchmarks/bench_severity_classifier.py); what it buys is accuracy, not speed.
+        - rules: Rule dictionary shaped like DEFAULT_SEVERITY_RULES; missing keys use the
+          defaults. Defaults to the LOG_SEVERITY_RULES file when set.
+        """
+        if rules is None and LOG_SEVERITY_RULES:
+            rules = SeverityClassifier.load_rules(LOG_SEVERITY_RULES)
+        rules = {**DEFAULT_SEVERITY_RULES, **(rules or {})}
+        self.keywords = {}
+        for severity in ('warnings', 'errors'):  # errors last, so a word listed under both is an error
+            for keyword in rules[severity].get('keywords', []):
+                self.keywords[keyword.lower()] = severity
+        self.suffix_keywords = frozenset(keyword.lower() for keyword in rules['suffix_keywords'])
+        self.levels = {value.lower(): severity for severity, values in rules['levels'].items() for value in values}
+        fields = [field.lower() for field in rules['level_fields']]
+
+        # Level markers; the value after them is read with an anchored match
+        triggers = [f'"{field}"' for field in fields] + [f'{field}=' for field in fields] + ['\n<']
+        self._field_value = re.compile('|'.join(
+            [rf'"(?:{"|".join(map(re.escape, fields))})"\s*:\s*"?([a-z]+)',
+             rf'(?:{"|".join(map(re.escape, fields))})=["\']?([a-z]+)',
+             r'\n<(\d{1,3})>']))
+        self._triggers = set(triggers)
+        # One flat alternation without groups, so the regex engine can skip ahead to the positions
+        # whose character can start a match. A pattern match is attributed by re-matching it.
+        alternatives = _trie_alternatives(set(self.keywords) | self._triggers)
+        self._patterns = []
+        for severity in ('errors', 'warnings'):
+            patterns = rules[severity].get('patterns', [])
+            if patterns:
+                alternatives.extend(patterns)
+                self._patterns.append((re.compile('|'.join(patterns)), severity))
+        self._matcher = re.compile('|'.join(alternatives))
+        negations = '|'.join(map(re.escape, rules['negations']))
+        self._negated_before = re.compile(rf'[^a-z0-9_](?:{negations})[ \t_-]+$') if negations else None
+        self._negated_after = re.compile(r'[ \t_-]free(?![a-z0-9_])|[ \t]*[=:][ \t]*["\']?0(?![a-z0-9_.])')
+
+    @staticmethod
+    def load_rules(path):
+        """Read a rule dictionary from a YAML or JSON file."""
+        with open(path, encoding='utf-8') as handle:
+            if path.endswith('.json'):
+                return json.load(handle)
+            return yaml.safe_load(handle)
+
+    @staticmethod
+    def _is_compound_suffix(original, lowered, offset, length):
+        """
+        Whether a suffix keyword found inside a word ends a compound word: the keyword is
+        capitalised in the original message (ValueError, IOError) or the word is the last
+        part of a name qualified with '.' or ':' (java.lang.nullpointerexception).
+        - offset, length: Position of the keyword in the lower-cased message.
+        """
+        # Offsets only line up with the original when lowering did not change the length
+        if len(original) == len(lowered):
+            keyword = original[offset:offset + length]
+            if keyword[0].isupper() and keyword[1:].islower():
+                return True
+        token = offset
+        while token and lowered[token - 1] in _WORD_CHARS:
+            token -= 1
+        return token >= 2 and lowered[token - 1] in '.:' and lowered[token - 2] in _WORD_CHARS
+
+    def _level(self, value):
+        if value.isdigit():
+            # Syslog PRI: facility * 8 + severity; 0-3 are errors, 4 is a warning
+            code = int(value) % 8
+            return 'errors' if code <= 3 else 'warnings' if code == 4 else 'info'
+        return self.levels.get(value, 'info')
+
+    def classify_batch(self, messages):
+        """
+        - messages: List of message strings.
+        - Returns: The list of their severities ('errors', 'warnings' or 'info').
+        """
+        # Lower-case each message on its own: some characters grow (e.g. 'İ'), so offsets come from the lowered text
+        originals = messages
+        messages = list(map(str.lower, messages))
+        text = '\n' + '\n'.join(messages)
+        # starts[i] is the newline in front of message i: the lengths of the messages before it plus i newlines
+        starts = list(map(add, accumulate(map(len, messages), initial=0), count()))
+        ranks = [0] * len(messages)
+        levels = {}
+        keywords = self.keywords
+        triggers = self._triggers
+        index = 0
+        for match in self._matcher.finditer(text):
+            start = match.start()
+            index = bisect_right(starts, start, index) - 1
+            word = match.group()
+            if word in triggers:
+                value = self._field_value.match(text, start)
+                if value is not None and index not in levels:
+                    levels[index] = self._level(value.group(value.lastindex))
+                continue
+            severity = keywords.get(word)
+            if severity is None:
+                severity = next((severity for pattern, severity in self._patterns if pattern.fullmatch(word)), None)
+                if severity is None:
+                    continue
+            else:
+                end = match.end()
+                if end < len(text) and text[end] in _WORD_CHARS:
+                    continue
+                if start and text[start - 1] in _WORD_CHARS:
+                    if word not in self.suffix_keywords or not self._is_compound_suffix(
+                            originals[index], messages[index], start - starts[index] - 1, len(word)):
+                        continue
+                elif self._negated_before is not None and self._negated_before.search(text, max(0, start - 12), start):
+                    continue
+                if self._negated_after.match(text, end):
+                    continue
+            rank = SEVERITY_RANK[severity]
+            if rank > ranks[index]:
+                ranks[index] = rank
+        severities = [_RANKED[rank] for rank in ranks]
+        for index, severity in levels.items():
+            severities[index] = severity
+        return severities
+
+    def classify(self, message):
+        return self.classify_batch([message])[0]
+
+    def __call__(self, message):
+        return self.classify(message)
+
+
+class FrequentMessages:
+    def __init__(self, capacity=LOG_TRACKED_MESSAGES):
+        """
+        Approximate most frequent messages of a stream with at most capacity counters
+        (Misra-Gries): any message making up more than 1/(capacity + 1) of the stream is kept,
+        and counts are lower bounds of the true counts.
+        """
+        self.capacity = max(1, capacity)
+        self.counts = {}
+        self.examples = {}  # key -> first message seen with that key
+
+    def add(self, key, message):
+        counts = self.counts
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.capacity:
+            counts[key] = 1
+            self.examples[key] = message
+        else:
+            # Each decrement round is paid for by the increments it cancels, so this is O(1) amortised
+            for other in list(counts):
+                counts[other] -= 1
+                if not counts[other]:
+                    del counts[other]
+                    del self.examples[other]
+
+    def top(self, n):
+        """- Returns: Up to n (message, count) tuples, most frequent first."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(self.examples[key], count) for key, count in ranked]
+
+
+class LogAnalyzer:
+    def __init__(self, classifier=None, sample_size=LOG_SAMPLE_SIZE, top_messages=LOG_TOP_MESSAGES,
+                 tracked_messages=LOG_TRACKED_MESSAGES, bucket_seconds=LOG_TIME_BUCKET, seed=None,
+                 batch_size=LOG_CLASSIFY_BATCH):
+        """
+        Single-pass severity analysis of search results in bounded memory. Counts per severity,
+        host and time bucket are exact; messages themselves are only kept as a reservoir sample
+        and as the approximate most frequent messages of each severity.
+        - classifier: SeverityClassifier, or any callable(message) returning 'errors', 'warnings'
+          or 'info'. Defaults to a SeverityClassifier with the configured rules.
+        - sample_size: Messages kept per severity.
+        - top_messages: Distinct messages reported per severity.
+        - tracked_messages: Counters per severity used to find the most frequent messages.
+        - bucket_seconds: Width of the time buckets, in seconds.
+        - seed: Seed of the sampling random generator, for reproducible samples.
+        - batch_size: Results read from the stream and classified together.
+        """
+        self.classifier = classifier or SeverityClassifier()
+        self.classify_batch = getattr(self.classifier, 'classify_batch', None) or \
+            (lambda messages: [self.classifier(message) for message in messages])
+        self.batch_size = max(1, batch_size)
+        self.sample_size = sample_size
+        self.top_messages = top_messages
+        self.bucket_seconds = bucket_seconds
+        self._random = random.Random(seed)
+        self.total = 0
+        self.counts = {severity: 0 for severity in SEVERITIES}
+        self.samples = {severity: [] for severity in SEVERITIES}
+        self.frequent = {severity: FrequentMessages(tracked_messages) for severity in SEVERITIES}
+        self.hosts = {}  # host -> {severity: count}
+        self.buckets = {}  # bucket start (epoch seconds) -> {severity: count}
+
+    def _bucket(self, value):
+        """Start of the time bucket of a Splunk _time value."""
+        moment = splunk_time_to_epoch(value)
+        return None if moment is None else int(moment // self.bucket_seconds * self.bucket_seconds)
+
+    def add(self, entry, severity=None):
+        """
+        Account for one search result (a dictionary with '_raw' and optionally 'host' and '_time').
+        - severity: The message's severity when already classified.
+        """
+        message = entry.get('_raw', '')
+        if severity is None:
+            severity = self.classify_batch([message])[0]
+        self.total += 1
+        seen = self.counts[severity] = self.counts[severity] + 1
+
+        # Reservoir sampling (algorithm R): every message of the severity is kept with equal probability
+        sample = self.samples[severity]
+        if len(sample) < self.sample_size:
+            sample.append(message)
+        else:
+            slot = self._random.randrange(seen)
+            if slot < self.sample_size:
+                sample[slot] = message
+
+        self.frequent[severity].add(_DIGITS.sub('#', message), message)
+
+        host = entry.get('host')
+        if host is not None:
+            per_host = self.hosts.get(host)
+            if per_host is None:
+                per_host = self.hosts[host] = {name: 0 for name in SEVERITIES}
+            per_host[severity] += 1
+
+        bucket = self._bucket(entry.get('_time'))
+        if bucket is not None:
+            per_bucket = self.buckets.get(bucket)
+            if per_bucket is None:
+                per_bucket = self.buckets[bucket] = {name: 0 for name in SEVERITIES}
+            per_bucket[severity] += 1
+
+    def consume(self, entries):
+        """Account for every result of an iterable, consuming it lazily a batch at a time; returns self."""
+        entries = iter(entries)
+        while True:
+            batch = list(islice(entries, self.batch_size))
+            if not batch:
+                return self
+            severities = self.classify_batch([entry.get('_raw', '') for entry in batch])
+            for entry, severity in zip(batch, severities):
+                self.add(entry, severity)
+
+    def summary(self):
+        """
+        - Returns: A dictionary with the sampled messages under 'errors', 'warnings' and 'info'
+          (the shape analyze_logs has always returned), plus 'total', 'counts', 'top'
+          ({severity: [(message, count)]}), 'hosts' and 'buckets' (sorted list of
+          (datetime, {severity: count}) tuples).
+        """
+        summary = {severity: list(self.samples[severity]) for severity in SEVERITIES}
+        summary.update({
+            'total': self.total,
+            'counts': dict(self.counts),
+            'top': {severity: self.frequent[severity].top(self.top_messages) for severity in SEVERITIES},
+            'hosts': {host: dict(counts) for host, counts in self.hosts.items()},
+            'buckets': [(datetime.fromtimestamp(start, timezone.utc), dict(counts))
+                        for start, counts in sorted(self.buckets.items())]
+        })
+        return summary
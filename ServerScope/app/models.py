@@ -2,9 +2,15 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
+from app.ip_utils import pack_ip
 
 db = SQLAlchemy()
 
+def _packed_ip_default(context):
+    """Fill ip_packed from ip_address on inserts that do not set it, including bulk Core inserts."""
+    return pack_ip(context.get_current_parameters().get('ip_address'))
+
 # User Model
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
@@ -49,6 +55,7 @@ class Server(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     ip_address = db.Column(db.String(45), nullable=False)  # To support IPv4 and IPv6
+    ip_packed = db.Column(db.LargeBinary(16), nullable=True, default=_packed_ip_default)  # see ip_utils.pack_ip
     username = db.Column(db.String(80), nullable=False)
     password = db.Column(db.String(128), nullable=False)  # Store securely
     os_type = db.Column(db.String(50), nullable=False)  # e.g., 'Linux', 'Windows'
@@ -56,6 +63,18 @@ class Server(db.Model):
     last_health_check = db.Column(db.DateTime)
     status = db.Column(db.String(50), nullable=True)  # 'Healthy', 'Warning', 'Critical', etc.
 
+    # One row per IP address (see migrations/versions/4f1c2a9b7d30_dedupe_servers_by_ip.py)
+    __table_args__ = (
+        db.Index('ix_servers_ip_address', 'ip_address', unique=True),
+        db.Index('ix_servers_name', 'name'),
+        db.Index('ix_servers_ip_packed', 'ip_packed'),
+    )
+
+    @validates('ip_address')
+    def _pack_ip_address(self, key, value):
+        self.ip_packed = pack_ip(value)
+        return value
+
     def set_password(self, password):
         """Set a hashed password for SSH/WinRM credentials."""
         self.password = generate_password_hash(password)
@@ -98,6 +117,19 @@ class SplunkConfig(db.Model):
     def __repr__(self):
         return f'<SplunkConfig {self.server_url}>'
 
+# Splunk log analysis saved for historical tracking (see SplunkUtils.save_analysis_to_db)
+class SplunkAnalysis(db.Model):
+    __tablename__ = 'splunk_analysis'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    error_logs = db.Column(db.Text, nullable=True)
+    warning_logs = db.Column(db.Text, nullable=True)
+    info_logs = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<SplunkAnalysis {self.id} at {self.created_at}>'
+
 # NFS Files Model for storing details of NFS shared files
 class NFSFile(db.Model):
     __tablename__ = 'nfs_files'
@@ -140,6 +172,133 @@ class NetworkScanResult(db.Model):
     total_machines_scanned = db.Column(db.Integer, nullable=False)
     existing_machines_count = db.Column(db.Integer, nullable=False)
     new_machines_count = db.Column(db.Integer, nullable=False)
+    scan_mode = db.Column(db.String(20), nullable=True, default='full')  # 'full' or 'incremental'
+    hosts_probed = db.Column(db.Integer, nullable=True)  # Addresses probed, up or not
+    network_range = db.Column(db.String(255), nullable=True)
+    hosts_added = db.Column(db.Integer, nullable=True)  # Hosts up now but not in the previous scan of the range
+    hosts_removed = db.Column(db.Integer, nullable=True)
+    hosts_changed = db.Column(db.Integer, nullable=True)  # Hostname changed
+    hosts_up = db.Column(db.Integer, nullable=True)  # Hosts up in the range after this scan
+    duration = db.Column(db.Float, nullable=True)  # Seconds the scan took
+    # Sorted packed IPs of the hosts up in the range, and the delta to the previous scan (see scan_diff_utils)
+    snapshot = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    delta = db.deferred(db.Column(db.LargeBinary, nullable=True))
+
+    __table_args__ = (db.Index('idx_scan_results_range_time', 'network_range', 'scan_time'),)
 
     def __repr__(self):
         return f'<NetworkScanResult {self.scan_time} - {self.total_machines_scanned} Machines>'
+
+# Range scanned on its own schedule; the interval adapts to how much the range changes (see scan_target_utils)
+class ScanTarget(db.Model):
+    __tablename__ = 'scan_targets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    network_range = db.Column(db.String(255), nullable=False, unique=True)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    interval = db.Column(db.Integer, nullable=False)  # Configured seconds between scans
+    current_interval = db.Column(db.Integer, nullable=False)  # Adapted seconds between scans
+    churn = db.Column(db.Float, nullable=True)  # Smoothed fraction of hosts added, removed or renamed per scan
+    next_run_at = db.Column(db.DateTime, nullable=True)  # None means due now
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_duration = db.Column(db.Float, nullable=True)  # Seconds
+    last_status = db.Column(db.String(20), nullable=True)  # Status of the last ScanJob
+    last_error = db.Column(db.Text, nullable=True)
+    last_report_id = db.Column(db.Integer, db.ForeignKey('network_scan_results.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    last_report = db.relationship('NetworkScanResult')
+
+    __table_args__ = (db.Index('idx_scan_targets_next_run', 'enabled', 'next_run_at'),)
+
+    def __repr__(self):
+        return f'<ScanTarget {self.name} {self.network_range} every {self.current_interval}s>'
+
+# Background network scan and its progress, polled by the scan results page (see scan_job_utils)
+class ScanJob(db.Model):
+    __tablename__ = 'scan_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    network_range = db.Column(db.String(255), nullable=False)
+    scan_mode = db.Column(db.String(20), nullable=False, default='incremental')  # 'full' or 'incremental'
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed', 'failed'
+    requested_by = db.Column(db.String(80), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    blocks_total = db.Column(db.Integer, nullable=False, default=0)
+    blocks_done = db.Column(db.Integer, nullable=False, default=0)
+    blocks_failed = db.Column(db.Integer, nullable=False, default=0)
+    hosts_total = db.Column(db.Integer, nullable=False, default=0)  # Addresses planned
+    hosts_probed = db.Column(db.Integer, nullable=False, default=0)
+    hosts_found = db.Column(db.Integer, nullable=False, default=0)  # Hosts that answered
+    new_machines = db.Column(db.Integer, nullable=False, default=0)
+    existing_machines = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('network_scan_results.id'), nullable=True)
+    target_id = db.Column(db.Integer, db.ForeignKey('scan_targets.id'), nullable=True)  # Set for scheduled scans
+
+    report = db.relationship('NetworkScanResult')
+    target = db.relationship('ScanTarget')
+
+    def __repr__(self):
+        return f'<ScanJob {self.id} {self.network_range} - {self.status}>'
+
+# Discovery state of every probed address, used to plan incremental scans
+class DiscoveredHost(db.Model):
+    __tablename__ = 'discovered_hosts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ip_address = db.Column(db.String(45), nullable=False, unique=True)
+    ip_packed = db.Column(db.LargeBinary(16), nullable=True, default=_packed_ip_default)  # see ip_utils.pack_ip
+    hostname = db.Column(db.String(255), nullable=True)
+    first_seen = db.Column(db.DateTime, nullable=True)  # First time the host answered; None if it never has
+    last_seen = db.Column(db.DateTime, nullable=True)  # Last time the host answered
+    last_checked = db.Column(db.DateTime, nullable=False)  # Last time the address was probed
+    last_status = db.Column(db.String(20), nullable=False)  # 'up' or 'down'
+
+    __table_args__ = (db.Index('idx_discovered_last_checked', 'last_checked'),
+                      db.Index('idx_discovered_ip_packed', 'ip_packed'))
+
+    @validates('ip_address')
+    def _pack_ip_address(self, key, value):
+        self.ip_packed = pack_ip(value)
+        return value
+
+    def __repr__(self):
+        return f'<DiscoveredHost {self.ip_address} - {self.last_status}>'
+
+# Management ports and OS family found by the fingerprint scan, cached per IP (see fingerprint_utils)
+class HostFingerprint(db.Model):
+    __tablename__ = 'host_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ip_address = db.Column(db.String(45), nullable=False, unique=True)
+    transport = db.Column(db.String(20), nullable=True)  # 'ssh', 'winrm', 'winrm-https' or None
+    os_type = db.Column(db.String(50), nullable=False, default='unknown')  # 'Linux', 'Windows' or 'unknown'
+    ssh_banner = db.Column(db.String(255), nullable=True)
+    open_ports = db.Column(db.String(100), nullable=True)  # Comma-separated
+    checked_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<HostFingerprint {self.ip_address} - {self.transport}>'
+
+# Health time series: one compressed blob per server, resolution and day (see timeseries_utils)
+class HealthSeries(db.Model):
+    __tablename__ = 'health_series'
+
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    resolution = db.Column(db.Integer, nullable=False)  # Seconds per slot: 60, 300 or 3600
+    day = db.Column(db.Date, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed uint16 slots, metric-major
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    server = db.relationship('Server', backref=db.backref('health_series', lazy='dynamic'))
+
+    __table_args__ = (db.UniqueConstraint('server_id', 'resolution', 'day', name='uq_health_series_slot'),)
+
+    def __repr__(self):
+        return f'<HealthSeries {self.server_id} {self.resolution}s {self.day}>'
@@ -1,63 +1,498 @@
-import nmap 
-from app.models import Server, NetworkScanResult, db
-from datetime import datetime
+import os
+import re
+import time
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.models import Server, NetworkScanResult, DiscoveredHost, db
+from app.ingest_utils import ScanIngestor
+from app.ip_utils import cidr_filter
+from app.scan_diff_utils import ScanDiff
+from app.discovery_utils import (TcpDiscoveryEngine, DISCOVERY_BACKEND, DISCOVERY_TCP_CONCURRENCY,
+                                  DISCOVERY_TCP_MAX_RATE)
+from app.fingerprint_utils import Fingerprinter, DISCOVERY_FINGERPRINT
+from datetime import datetime, timedelta
 import logging
 
+try:
+    import nmap
+except ImportError:  # Only required when the nmap backend is used
+    nmap = None
+
 # Setup logging
 logging.basicConfig(filename='network_scan.log', level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+NMAP_SHARD_PREFIX = int(os.getenv('NMAP_SHARD_PREFIX', 24))  # ranges are split into blocks of this size
+NMAP_MAX_WORKERS = int(os.getenv('NMAP_MAX_WORKERS', 8))  # nmap processes running at once
+NMAP_MAX_RATE = int(os.getenv('NMAP_MAX_RATE', 0))  # probes per second across all workers, 0 = nmap default
+NMAP_ARGUMENTS = '-sn'  # Ping scan
+NMAP_MAX_RANGE_ADDRESSES = int(os.getenv('NMAP_MAX_RANGE_ADDRESSES', 2 ** 20))  # largest range accepted, a /12
+
+# Incremental discovery: hosts seen up within DISCOVERY_ALIVE_TTL and silent addresses probed
+# within DISCOVERY_DOWN_RECHECK are skipped; a full sweep runs every DISCOVERY_FULL_SWEEP_INTERVAL.
+DISCOVERY_ALIVE_TTL = int(os.getenv('DISCOVERY_ALIVE_TTL', 3600))  # seconds
+DISCOVERY_DOWN_RECHECK = int(os.getenv('DISCOVERY_DOWN_RECHECK', 6 * 3600))  # seconds
+DISCOVERY_FULL_SWEEP_INTERVAL = int(os.getenv('DISCOVERY_FULL_SWEEP_INTERVAL', 7 * 86400))  # seconds
+DISCOVERY_MAX_TARGETS = int(os.getenv('DISCOVERY_MAX_TARGETS', 0))  # addresses per incremental scan, 0 = no limit
+# Largest range expanded address by address; larger or IPv6 ranges are only swept in full by nmap
+DISCOVERY_MAX_ADDRESSES = int(os.getenv('DISCOVERY_MAX_ADDRESSES', 65536))
+
+# A hostname (RFC 1123 labels); nmap octet ranges such as 10.0.0.1-50 also match
+_HOSTNAME = re.compile(r'^(?=.{1,253}$)[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?'
+                       r'(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*\.?$')
+
 class NetworkScanner:
-    def __init__(self, network_range='192.168.1.0/24'):
+    def __init__(self, network_range='192.168.1.0/24', max_workers=NMAP_MAX_WORKERS,
+                 shard_prefix=NMAP_SHARD_PREFIX, max_rate=NMAP_MAX_RATE, scanner_factory=None,
+                 backend=DISCOVERY_BACKEND, engine=None, fingerprint=DISCOVERY_FINGERPRINT, fingerprinter=None):
         """
         Initialize the network scanner with the network range to scan.
+        - network_range: CIDR, address or nmap target spec; several may be separated by spaces or commas.
+        - max_workers: Number of sub-blocks scanned concurrently.
+        - shard_prefix: Prefix length of the sub-blocks a larger CIDR is split into.
+        - max_rate: Global probes-per-second limit, divided between the workers.
+        - scanner_factory: Callable returning an nmap.PortScanner (one is created per worker thread).
+        - backend: 'nmap' to run nmap on each block, or 'tcp' for the built-in TCP connect engine.
+        - engine: Discovery engine used instead of nmap; any object whose scan(addresses) returns
+          result dictionaries. Defaults to a TcpDiscoveryEngine when backend is 'tcp'.
+        - fingerprint: Probe the management ports of new or changed hosts after the scan.
+        - fingerprinter: Fingerprinter used for that phase (enables it when given).
         """
         self.network_range = network_range
-        self.scanner = nmap.PortScanner()
+        self.max_workers = max(1, max_workers)
+        self.shard_prefix = shard_prefix
+        self.max_rate = max_rate
+        self.scanner_factory = scanner_factory or (nmap.PortScanner if nmap else None)
+        if engine is None and backend == 'tcp':
+            engine = TcpDiscoveryEngine(concurrency=max(1, DISCOVERY_TCP_CONCURRENCY // self.max_workers),
+                                        max_rate=max_rate or DISCOVERY_TCP_MAX_RATE)
+        elif engine is None and backend != 'nmap':
+            raise ValueError(f"Unknown discovery backend: {backend}")
+        self.engine = engine
+        if fingerprinter is None and fingerprint:
+            fingerprinter = Fingerprinter()
+        self.fingerprinter = fingerprinter
+        self.failed_shards = []
+        self.ingestor = ScanIngestor()
+        self._local = threading.local()
+
+    @staticmethod
+    def validate_range(network_range):
+        """
+        Check a user supplied network range before it reaches nmap's command line.
+        - network_range: Addresses, CIDRs or hostnames separated by spaces or commas.
+        - Returns: The targets joined by single spaces.
+        - Raises: ValueError if the range is empty, a target is not an address, CIDR or hostname
+          (anything starting with '-' would be read by nmap as an option), or the CIDRs cover
+          more than NMAP_MAX_RANGE_ADDRESSES addresses (0.0.0.0/0 would be 16M /24 blocks).
+        """
+        targets = network_range.replace(',', ' ').split()
+        if not targets:
+            raise ValueError("No network range given")
+        total = 0
+        for target in targets:
+            if target.startswith('-'):
+                raise ValueError(f"{target} is not an address, CIDR or hostname")
+            try:
+                total += ipaddress.ip_network(target, strict=False).num_addresses
+            except ValueError:
+                if not _HOSTNAME.match(target):
+                    raise ValueError(f"{target} is not an address, CIDR or hostname")
+        if total > NMAP_MAX_RANGE_ADDRESSES:
+            raise ValueError(f"the range covers {total} addresses, more than the {NMAP_MAX_RANGE_ADDRESSES} allowed")
+        return ' '.join(targets)
+
+    def shards(self):
+        """
+        Split the network range into the blocks handed to nmap.
+        - Returns: A list of target strings.
+        """
+        shards = []
+        for target in self.network_range.replace(',', ' ').split():
+            try:
+                network = ipaddress.ip_network(target, strict=False)
+            except ValueError:
+                shards.append(target)  # nmap-only syntax (e.g. 10.0.0.1-50 or a hostname) is scanned as is
+                continue
+            if network.prefixlen >= self.shard_prefix or network.version != 4:
+                shards.append(str(network))
+            else:
+                shards.extend(str(subnet) for subnet in network.subnets(new_prefix=self.shard_prefix))
+        return shards
+
+    def _scanner(self):
+        """PortScanner objects keep state per scan, so each worker thread gets its own."""
+        scanner = getattr(self._local, 'scanner', None)
+        if scanner is None:
+            if self.scanner_factory is None:
+                raise RuntimeError("The nmap backend requires the 'python-nmap' package.")
+            scanner = self._local.scanner = self.scanner_factory()
+        return scanner
+
+    def _arguments(self):
+        arguments = NMAP_ARGUMENTS
+        if self.max_rate:
+            arguments += f" --max-rate {max(1, self.max_rate // self.max_workers)}"
+        return arguments
+
+    def scan_shard(self, shard):
+        """
+        Scan one block with nmap, or with the discovery engine when one is set.
+        - Returns: A list of result dictionaries with 'ip', 'hostname' and 'status'.
+        """
+        if self.engine is not None:
+            addresses = NetworkScanner.shard_addresses(shard)
+            if addresses is None:
+                raise ValueError(f"{shard} is not an address, CIDR or address list")
+            return self.engine.scan(addresses)
+        scanner = self._scanner()
+        scanner.scan(hosts=shard, arguments=self._arguments())
+        results = []
+        for host in scanner.all_hosts():
+            status = scanner[host].state()
+            hostname = scanner[host].hostname() if scanner[host].hostname() else "Unknown"
+            results.append({
+                'ip': host,
+                'hostname': hostname,
+                'status': status
+            })
+        return results
+
+    def iter_scan(self, shards=None):
+        """
+        Scan every block on the worker pool and yield each block's results as it completes.
+        Failed blocks are logged and recorded in failed_shards.
+        - shards: Target strings to scan (defaults to shards() of the network range).
+        - Yields: (shard, results) tuples.
+        """
+        shards = self.shards() if shards is None else shards
+        self.failed_shards = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards) or 1),
+                                thread_name_prefix='nmap') as pool:
+            futures = {pool.submit(self.scan_shard, shard): shard for shard in shards}
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    yield shard, future.result()
+                except Exception as e:
+                    print(f"Network scan of {shard} failed: {e}")
+                    logger.error(f"Network scan of {shard} failed: {e}")
+                    self.failed_shards.append(shard)
 
-    def scan_network(self):
+    def scan_network(self, shards=None):
         """
-        Perform the network scan using nmap.
+        Perform the network scan, one block per worker.
+        - shards: Target strings to scan (defaults to shards() of the network range).
+        - Returns: The merged result dictionaries, ordered by IP address.
         """
         print(f"Scanning network: {self.network_range}")
+        shards = self.shards() if shards is None else shards
+        start = time.monotonic()
         try:
-            self.scanner.scan(hosts=self.network_range, arguments='-sn')  # Ping scan
             results = []
-            for host in self.scanner.all_hosts():
-                status = self.scanner[host].state()
-                hostname = self.scanner[host].hostname() if self.scanner[host].hostname() else "Unknown"
-                results.append({
-                    'ip': host,
-                    'hostname': hostname,
-                    'status': status
-                })
+            for shard, shard_results in self.iter_scan(shards):
+                results.extend(shard_results)
+            results.sort(key=lambda result: NetworkScanner._sort_key(result['ip']))
+            print(f"Scanned {len(shards)} blocks in {time.monotonic() - start:.1f}s, "
+                  f"{len(results)} hosts up, {len(self.failed_shards)} blocks failed.")
             return results
         except Exception as e:
             print(f"Network scan failed: {e}")
             logger.error(f"Network scan failed: {e}")
             return []
 
-    def compare_scan_results(self, scan_results):
+    @staticmethod
+    def _sort_key(ip):
+        try:
+            address = ipaddress.ip_address(ip)
+            return (address.version, int(address))
+        except ValueError:
+            return (99, 0)
+
+    def networks(self):
+        """
+        The CIDR blocks of the network range (nmap-only target syntax is ignored).
+        """
+        networks = []
+        for target in self.network_range.replace(',', ' ').split():
+            try:
+                networks.append(ipaddress.ip_network(target, strict=False))
+            except ValueError:
+                continue
+        return networks
+
+    def addresses(self):
+        """
+        List the IPv4 addresses covered by the network range (IPv6 and nmap-only target syntax are ignored).
+        - Raises: ValueError when the range holds more than DISCOVERY_MAX_ADDRESSES IPv4 addresses.
+        """
+        total = sum(network.num_addresses for network in self.networks() if network.version == 4)
+        if total > DISCOVERY_MAX_ADDRESSES:
+            raise ValueError(f"{self.network_range} has {total} addresses, more than the "
+                             f"{DISCOVERY_MAX_ADDRESSES} tracked address by address")
+        addresses = []
+        for shard in self.shards():
+            addresses.extend(NetworkScanner.shard_addresses(shard) or [])
+        return addresses
+
+    @staticmethod
+    def _host_count(network):
+        """Number of addresses network.hosts() yields (the whole block when it has 2 or fewer)."""
+        if network.num_addresses <= 2:
+            return network.num_addresses
+        return network.num_addresses - (2 if network.version == 4 else 1)
+
+    @staticmethod
+    def shard_size(shard):
+        """
+        Number of addresses a target string covers, computed without expanding it.
+        - Returns: The count, or 0 for nmap-only syntax (ranges like 10.0.0.1-50, hostnames).
+        """
+        size = 0
+        for target in shard.split():
+            try:
+                size += NetworkScanner._host_count(ipaddress.ip_network(target, strict=False))
+            except ValueError:
+                return 0
+        return size
+
+    @staticmethod
+    def shard_addresses(shard):
         """
-        Compare scan results with existing servers in the database.
+        The IPv4 addresses probed for a target string, or None when it cannot be expanded here:
+        nmap-only syntax, IPv6, or more than DISCOVERY_MAX_ADDRESSES addresses.
+        """
+        networks = []
+        for target in shard.split():
+            try:
+                network = ipaddress.ip_network(target, strict=False)
+            except ValueError:
+                return None
+            if network.version != 4:
+                return None
+            networks.append(network)
+        if sum(NetworkScanner._host_count(network) for network in networks) > DISCOVERY_MAX_ADDRESSES:
+            return None
+        addresses = []
+        for network in networks:
+            hosts = network.hosts() if network.num_addresses > 2 else network
+            addresses.extend(str(address) for address in hosts)
+        return addresses
+
+    def target_shards(self, addresses):
+        """Group individual addresses into space-separated target lists of one block's size."""
+        size = 2 ** (32 - self.shard_prefix)
+        return [' '.join(addresses[i:i + size]) for i in range(0, len(addresses), size)]
+
+    def full_sweep_due(self, now=None):
+        """True when no full scan of this range has been logged within DISCOVERY_FULL_SWEEP_INTERVAL."""
+        now = now or datetime.utcnow()
+        last_full = (NetworkScanResult.query
+                     .filter(NetworkScanResult.network_range == self.network_range,
+                             NetworkScanResult.scan_mode == 'full')
+                     .order_by(NetworkScanResult.scan_time.desc())
+                     .first())
+        return last_full is None or now - last_full.scan_time > timedelta(seconds=DISCOVERY_FULL_SWEEP_INTERVAL)
+
+    def plan_incremental(self, now=None, max_targets=DISCOVERY_MAX_TARGETS):
         """
-        existing_machines = 0
-        new_machines = 0
-        existing_ips = {server.ip_address for server in Server.query.with_entities(Server.ip_address).all()}
-        
-        for result in scan_results:
-            if result['ip'] in existing_ips:
-                existing_machines += 1
+        Choose the addresses worth probing: never-probed addresses first, then the ones
+        checked longest ago. Hosts seen up within DISCOVERY_ALIVE_TTL and silent addresses
+        probed within DISCOVERY_DOWN_RECHECK are skipped.
+        - max_targets: Optional cap on the number of addresses returned.
+        - Returns: A dictionary with 'targets' (ordered by priority), 'never_seen', 'stale' and 'skipped'.
+        - Raises: ValueError when the range is too large to track address by address (see addresses).
+        """
+        now = now or datetime.utcnow()
+        addresses = self.addresses()
+        wanted = set(addresses)
+        # Only this range's rows are read, as indexed range scans on ip_packed
+        known = {
+            row[0]: row for row in DiscoveredHost.query.with_entities(
+                DiscoveredHost.ip_address, DiscoveredHost.last_status, DiscoveredHost.last_checked)
+            .filter(cidr_filter(DiscoveredHost.ip_packed, self.networks()))
+            if row[0] in wanted
+        }
+        alive_cutoff = now - timedelta(seconds=DISCOVERY_ALIVE_TTL)
+        down_cutoff = now - timedelta(seconds=DISCOVERY_DOWN_RECHECK)
+
+        never_seen = []
+        stale = []
+        skipped = 0
+        for address in addresses:
+            row = known.get(address)
+            if row is None:
+                never_seen.append(address)
+            elif row[2] < (alive_cutoff if row[1] == 'up' else down_cutoff):
+                stale.append((row[2], address))
             else:
-                new_machines += 1
-                self.add_new_server(result)
-        
+                skipped += 1
+        stale.sort()
+        targets = never_seen + [address for _, address in stale]
+        if max_targets:
+            skipped += max(0, len(targets) - max_targets)
+            targets = targets[:max_targets]
+        return {'targets': targets, 'never_seen': len(never_seen), 'stale': len(stale), 'skipped': skipped}
+
+    def record_discovery(self, probed, scan_results, now=None):
+        """
+        Update DiscoveredHost for every probed address: the ones in scan_results are
+        marked up, the rest down.
+        - probed: Addresses that were probed.
+        - scan_results: Result dictionaries of the hosts that answered.
+        """
+        try:
+            self.ingestor.upsert_discovered(probed, scan_results, now)
+        except Exception as e:
+            print(f"Failed to record discovered hosts: {e}")
+            logger.error(f"Failed to record discovered hosts: {e}")
+
+    def scan_and_store(self, shards, mode='full', skipped=0, now=None, progress=None):
+        """
+        Scan blocks and persist each block's hosts as soon as it completes, so a long
+        scan keeps what it has found so far and its progress can be reported.
+        - shards: Target strings to scan.
+        - mode: 'full' or 'incremental', recorded with the results.
+        - skipped: Number of addresses left out of the scan by planning.
+        - progress: Optional callable receiving the counters after every block.
+        - Returns: The comparison dictionary plus 'scan_mode', 'hosts_probed', 'skipped' and 'scan_time'.
+        """
+        now = now or datetime.utcnow()
+        counters = {
+            'scan_mode': mode,
+            'blocks_total': len(shards),
+            'blocks_done': 0,
+            'blocks_failed': 0,
+            'hosts_total': sum(NetworkScanner.shard_size(shard) for shard in shards),
+            'hosts_probed': 0,
+            'hosts_found': 0,
+            'existing_machines': 0,
+            'new_machines': 0,
+            'total_machines': 0
+        }
+        if progress:
+            progress(dict(counters))
+        all_probed = []
+        all_found = []
+        # Failed blocks are not yielded, so their addresses are never recorded as down
+        for shard, scan_results in (self.iter_scan(shards) if shards else []):
+            probed = NetworkScanner.shard_addresses(shard) or []
+            all_probed.extend(probed)
+            all_found.extend(scan_results)
+            self.record_discovery(probed, scan_results, now)
+            comparison = self.compare_scan_results(scan_results)
+            for key in ('existing_machines', 'new_machines', 'total_machines'):
+                counters[key] += comparison[key]
+            counters['hosts_probed'] += len(probed)
+            counters['hosts_found'] += len(scan_results)
+            counters['blocks_done'] += 1
+            counters['blocks_failed'] = len(self.failed_shards)
+            if progress:
+                progress(dict(counters))
+        counters['blocks_failed'] = len(self.failed_shards)
+        if progress:
+            progress(dict(counters))
+
+        comparison = {key: counters[key] for key in ('existing_machines', 'new_machines', 'total_machines',
+                                                     'hosts_probed')}
+        comparison.update({'scan_mode': mode, 'skipped': skipped, 'scan_time': now})
+        comparison.update(self.diff_with_previous(all_probed, all_found))
+        changed_hosts = comparison.pop('changed_hosts', [])
+        if self.fingerprinter is not None:
+            comparison['fingerprinted'] = self.fingerprint_hosts(changed_hosts, now)
+        return comparison
+
+    def fingerprint_hosts(self, addresses, now=None):
+        """
+        Fingerprint hosts (cached per IP, see Fingerprinter) and fill in the os_type of
+        servers the scan created as 'unknown'.
+        - Returns: The number of hosts fingerprinted.
+        """
+        if not addresses:
+            return 0
+        try:
+            records = self.fingerprinter.fingerprint(addresses, now)
+            Fingerprinter.apply_to_servers(records)
+            return len(records)
+        except Exception as e:
+            print(f"Failed to fingerprint hosts: {e}")
+            logger.error(f"Failed to fingerprint hosts: {e}")
+            return 0
+
+    def diff_with_previous(self, probed, scan_results):
+        """
+        Compare the hosts up after this scan with the last scan of the same range.
+        - Returns: A dictionary with 'network_range', 'hosts_added', 'hosts_removed',
+          'hosts_changed', 'hosts_up' and the encoded 'snapshot' and 'delta' stored with the results,
+          plus 'changed_hosts', the addresses added or renamed since the previous scan.
+        """
+        try:
+            previous = (NetworkScanResult.query
+                        .filter(NetworkScanResult.network_range == self.network_range,
+                                NetworkScanResult.snapshot.isnot(None))
+                        .order_by(NetworkScanResult.scan_time.desc())
+                        .first())
+            previous_hosts = ScanDiff.decode_snapshot(previous.snapshot) if previous else []
+            current_hosts = ScanDiff.apply_scan(previous_hosts, probed, scan_results)
+            delta = ScanDiff.diff(previous_hosts, current_hosts)
+        except Exception as e:
+            print(f"Failed to compare with the previous scan: {e}")
+            logger.error(f"Failed to compare with the previous scan: {e}")
+            return {'network_range': self.network_range}
         return {
-            'existing_machines': existing_machines,
-            'new_machines': new_machines,
-            'total_machines': len(scan_results)
+            'network_range': self.network_range,
+            'hosts_added': len(delta['added']),
+            'hosts_removed': len(delta['removed']),
+            'hosts_changed': len(delta['changed']),
+            'hosts_up': len(current_hosts),
+            'snapshot': ScanDiff.encode_snapshot(current_hosts),
+            'delta': ScanDiff.encode_delta(delta),
+            'changed_hosts': [host[0] for host in delta['added'] + delta['changed']]
         }
 
+    def run_incremental_scan(self, now=None, force_full=False, progress=None):
+        """
+        Scan only never-probed and stale addresses, or the whole range when a full sweep is due.
+        - force_full: Scan the whole range regardless of the discovery state.
+        - progress: Optional callable receiving the counters after every block (see scan_and_store).
+        - Returns: The comparison dictionary plus 'scan_mode', 'hosts_probed', 'skipped', 'duration'
+          and 'report_id'.
+        """
+        now = now or datetime.utcnow()
+        plan = None
+        if not force_full and not self.full_sweep_due(now):
+            try:
+                plan = self.plan_incremental(now)
+            except ValueError as e:
+                print(f"Incremental scan not possible, sweeping the whole range: {e}")
+                logger.error(f"Incremental scan not possible, sweeping the whole range: {e}")
+        if plan is None:
+            mode, skipped, shards = 'full', 0, self.shards()
+        else:
+            mode, skipped, shards = 'incremental', plan['skipped'], self.target_shards(plan['targets'])
+
+        started = time.monotonic()
+        comparison = self.scan_and_store(shards, mode, skipped, now, progress)
+        comparison['duration'] = round(time.monotonic() - started, 3)
+        report = self.log_scan_results(comparison)
+        comparison['report_id'] = report.id if report else None
+        print(f"{mode.capitalize()} scan complete: probed {comparison['hosts_probed']} addresses, "
+              f"skipped {skipped}, new machines: {comparison['new_machines']}.")
+        return comparison
+
+    def compare_scan_results(self, scan_results):
+        """
+        Compare scan results with existing servers in the database, adding new ones
+        in bulk (see ScanIngestor.ingest_servers).
+        """
+        try:
+            return self.ingestor.ingest_servers(scan_results)
+        except Exception as e:
+            print(f"Failed to store scan results: {e}")
+            logger.error(f"Failed to store scan results: {e}")
+            return {'existing_machines': 0, 'new_machines': 0, 'total_machines': len(scan_results)}
+
     def add_new_server(self, scan_result):
         """
         Add a new server to the database from the scan result.
@@ -84,24 +519,35 @@ class NetworkScanner:
         """
         try:
             scan_result = NetworkScanResult(
-                scan_time=datetime.utcnow(),
+                scan_time=scan_data.get('scan_time') or datetime.utcnow(),
                 total_machines_scanned=scan_data['total_machines'],
                 existing_machines_count=scan_data['existing_machines'],
-                new_machines_count=scan_data['new_machines']
+                new_machines_count=scan_data['new_machines'],
+                scan_mode=scan_data.get('scan_mode', 'full'),
+                hosts_probed=scan_data.get('hosts_probed'),
+                network_range=scan_data.get('network_range'),
+                hosts_added=scan_data.get('hosts_added'),
+                hosts_removed=scan_data.get('hosts_removed'),
+                hosts_changed=scan_data.get('hosts_changed'),
+                hosts_up=scan_data.get('hosts_up'),
+                duration=scan_data.get('duration'),
+                snapshot=scan_data.get('snapshot'),
+                delta=scan_data.get('delta')
             )
             db.session.add(scan_result)
             db.session.commit()
             print(f"Network scan results logged: {scan_result.scan_time}")
+            return scan_result
         except Exception as e:
             print(f"Failed to log scan results: {e}")
             logger.error(f"Failed to log scan results: {e}")
+            return None
 
     def run_scan_and_store_results(self):
         """
         Run a full network scan, compare results, and store the results.
         """
-        scan_results = self.scan_network()
-        comparison = self.compare_scan_results(scan_results)
+        comparison = self.scan_and_store(self.shards())
         self.log_scan_results(comparison)
         print(f"Scan complete. Existing machines: {comparison['existing_machines']}, New machines: {comparison['new_machines']}.")
         return comparison
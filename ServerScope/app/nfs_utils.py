@@ -1,23 +1,33 @@
 # nfs_utils.py
 
 import os
-import paramiko
 from app.models import NFSFile, Server, db
+from app.command_utils import CommandExecutor
+from app.cache_utils import result_cache
 from datetime import datetime
 
+NFS_LIST_COMMAND = "showmount -e"  # Command to list NFS shares
+NFS_CACHE_TTL = int(os.getenv('NFS_CACHE_TTL', 60))  # seconds a share listing may be served from cache
+
 class NFSUtils:
     @staticmethod
-    def list_nfs_shares(server_ip, username, password):
+    def list_nfs_shares(server_ip, username, password, max_age=None):
         """
         List the NFS shares on a remote server.
         - server_ip: IP address of the remote server.
         - username: SSH username.
         - password: SSH password.
+        - max_age: If given, a listing up to this many seconds old may come from result_cache.
         - Returns: A list of dictionaries containing file path, size, and owner.
         """
-        command = "showmount -e"  # Command to list NFS shares
         try:
-            output = NFSUtils.execute_ssh_command(server_ip, username, password, command)
+            if max_age is None:
+                output = NFSUtils.execute_ssh_command(server_ip, username, password, NFS_LIST_COMMAND)
+            else:
+                output = result_cache.get_or_call(
+                    server_ip, NFS_LIST_COMMAND,
+                    lambda: NFSUtils.execute_ssh_command(server_ip, username, password, NFS_LIST_COMMAND),
+                    max_age=max_age, cache_if=lambda result: not result.startswith('Error'))
             if "no exports" in output.lower():
                 return []
             return NFSUtils.parse_nfs_output(output)
@@ -39,6 +49,7 @@ class NFSUtils:
         command = f"sudo exportfs -o {options} {share_path}"
         try:
             output = NFSUtils.execute_ssh_command(server_ip, username, password, command)
+            result_cache.invalidate(server_ip, NFS_LIST_COMMAND)
             return f"NFS share added: {share_path} with options {options}"
         except Exception as e:
             return f"Failed to add NFS share: {e}"
@@ -56,6 +67,7 @@ class NFSUtils:
         command = f"sudo exportfs -u {share_path}"
         try:
             output = NFSUtils.execute_ssh_command(server_ip, username, password, command)
+            result_cache.invalidate(server_ip, NFS_LIST_COMMAND)
             return f"NFS share removed: {share_path}"
         except Exception as e:
             return f"Failed to remove NFS share: {e}"
@@ -92,19 +104,8 @@ class NFSUtils:
         - command: Command to run on the remote server.
         - Returns: The output of the SSH command.
         """
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        try:
-            client.connect(server_ip, username=username, password=password)
-            stdin, stdout, stderr = client.exec_command(command)
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-            client.close()
-            if error:
-                return f"Error: {error}"
-            return output
-        except Exception as e:
-            return f"Error connecting to {server_ip}: {str(e)}"
+        # Shares the pooled connections of CommandExecutor instead of a new handshake per call
+        return CommandExecutor.execute_ssh_command(server_ip, username, password, command)
 
     @staticmethod
     def parse_nfs_output(output):
@@ -1,11 +1,14 @@
 from flask_mail import Mail, Message
-import requests
-from twilio.rest import Client
+from app.http_utils import http_client
 import os
-from app import app
 
-# Initialize Flask-Mail
-mail = Mail(app)
+try:
+    from twilio.rest import Client
+except ImportError:  # Only required when SMS notifications are sent
+    Client = None
+
+# Initialize Flask-Mail; bound to the app by scheduler.init_app
+mail = Mail()
 
 class NotificationUtils:
     @staticmethod
@@ -35,7 +38,7 @@ class NotificationUtils:
         """
         try:
             payload = {'text': message}
-            response = requests.post(webhook_url, json=payload)
+            response = http_client.post(webhook_url, endpoint='slack.webhook', json=payload)
             if response.status_code == 200:
                 print("Slack message sent successfully.")
             else:
@@ -54,6 +57,8 @@ class NotificationUtils:
             account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
             auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
             from_phone = os.environ.get('TWILIO_PHONE_NUMBER')
+            if Client is None:
+                raise RuntimeError("SMS notifications require the 'twilio' package.")
 
             client = Client(account_sid, auth_token)
             message = client.messages.create(
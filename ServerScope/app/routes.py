@@ -1,14 +1,27 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response, stream_with_context
 from flask_login import login_required, current_user, logout_user, login_user
-from app.models import Server, Job, NetworkScanResult as ScanReport, AuditLog, db, User
+from app.models import Server, Job, NetworkScanResult as ScanReport, ScanJob, ScanTarget, AuditLog, db, User
+from app.scan_job_utils import scan_jobs, ScanJobRunner
 from app.network_scan_utils import NetworkScanner
-from app.command_utils import CommandExecutor
+from app.scan_target_utils import ScanTargetScheduler, SCAN_TARGET_INTERVAL
+from app.command_utils import CommandExecutor, LINUX_OS_TYPES, WINDOWS_OS_TYPES, HEALTH_CACHE_TTL
 from app.logging_utils import LoggingUtils
 from app.auth import role_required
-from app.nfs_utils import NFSUtils
+from app.nfs_utils import NFSUtils, NFS_CACHE_TTL
+from app.fleet_utils import FleetExecutor
+from app.inventory_utils import InventoryProbe
+from app.server_lookup_utils import ServerLookup
+from app.ip_utils import parse_cidrs
+from app.scan_diff_utils import ScanDiff
+from app.health_utils import HealthCollector
+from app.timeseries_utils import health_store, HealthStore, SERIES_METRICS, RETENTION_DAYS
+from app.http_utils import http_client
+from app.splunk_cache_utils import splunk_cache
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
 import logging
+import json
+from datetime import datetime, timedelta
 
 # Setup logging for general errors
 logging.basicConfig(filename='error.log', level=logging.ERROR)
@@ -33,8 +46,17 @@ def about():
 @login_required
 def view_servers():
     if current_user.is_authenticated and current_user.role == 'admin':  # Example role check
-        servers = Server.query.all()
-        return render_template('servers.html', servers=servers)
+        # ?cidr=10.20.0.0/16[,192.168.1.0/24] limits the list to those blocks
+        cidr = request.args.get('cidr', '').strip()
+        servers = None
+        if cidr:
+            try:
+                servers = ServerLookup.in_cidrs(parse_cidrs(cidr)).all()
+            except ValueError:
+                flash(f"Invalid CIDR: {cidr}", "warning")
+        if servers is None:
+            servers = Server.query.all()
+        return render_template('servers.html', servers=servers, cidr=cidr)
     else:
         flash("You do not have permission to view this page.", "danger")
         return redirect(url_for('main.index'))
@@ -47,9 +69,15 @@ def add_server():
         return redirect(url_for('main.index'))
 
     name = request.form['name']
-    ip = request.form['ip']
+    ip = ServerLookup.normalize_ip(request.form['ip'])
     os = request.form['os']
 
+    # servers.ip_address is unique: one server per IP address
+    existing = ServerLookup.by_ips([ip]).get(ip)
+    if existing:
+        flash(f"Server {existing.name} already uses {ip}.", "warning")
+        return redirect(url_for('main.view_servers'))
+
     try:
         new_server = Server(name=name, ip=ip, os=os)
         db.session.add(new_server)
@@ -91,23 +119,186 @@ def execute_command(server_id):
 
     return render_template('command_form.html', server=server)
 
-@main.route('/scan_network')
+@main.route('/execute_command/<server_id>/stream', methods=['GET', 'POST'])
+@login_required
+def stream_command(server_id):
+    server = Server.query.get_or_404(server_id)
+
+    if request.method == 'GET':
+        return render_template('command_stream.html', server=server)
+
+    command = request.form['command']
+    username = request.form['username']
+    password = request.form['password']
+    server_ip = server.ip_address
+    os_type = (server.os_type or '').lower()
+
+    action_logger.log_action(f"Executed command on {server.name} ({server_ip}): {command}", current_user.username)
+
+    def generate():
+        # Server-sent events: one event per output chunk, named after its stream
+        if os_type in LINUX_OS_TYPES:
+            events = CommandExecutor.stream_ssh_command(server_ip, username, password, command)
+        elif os_type in WINDOWS_OS_TYPES:
+            # WinRM returns the whole output at once
+            events = [('stdout', CommandExecutor.execute_winrm_command(server_ip, username, password, command))]
+        else:
+            events = [('error', "Unsupported or unrecognized OS. Please check the server configuration.")]
+        try:
+            for stream, data in events:
+                yield f"event: {stream}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            error_logger.error(f"Error streaming command on {server.name}: {e}")
+            yield f"event: error\ndata: {json.dumps('Failed to execute command. Please check logs.')}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@main.route('/fleet/execute_command', methods=['GET', 'POST'])
+@login_required
+def execute_fleet_command():
+    if current_user.role != 'admin':
+        flash("You do not have permission to perform this action.", "danger")
+        return redirect(url_for('main.index'))
+
+    if request.method == 'GET':
+        return render_template('fleet_command_form.html')
+
+    command = request.form.get('command', '').strip()
+    os_type = request.form.get('os_type', '').strip() or None
+    tag = request.form.get('tag', '').strip() or None
+    try:
+        server_ids = [int(i) for i in request.form.get('server_ids', '').replace(' ', '').split(',') if i]
+    except ValueError:
+        flash("Server IDs must be numbers separated by commas.", "danger")
+        return redirect(url_for('main.execute_fleet_command'))
+    if not command:
+        flash("A command is required.", "danger")
+        return redirect(url_for('main.execute_fleet_command'))
+    # An empty selection would match every server in the inventory
+    if not (server_ids or os_type or tag):
+        flash("Select the servers by ID, operating system or tag.", "danger")
+        return redirect(url_for('main.execute_fleet_command'))
+
+    servers = FleetExecutor.select_servers(server_ids=server_ids, os_type=os_type, tag=tag)
+    if not servers:
+        flash("No servers matched the selection.", "warning")
+        return redirect(url_for('main.execute_fleet_command'))
+
+    action_logger.log_action(f"Executed fleet command on {len(servers)} servers: {command}", current_user.username)
+
+    def generate():
+        # One JSON document per line, in completion order, followed by a summary line
+        results = []
+        try:
+            for result in FleetExecutor().run_command(servers, command):
+                results.append(result)
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            error_logger.error(f"Error executing fleet command: {e}")
+        yield json.dumps({'summary': FleetExecutor.summarize(results)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@main.route('/scan_network', methods=['GET', 'POST'])
 @login_required
 def scan_network():
     if current_user.role != 'admin':
         flash("You do not have permission to perform this action.", "danger")
         return redirect(url_for('main.index'))
 
+    if request.method == 'GET':
+        recent_jobs = ScanJob.query.order_by(ScanJob.created_at.desc()).limit(20).all()
+        return render_template('scan_network.html', recent_jobs=recent_jobs)
+
+    # The scan runs in the background; the results page polls its progress
+    network_range = request.form.get('network_range', '').strip() or "192.168.1.0/24"
+    scan_mode = 'full' if request.form.get('full_scan') else 'incremental'
     try:
-        scanner = NetworkScanner(network_range="192.168.1.0/24")
-        new_machines, scan_report = scanner.scan_for_ansible_machines()
-        action_logger.log_action(f"Network scan performed by {current_user.username}", current_user.username)
-        flash(f"Network scan completed successfully.", "success")
+        network_range = NetworkScanner.validate_range(network_range)
+    except ValueError as e:
+        flash(f"Invalid network range: {e}.", "danger")
+        return redirect(url_for('main.scan_network'))
+    try:
+        job = scan_jobs.submit(network_range, scan_mode=scan_mode, requested_by=current_user.username)
+        action_logger.log_action(f"Network scan of {network_range} started by {current_user.username}",
+                                 current_user.username)
+        flash(f"Network scan of {network_range} started.", "success")
+        return redirect(url_for('main.scan_job', job_id=job.id))
     except Exception as e:
-        error_logger.error(f"Error performing network scan: {e}")
-        flash(f"Network scan failed. Please check logs.", "danger")
+        error_logger.error(f"Error starting network scan: {e}")
+        flash(f"Network scan failed to start. Please check logs.", "danger")
+        return redirect(url_for('main.scan_network'))
+
+@main.route('/scan_jobs/<int:job_id>')
+@role_required('admin')
+def scan_job(job_id):
+    job = ScanJob.query.get_or_404(job_id)
+    return render_template('scan_results.html', job=job, progress=ScanJobRunner.progress(job))
+
+@main.route('/scan_jobs/<int:job_id>/status')
+@role_required('admin')
+def scan_job_status(job_id):
+    """Progress of a background scan as JSON: hosts probed and found, percent done and ETA."""
+    job = ScanJob.query.get_or_404(job_id)
+    return ScanJobRunner.progress(job)
+
+@main.route('/scan_targets', methods=['GET', 'POST'])
+@role_required('admin')
+def scan_targets():
+    """Ranges scanned on their own adaptive schedule."""
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+        network_range = request.form.get('network_range', '').strip()
+        try:
+            interval = int(request.form.get('interval_minutes') or SCAN_TARGET_INTERVAL // 60) * 60
+        except ValueError:
+            flash("The interval must be a number of minutes.", "danger")
+            return redirect(url_for('main.scan_targets'))
+        if not name or not network_range:
+            flash("A name and a network range are required.", "danger")
+            return redirect(url_for('main.scan_targets'))
+        try:
+            network_range = NetworkScanner.validate_range(network_range)
+        except ValueError as e:
+            flash(f"Invalid network range: {e}.", "danger")
+            return redirect(url_for('main.scan_targets'))
+        if ScanTarget.query.filter_by(network_range=network_range).first():
+            flash(f"{network_range} is already a scan target.", "danger")
+            return redirect(url_for('main.scan_targets'))
+        try:
+            ScanTargetScheduler.add_target(name, network_range, interval)
+            action_logger.log_action(f"Scan target {name} ({network_range}) added by {current_user.username}",
+                                     current_user.username)
+            flash(f"Scan target {name} added.", "success")
+        except Exception as e:
+            db.session.rollback()
+            error_logger.error(f"Error adding scan target: {e}")
+            flash("Failed to add the scan target. Please check logs.", "danger")
+        return redirect(url_for('main.scan_targets'))
+
+    targets = ScanTarget.query.order_by(ScanTarget.name).all()
+    return render_template('scan_targets.html', targets=targets)
 
-    return render_template('scan_results.html', new_machines=new_machines, report=scan_report)
+@main.route('/scan_targets/<int:target_id>/toggle', methods=['POST'])
+@role_required('admin')
+def toggle_scan_target(target_id):
+    target = ScanTarget.query.get_or_404(target_id)
+    target.enabled = not target.enabled
+    db.session.commit()
+    flash(f"Scan target {target.name} {'enabled' if target.enabled else 'paused'}.", "success")
+    return redirect(url_for('main.scan_targets'))
+
+@main.route('/scan_targets/<int:target_id>/delete', methods=['POST'])
+@role_required('admin')
+def delete_scan_target(target_id):
+    target = ScanTarget.query.get_or_404(target_id)
+    ScanJob.query.filter_by(target_id=target.id).update({'target_id': None})
+    db.session.delete(target)
+    db.session.commit()
+    action_logger.log_action(f"Scan target {target.name} deleted by {current_user.username}", current_user.username)
+    flash(f"Scan target {target.name} deleted.", "success")
+    return redirect(url_for('main.scan_targets'))
 
 @main.route('/scan_reports')
 @login_required
@@ -115,6 +306,13 @@ def view_scan_reports():
     scan_reports = ScanReport.query.order_by(ScanReport.scan_time.desc()).all()
     return render_template('scan_reports.html', scan_reports=scan_reports)
 
+@main.route('/scan_reports/<int:report_id>')
+@login_required
+def view_scan_report(report_id):
+    """Hosts added, removed and renamed since the previous scan of the same range, from the stored delta."""
+    report = ScanReport.query.get_or_404(report_id)
+    return render_template('scan_report_detail.html', report=report, delta=ScanDiff.decode_delta(report.delta))
+
 @main.route('/admin')
 @role_required('admin')
 def admin_dashboard():
@@ -131,13 +329,65 @@ def server_health(server_id):
     server = Server.query.get_or_404(server_id)
 
     try:
-        health_output = CommandExecutor.get_server_health(server.ip, server.username, server.password)
+        # Page refreshes within HEALTH_CACHE_TTL are served from the result cache; ?refresh=1 forces a check
+        max_age = 0 if request.args.get('refresh') else HEALTH_CACHE_TTL
+        health = CommandExecutor.get_server_health(server.ip_address, server.username, server.password,
+                                                   os_type=server.os_type, max_age=max_age)
+        health_store.record(server.id, health)
         flash(f"Health check completed for server {server.name}.", "success")
     except Exception as e:
         error_logger.error(f"Error checking health of server {server.name}: {e}")
+        health = HealthCollector.error_record(str(e))
         flash(f"Health check failed. Please check logs.", "danger")
 
-    return render_template('server_health.html', server=server, health_output=health_output)
+    return render_template('server_health.html', server=server, health=health, metrics=SERIES_METRICS)
+
+@main.route('/server/<int:server_id>/health/series')
+@role_required('admin')
+def server_health_series(server_id):
+    """Return a metric's history as JSON: ?metric=cpu_percent&hours=24[&resolution=300&aggregate=max]"""
+    server = Server.query.get_or_404(server_id)
+    metric = request.args.get('metric', 'cpu_percent')
+    if metric not in SERIES_METRICS:
+        abort(400)
+    hours = request.args.get('hours', 24, type=int)
+    resolution = request.args.get('resolution', type=int)
+    aggregate = request.args.get('aggregate', 'avg')
+    if resolution is not None and resolution not in RETENTION_DAYS:
+        abort(400)
+    if aggregate not in ('avg', 'max'):
+        abort(400)
+    # Nothing is kept beyond the retention window of the requested (or coarsest) resolution
+    if not 0 < hours <= RETENTION_DAYS[resolution or max(RETENTION_DAYS)] * 24:
+        abort(400)
+    end = datetime.utcnow()
+    start = end - timedelta(hours=hours)
+    resolution = resolution or HealthStore.pick_resolution(start, end)
+    points = HealthStore.series(server.id, metric, start, end, resolution=resolution, aggregate=aggregate)
+    return {
+        'server_id': server.id,
+        'metric': metric,
+        'resolution': resolution,
+        'aggregate': aggregate,
+        'points': [[timestamp.isoformat(), value] for timestamp, value in points]
+    }
+
+@main.route('/integrations/metrics')
+@role_required('admin')
+def integration_metrics():
+    """Return the outbound HTTP latency and errors per endpoint, and the Splunk query cache counters, as JSON."""
+    return {'http': http_client.metrics(), 'splunk_cache': splunk_cache.stats()}
+
+@main.route('/server/<int:server_id>/inventory')
+@role_required('admin')
+def server_inventory(server_id):
+    """Health, NFS exports and OS details of a Linux server, collected over one SSH connection."""
+    server = Server.query.get_or_404(server_id)
+    if (server.os_type or '').lower() not in LINUX_OS_TYPES:
+        abort(400)
+    inventory = InventoryProbe.probe(server.ip_address, server.username, server.password)
+    health_store.record(server.id, inventory['health'])
+    return {'server_id': server.id, 'name': server.name, **inventory}
 
 @main.route('/audit_logs')
 @role_required('admin')  # Only admins can view logs
@@ -151,7 +401,8 @@ def list_nfs_shares(server_id):
     server = Server.query.get_or_404(server_id)
 
     try:
-        nfs_shares = NFSUtils.list_nfs_shares(server.ip_address, server.username, server.password)
+        max_age = 0 if request.args.get('refresh') else NFS_CACHE_TTL
+        nfs_shares = NFSUtils.list_nfs_shares(server.ip_address, server.username, server.password, max_age=max_age)
         NFSUtils.log_nfs_shares_to_db(server_id, nfs_shares)
         flash(f"NFS shares listed for server {server.name}.", "success")
     except Exception as e:
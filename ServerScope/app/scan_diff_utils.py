@@ -0,0 +1,135 @@
+# scan_diff_utils.py
+
+import json
+import zlib
+import struct
+from app.ip_utils import pack_ip, unpack_ip
+
+# Snapshot blob: version byte, host count, then the ascending addresses as varint gaps
+# between consecutive 128-bit pack_ip values (1 byte per host in a dense subnet),
+# followed by the newline-joined hostnames ('' when unknown); zlib-compressed.
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct('>BI')
+
+
+def _encode_gaps(packed_ips):
+    out = bytearray()
+    previous = 0
+    for packed in packed_ips:
+        number = int.from_bytes(packed, 'big')
+        gap = number - previous
+        previous = number
+        while gap >= 0x80:
+            out.append((gap & 0x7f) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def _decode_gaps(raw, offset, count):
+    """- Returns: (packed_ips, offset after the last varint)."""
+    packed_ips = []
+    number = 0
+    for _ in range(count):
+        gap = shift = 0
+        while True:
+            byte = raw[offset]
+            offset += 1
+            gap |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        number += gap
+        packed_ips.append(number.to_bytes(16, 'big'))
+    return packed_ips, offset
+
+
+class ScanDiff:
+    """
+    Host-level differences between scans of the same range. Each scan stores a snapshot
+    of the hosts up in the range as a sorted array of packed IPs, and the delta to the
+    previous snapshot is computed with a single merge pass over the two sorted arrays.
+    """
+
+    @staticmethod
+    def encode_snapshot(hosts):
+        """
+        - hosts: List of (packed_ip, hostname) tuples sorted by packed_ip.
+        - Returns: The compressed snapshot bytes.
+        """
+        ips = _encode_gaps(packed for packed, _ in hosts)
+        names = '\n'.join(hostname or '' for _, hostname in hosts).encode('utf-8')
+        return zlib.compress(_HEADER.pack(SNAPSHOT_VERSION, len(hosts)) + ips + names)
+
+    @staticmethod
+    def decode_snapshot(blob):
+        """Inverse of encode_snapshot; an empty or missing blob is an empty snapshot."""
+        if not blob:
+            return []
+        raw = zlib.decompress(blob)
+        version, count = _HEADER.unpack_from(raw)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported scan snapshot version {version}")
+        ips, offset = _decode_gaps(raw, _HEADER.size, count)
+        names = raw[offset:].decode('utf-8').split('\n') if count else []
+        return list(zip(ips, names))
+
+    @staticmethod
+    def apply_scan(previous, probed, scan_results):
+        """
+        Build the snapshot after a scan: hosts found are up, other probed addresses are
+        down, and addresses the scan did not probe keep their previous state.
+        - previous: The previous snapshot (list of (packed_ip, hostname)).
+        - probed: Addresses probed by this scan.
+        - scan_results: Result dictionaries of the hosts found up.
+        - Returns: The new snapshot, sorted by packed IP.
+        """
+        probed = {pack_ip(address) for address in probed}
+        hosts = {packed: hostname for packed, hostname in previous}
+        current = {}
+        for packed, hostname in hosts.items():
+            if packed not in probed:
+                current[packed] = hostname
+        for result in scan_results:
+            packed = pack_ip(result['ip'])
+            if packed is None or result.get('status', 'up') != 'up':
+                continue
+            hostname = result['hostname'] if result['hostname'] != "Unknown" else ''
+            current[packed] = hostname or hosts.get(packed, '')
+        return sorted(current.items())
+
+    @staticmethod
+    def diff(previous, current):
+        """
+        Merge two sorted snapshots.
+        - Returns: A dictionary with 'added' and 'removed' lists of (ip, hostname) and a
+          'changed' list of (ip, old_hostname, new_hostname).
+        """
+        added, removed, changed = [], [], []
+        i = j = 0
+        while i < len(previous) and j < len(current):
+            (old_ip, old_name), (new_ip, new_name) = previous[i], current[j]
+            if old_ip == new_ip:
+                if old_name != new_name:
+                    changed.append((unpack_ip(new_ip), old_name, new_name))
+                i += 1
+                j += 1
+            elif old_ip < new_ip:
+                removed.append((unpack_ip(old_ip), old_name))
+                i += 1
+            else:
+                added.append((unpack_ip(new_ip), new_name))
+                j += 1
+        removed.extend((unpack_ip(ip), name) for ip, name in previous[i:])
+        added.extend((unpack_ip(ip), name) for ip, name in current[j:])
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+    @staticmethod
+    def encode_delta(delta):
+        return zlib.compress(json.dumps(delta, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def decode_delta(blob):
+        if not blob:
+            return {'added': [], 'removed': [], 'changed': []}
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
@@ -0,0 +1,158 @@
+# scan_job_utils.py
+
+import os
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.models import ScanJob, db
+from app.network_scan_utils import NetworkScanner
+
+logger = logging.getLogger(__name__)
+
+SCAN_JOB_WORKERS = int(os.getenv('SCAN_JOB_WORKERS', 1))  # scans running at once per process
+
+FINISHED_STATUSES = ('completed', 'failed')
+UNFINISHED_STATUSES = ('queued', 'running')
+
+
+class ScanJobRunner:
+    def __init__(self, max_workers=SCAN_JOB_WORKERS, scanner_factory=NetworkScanner, on_finished=None):
+        """
+        Runs network scans as background jobs instead of inside the HTTP request.
+        Progress is written to the ScanJob row after every scanned block, so any web
+        worker can report it and hosts found so far are kept if the scan stops early.
+        - max_workers: Number of scans run at the same time.
+        - scanner_factory: Callable(network_range) returning a NetworkScanner.
+        - on_finished: Optional callable(job, comparison) called in the job's thread when it
+          ends; comparison is None if the scan failed.
+        """
+        self.scanner_factory = scanner_factory
+        self.on_finished = on_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan-job')
+        self._futures = {}
+
+    def submit(self, network_range, scan_mode='incremental', requested_by=None, app=None, target_id=None):
+        """
+        Queue a scan.
+        - network_range: Range passed to NetworkScanner.
+        - scan_mode: 'full' to sweep the whole range, 'incremental' to let the discovery state decide.
+        - requested_by: Username recorded with the job.
+        - app: Flask app used by the background thread (the current app by default).
+        - target_id: ScanTarget the job runs for, if it was started by the scan target scheduler.
+        - Returns: The new ScanJob.
+        """
+        app = app or current_app._get_current_object()
+        job = ScanJob(network_range=network_range, scan_mode=scan_mode, status='queued', requested_by=requested_by,
+                      target_id=target_id)
+        db.session.add(job)
+        db.session.commit()
+        self._futures[job.id] = self._executor.submit(self._run, app, job.id)
+        return job
+
+    @staticmethod
+    def fail_orphaned(before=None):
+        """
+        Mark jobs left queued or running by a process that stopped (e.g. a restart) as failed,
+        since no runner will pick them up again, along with the status of their scan targets.
+        Call at startup, before this process submits scans, where it is the only one running them.
+        - before: Only jobs created before this UTC datetime are touched (now by default).
+        - Returns: The number of jobs marked failed.
+        """
+        now = datetime.utcnow()
+        jobs = ScanJob.query.filter(ScanJob.status.in_(UNFINISHED_STATUSES),
+                                    ScanJob.created_at < (before or now)).all()
+        for job in jobs:
+            job.status = 'failed'
+            job.error = "Interrupted: the process running the scan stopped before it finished"
+            job.finished_at = now
+            if job.target is not None and job.target.last_status in UNFINISHED_STATUSES:
+                job.target.last_status = job.status
+                job.target.last_error = job.error
+        db.session.commit()
+        return len(jobs)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job submitted by this runner has finished."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def _run(self, app, job_id):
+        with app.app_context():
+            job = db.session.get(ScanJob, job_id)
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+
+            def progress(counters):
+                for key in ('scan_mode', 'blocks_total', 'blocks_done', 'blocks_failed', 'hosts_total',
+                            'hosts_probed', 'hosts_found', 'new_machines', 'existing_machines'):
+                    setattr(job, key, counters[key])
+                db.session.commit()
+
+            comparison = None
+            try:
+                scanner = self.scanner_factory(job.network_range)
+                comparison = scanner.run_incremental_scan(force_full=job.scan_mode == 'full', progress=progress)
+                job.report_id = comparison.get('report_id')
+                job.status = 'completed'
+            except Exception as e:
+                db.session.rollback()
+                print(f"Scan job {job_id} failed: {e}")
+                logger.error(f"Scan job {job_id} failed: {e}")
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                if self.on_finished is not None:
+                    try:
+                        self.on_finished(job, comparison)
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"Scan job {job_id} completion handler failed: {e}")
+                        logger.error(f"Scan job {job_id} completion handler failed: {e}")
+                db.session.remove()
+                self._futures.pop(job_id, None)
+
+    @staticmethod
+    def progress(job, now=None):
+        """
+        Progress of a job for the status endpoint.
+        - Returns: A dictionary of the job's counters plus 'percent', 'elapsed_seconds' and
+          'eta_seconds' (None until the first block has finished).
+        """
+        now = now or datetime.utcnow()
+        if job.hosts_total:
+            done, total = job.hosts_probed, job.hosts_total
+        else:
+            done, total = job.blocks_done + job.blocks_failed, job.blocks_total
+        finished = job.status in FINISHED_STATUSES
+        elapsed = ((job.finished_at or now) - job.started_at).total_seconds() if job.started_at else 0
+        eta = None
+        if not finished and done and total:
+            eta = round(elapsed / done * (total - done), 1)
+        return {
+            'id': job.id,
+            'network_range': job.network_range,
+            'status': job.status,
+            'scan_mode': job.scan_mode,
+            'finished': finished,
+            'blocks_total': job.blocks_total,
+            'blocks_done': job.blocks_done,
+            'blocks_failed': job.blocks_failed,
+            'hosts_total': job.hosts_total,
+            'hosts_probed': job.hosts_probed,
+            'hosts_found': job.hosts_found,
+            'new_machines': job.new_machines,
+            'existing_machines': job.existing_machines,
+            'percent': 100.0 if finished else (round(100.0 * done / total, 1) if total else 0.0),
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': eta,
+            'report_id': job.report_id,
+            'error': job.error
+        }
+
+
+scan_jobs = ScanJobRunner()
@@ -0,0 +1,172 @@
+# scan_target_utils.py
+
+import os
+import logging
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models import ScanTarget, db
+from app.network_scan_utils import NetworkScanner
+from app.scan_job_utils import ScanJobRunner
+
+logger = logging.getLogger(__name__)
+
+SCAN_TARGET_CONCURRENCY = int(os.getenv('SCAN_TARGET_CONCURRENCY', 2))  # scheduled scans running at once
+SCAN_TARGET_TICK = int(os.getenv('SCAN_TARGET_TICK', 60))  # seconds between checks for due targets
+SCAN_TARGET_INTERVAL = int(os.getenv('SCAN_TARGET_INTERVAL', 3600))  # default seconds between scans of a target
+SCAN_TARGET_MIN_INTERVAL = int(os.getenv('SCAN_TARGET_MIN_INTERVAL', 300))  # seconds, floor for any target
+# The adapted interval stays between interval * MIN_FACTOR and interval * MAX_FACTOR
+SCAN_TARGET_MIN_FACTOR = float(os.getenv('SCAN_TARGET_MIN_FACTOR', 0.25))
+SCAN_TARGET_MAX_FACTOR = float(os.getenv('SCAN_TARGET_MAX_FACTOR', 8))
+# Smoothed churn above CHURN_HIGH halves the interval, below CHURN_LOW grows it by BACKOFF
+SCAN_TARGET_CHURN_HIGH = float(os.getenv('SCAN_TARGET_CHURN_HIGH', 0.05))
+SCAN_TARGET_CHURN_LOW = float(os.getenv('SCAN_TARGET_CHURN_LOW', 0.01))
+SCAN_TARGET_BACKOFF = float(os.getenv('SCAN_TARGET_BACKOFF', 1.5))
+SCAN_TARGET_SMOOTHING = float(os.getenv('SCAN_TARGET_SMOOTHING', 0.5))  # weight of the latest scan's churn
+
+
+class ScanTargetScheduler:
+    def __init__(self, max_concurrency=SCAN_TARGET_CONCURRENCY, scanner_factory=NetworkScanner, app=None):
+        """
+        Runs the scans of every ScanTarget from a single scheduler job. Each tick queues the
+        targets that are due as ScanJobs on a bounded worker pool; when a scan finishes, the
+        target's interval is adapted to the churn it saw, so stable ranges are scanned less
+        often and changing ones more often.
+        - max_concurrency: Maximum number of targets scanned at the same time.
+        - scanner_factory: Callable(network_range) returning a NetworkScanner.
+        - app: Flask app whose context is pushed for database work.
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.app = app
+        self.runner = ScanJobRunner(max_workers=self.max_concurrency, scanner_factory=scanner_factory,
+                                    on_finished=self.record_run)
+        self._lock = threading.Lock()
+        self._in_flight = set()  # target ids with a queued or running job
+
+    def _context(self):
+        return self.app.app_context() if self.app is not None else nullcontext()
+
+    @staticmethod
+    def add_target(name, network_range, interval=SCAN_TARGET_INTERVAL):
+        """
+        Register a range to scan on its own schedule; its first scan is due immediately.
+        - interval: Seconds between scans before any adaptation (at least SCAN_TARGET_MIN_INTERVAL).
+        - Returns: The new ScanTarget.
+        """
+        interval = max(SCAN_TARGET_MIN_INTERVAL, int(interval))
+        target = ScanTarget(name=name, network_range=network_range, interval=interval, current_interval=interval)
+        db.session.add(target)
+        db.session.commit()
+        return target
+
+    @staticmethod
+    def churn(comparison):
+        """
+        Fraction of the range's hosts that appeared, disappeared or were renamed in one scan.
+        - Returns: The churn, or None when the scan did not compare with a previous snapshot.
+        """
+        if comparison.get('hosts_up') is None:
+            return None
+        changes = comparison['hosts_added'] + comparison['hosts_removed'] + comparison['hosts_changed']
+        return changes / max(1, comparison['hosts_up'] + comparison['hosts_removed'])
+
+    @staticmethod
+    def adapt(target, churn):
+        """
+        Smooth the churn and move the target's interval: halve it while the range churns
+        above SCAN_TARGET_CHURN_HIGH, grow it by SCAN_TARGET_BACKOFF while it stays below
+        SCAN_TARGET_CHURN_LOW, within the bounds derived from the configured interval.
+        - Returns: The new current_interval in seconds.
+        """
+        if target.churn is None:
+            target.churn = churn
+        else:
+            target.churn = SCAN_TARGET_SMOOTHING * churn + (1 - SCAN_TARGET_SMOOTHING) * target.churn
+        lowest = max(SCAN_TARGET_MIN_INTERVAL, int(target.interval * SCAN_TARGET_MIN_FACTOR))
+        highest = max(lowest, int(target.interval * SCAN_TARGET_MAX_FACTOR))
+        interval = target.current_interval
+        if target.churn >= SCAN_TARGET_CHURN_HIGH:
+            interval = interval / 2
+        elif target.churn <= SCAN_TARGET_CHURN_LOW:
+            interval = interval * SCAN_TARGET_BACKOFF
+        target.current_interval = int(min(highest, max(lowest, interval)))
+        return target.current_interval
+
+    def due_targets(self, now, limit):
+        """Enabled targets whose next run has passed and that are not being scanned, most overdue first."""
+        with self._lock:
+            in_flight = list(self._in_flight)
+        query = ScanTarget.query.filter(ScanTarget.enabled.is_(True),
+                                        db.or_(ScanTarget.next_run_at.is_(None), ScanTarget.next_run_at <= now))
+        if in_flight:
+            query = query.filter(ScanTarget.id.notin_(in_flight))
+        return (query.order_by(ScanTarget.next_run_at.isnot(None), ScanTarget.next_run_at)
+                .limit(limit)
+                .all())
+
+    def tick(self, now=None):
+        """
+        Queue the due targets, up to the free worker slots.
+        - Returns: A dictionary with the ids of the 'dispatched' jobs and the number 'in_flight'.
+        """
+        now = now or datetime.utcnow()
+        dispatched = []
+        with self._context():
+            app = self.app or current_app._get_current_object()
+            with self._lock:
+                free = self.max_concurrency - len(self._in_flight)
+            for target in (self.due_targets(now, free) if free > 0 else []):
+                # Provisional next run, so a target whose job is lost is retried after one interval
+                target.next_run_at = now + timedelta(seconds=target.current_interval)
+                target.last_status = 'queued'
+                db.session.commit()
+                with self._lock:
+                    self._in_flight.add(target.id)
+                try:
+                    job = self.runner.submit(target.network_range, scan_mode='incremental', requested_by='scheduler',
+                                             app=app, target_id=target.id)
+                    dispatched.append(job.id)
+                except Exception as e:
+                    with self._lock:
+                        self._in_flight.discard(target.id)
+                    print(f"Failed to queue the scan of target {target.name}: {e}")
+                    logger.error(f"Failed to queue the scan of target {target.name}: {e}")
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {'dispatched': dispatched, 'in_flight': in_flight}
+
+    def record_run(self, job, comparison):
+        """
+        Completion handler of the scheduled jobs: records the run on its target, adapts the
+        interval to the churn seen and schedules the next run from the start of this one.
+        """
+        try:
+            target = db.session.get(ScanTarget, job.target_id) if job.target_id else None
+            if target is None:
+                return
+            first_run = target.last_run_at is None
+            target.last_run_at = job.started_at
+            target.last_status = job.status
+            target.last_error = job.error
+            if comparison is not None:
+                target.last_duration = comparison.get('duration')
+                target.last_report_id = comparison.get('report_id')
+                churn = ScanTargetScheduler.churn(comparison)
+                # The first scan of a target finds every host "added", which says nothing about churn
+                if churn is not None and not first_run:
+                    ScanTargetScheduler.adapt(target, churn)
+            target.next_run_at = (job.started_at or datetime.utcnow()) + timedelta(seconds=target.current_interval)
+            db.session.commit()
+        finally:
+            with self._lock:
+                self._in_flight.discard(job.target_id)
+
+    def wait(self, job_ids, timeout=None):
+        """Block until the given jobs have finished (see ScanJobRunner.wait)."""
+        for job_id in job_ids:
+            self.runner.wait(job_id, timeout)
+
+
+# Shared by the scheduler, whose init_app gives it the Flask app
+scan_targets = ScanTargetScheduler()
@@ -1,11 +1,16 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from notification_utils import NotificationUtils
-from backup_utils import run_backup
-from command_utils import CommandExecutor
-from app import db
-from app.models import Server, Job
+from app.notification_utils import NotificationUtils, mail
+from app.backup_utils import run_backup
+from app.command_utils import CommandExecutor
+from app.health_utils import HealthCollector
+from app.timeseries_utils import health_store
+from app.sweep_utils import HealthSweeper, HEALTH_SWEEP_JITTER
+from app.scan_target_utils import scan_targets, SCAN_TARGET_TICK
+from app.scan_job_utils import ScanJobRunner
+from app.models import Server, Job, db
 from datetime import datetime
+from contextlib import nullcontext
 
 # Initialize scheduler with job store for persistence
 scheduler = BackgroundScheduler()
@@ -18,6 +23,12 @@ NOTIFICATION_EMAILS = ["admin@example.com"]
 SLACK_WEBHOOK = "https://hooks.slack.com/services/your/slack/webhook/url"
 SMS_NUMBER = "+1234567890"
 
+# Flask app the fleet-wide jobs push a context for, set by init_app
+flask_app = None
+
+def _app_context():
+    return flask_app.app_context() if flask_app is not None else nullcontext()
+
 def scheduled_health_check(server_id):
     """
     Health check for a specific server, identified by server_id.
@@ -29,19 +40,24 @@ def scheduled_health_check(server_id):
             raise ValueError(f"Server with ID {server_id} not found.")
 
         print(f"Running health check on server {server.name} ({server.ip_address})...")
-        health_output = CommandExecutor.get_server_health(server.ip_address, server.username, server.password)
-        
-        # If health check returns any critical issues, notify admins
-        if "critical" in health_output.lower():
+        health = CommandExecutor.get_server_health(server.ip_address, server.username, server.password,
+                                                   os_type=server.os_type)
+        server.status = health['status']
+        server.last_health_check = health['collected_at']
+        db.session.commit()
+        health_store.record(server.id, health)
+
+        # If any metric crossed its critical threshold, notify admins
+        if health['status'] == 'Critical':
             NotificationUtils.send_email(
                 subject="Critical Server Health Alert",
                 recipients=NOTIFICATION_EMAILS,
-                body=f"Server {server.name} has reported a critical issue.\n\nDetails:\n{health_output}"
+                body=f"Server {server.name} has reported a critical issue.\n\nDetails:\n{HealthCollector.format_record(health)}"
             )
             NotificationUtils.send_slack_message(SLACK_WEBHOOK, f"Critical issue detected on {server.name}.")
             NotificationUtils.send_sms(SMS_NUMBER, f"Critical issue detected on {server.name}.")
         else:
-            print(f"Server {server.name} is healthy.")
+            print(f"Server {server.name} is {health['status'].lower()}.")
     except Exception as e:
         print(f"Failed to run health check for server {server_id}: {e}")
         NotificationUtils.send_email(
@@ -50,6 +66,59 @@ def scheduled_health_check(server_id):
             body=f"Health check failed for server {server_id}. Error: {e}"
         )
 
+def notify_critical_health(target, health):
+    """
+    Alert admins that a server swept by the health sweep has turned Critical.
+    """
+    NotificationUtils.send_email(
+        subject="Critical Server Health Alert",
+        recipients=NOTIFICATION_EMAILS,
+        body=f"Server {target['name']} has reported a critical issue.\n\nDetails:\n{HealthCollector.format_record(health)}"
+    )
+    NotificationUtils.send_slack_message(SLACK_WEBHOOK, f"Critical issue detected on {target['name']}.")
+    NotificationUtils.send_sms(SMS_NUMBER, f"Critical issue detected on {target['name']}.")
+
+# One sweeper checks the whole fleet, a slot of servers per tick; init_app gives it the Flask app
+health_sweeper = HealthSweeper(on_critical=notify_critical_health)
+
+def scheduled_health_sweep():
+    """
+    Tick of the fleet health sweep: persists finished checks and dispatches the next slot.
+    """
+    try:
+        tick = health_sweeper.tick()
+        last_sweep = health_sweeper.stats()['last_sweep']
+        if tick['slot'] == 0 and last_sweep:
+            print(f"Health sweep: {last_sweep['hosts']} servers in {last_sweep['duration']}s, "
+                  f"max queue lag {last_sweep['queue_lag_max']}s, max schedule lag {last_sweep['schedule_lag_max']}s.")
+        if tick['skipped_in_flight']:
+            print(f"Health sweep slot {tick['slot']}: skipped {tick['skipped_in_flight']} servers still being checked.")
+    except Exception as e:
+        print(f"Health sweep tick failed: {e}")
+
+def scheduled_health_maintenance():
+    """
+    Flush buffered health samples and drop history older than the retention policy.
+    """
+    try:
+        with _app_context():
+            written = health_store.flush()
+            deleted = health_store.apply_retention()
+        print(f"Health history maintenance: {written} samples flushed, {deleted} expired rows removed.")
+    except Exception as e:
+        print(f"Health history maintenance failed: {e}")
+
+def scheduled_scan_targets():
+    """
+    Queue the network scans of the scan targets that are due.
+    """
+    try:
+        tick = scan_targets.tick()
+        if tick['dispatched']:
+            print(f"Scan targets: queued {len(tick['dispatched'])} scans, {tick['in_flight']} in flight.")
+    except Exception as e:
+        print(f"Scan target tick failed: {e}")
+
 def scheduled_backup(server_id):
     """
     Backup task for a specific server, identified by server_id.
@@ -98,25 +167,83 @@ def log_job_execution(job_id, status, result=None):
         print(f"Failed to log job execution for job {job_id}: {e}")
 
 # Function to add scheduled jobs
-def add_health_check_job(server_id, interval_minutes):
+def add_health_sweep_job(interval_minutes=None):
     """
-    Schedule a recurring health check job for a server.
-    - server_id: The ID of the server to run the health check on.
-    - interval_minutes: How often to run the health check, in minutes.
+    Schedule the single fleet-wide health sweep job.
+    - interval_minutes: How long a full pass over every server should take, in minutes.
+      Defaults to HEALTH_SWEEP_INTERVAL.
     """
     try:
-        job = scheduler.add_job(
-            scheduled_health_check,
+        if interval_minutes:
+            health_sweeper.interval = interval_minutes * 60
+        scheduler.add_job(
+            scheduled_health_sweep,
             trigger='interval',
-            minutes=interval_minutes,
-            args=[server_id],
-            id=f'health_check_{server_id}',
+            seconds=health_sweeper.tick_interval,
+            jitter=HEALTH_SWEEP_JITTER,
+            id='health_sweep',
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
-        print(f"Health check job scheduled for server {server_id} every {interval_minutes} minutes.")
+        print(f"Health sweep scheduled: {health_sweeper.slots} slots every {health_sweeper.interval} seconds.")
+    except Exception as e:
+        print(f"Failed to schedule the health sweep: {e}")
+
+def add_health_check_job(server_id, interval_minutes=None):
+    """
+    Include a server in the recurring health checks. Every server is covered by the
+    fleet-wide sweep, so this makes sure the sweep job is scheduled and removes any
+    per-server job left from earlier versions.
+    - server_id: The ID of the server to run the health check on.
+    - interval_minutes: Ignored; the sweep interval is a fleet-wide setting (HEALTH_SWEEP_INTERVAL,
+      or add_health_sweep_job) that one server cannot change.
+    """
+    try:
+        if scheduler.get_job(f'health_check_{server_id}'):
+            scheduler.remove_job(f'health_check_{server_id}')
+        if not scheduler.get_job('health_sweep'):
+            add_health_sweep_job()
+        print(f"Health checks for server {server_id} run in the fleet sweep every {health_sweeper.interval} seconds.")
     except Exception as e:
         print(f"Failed to schedule health check for server {server_id}: {e}")
 
+def add_health_maintenance_job(interval_hours=24):
+    """
+    Schedule the recurring flush and retention job for the health history.
+    - interval_hours: How often to apply the retention policy, in hours.
+    """
+    try:
+        scheduler.add_job(
+            scheduled_health_maintenance,
+            trigger='interval',
+            hours=interval_hours,
+            id='health_maintenance',
+            replace_existing=True
+        )
+        print(f"Health history maintenance scheduled every {interval_hours} hours.")
+    except Exception as e:
+        print(f"Failed to schedule health history maintenance: {e}")
+
+def add_scan_target_job(tick_seconds=SCAN_TARGET_TICK):
+    """
+    Schedule the single job that runs the scans of every scan target when they are due.
+    - tick_seconds: How often to look for due targets, in seconds.
+    """
+    try:
+        scheduler.add_job(
+            scheduled_scan_targets,
+            trigger='interval',
+            seconds=tick_seconds,
+            id='scan_targets',
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        print(f"Scan targets checked every {tick_seconds} seconds.")
+    except Exception as e:
+        print(f"Failed to schedule the scan targets: {e}")
+
 def add_backup_job(server_id, interval_hours):
     """
     Schedule a recurring backup job for a server.
@@ -136,6 +263,29 @@ def add_backup_job(server_id, interval_hours):
     except Exception as e:
         print(f"Failed to schedule backup for server {server_id}: {e}")
 
+def init_app(app):
+    """
+    Bind the fleet-wide jobs to the Flask app, whose context they push for database work,
+    and schedule them. Call once per process that should run them.
+    """
+    global flask_app
+    flask_app = app
+    mail.init_app(app)
+    health_sweeper.app = app
+    scan_targets.app = app
+    # Scans run in this process's threads, so any left unfinished were cut off by a restart
+    with app.app_context():
+        try:
+            orphaned = ScanJobRunner.fail_orphaned()
+            if orphaned:
+                print(f"Marked {orphaned} interrupted scan jobs as failed.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to clean up interrupted scan jobs: {e}")
+    add_health_sweep_job()
+    add_health_maintenance_job()
+    add_scan_target_job()
+
 # Function to remove jobs
 def remove_job(job_id):
     """
@@ -0,0 +1,84 @@
+# server_lookup_utils.py
+
+import ipaddress
+from app.models import Server, db
+from app.ingest_utils import INGEST_CHUNK_SIZE, _chunks
+from app.ip_utils import cidr_filter
+
+
+class ServerLookup:
+    """
+    Lookups of servers by IP address or hostname that use the servers indexes and
+    resolve a whole batch with one query per INGEST_CHUNK_SIZE values.
+    """
+
+    @staticmethod
+    def normalize_ip(value):
+        """
+        Canonical text form of an IP address (e.g. ' 2001:DB8::1' -> '2001:db8::1'), so the
+        same host is always stored under the same key. Non-IP values are only stripped.
+        """
+        value = (value or '').strip()
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            return value
+
+    @staticmethod
+    def by_ips(ips):
+        """
+        Resolve many IP addresses at once.
+        - ips: Iterable of IP address strings.
+        - Returns: A dictionary mapping each IP address that has a server to its Server.
+        """
+        ips = sorted({ServerLookup.normalize_ip(ip) for ip in ips if ip})
+        servers = {}
+        for chunk in _chunks(ips, INGEST_CHUNK_SIZE):
+            for server in Server.query.filter(Server.ip_address.in_(chunk)):
+                servers[server.ip_address] = server
+        return servers
+
+    @staticmethod
+    def by_names(names):
+        """
+        Resolve many hostnames at once (exact match on Server.name).
+        - Returns: A dictionary mapping each name to the list of servers carrying it.
+        """
+        names = sorted({name for name in names if name})
+        servers = {}
+        for chunk in _chunks(names, INGEST_CHUNK_SIZE):
+            for server in Server.query.filter(Server.name.in_(chunk)).order_by(Server.id):
+                servers.setdefault(server.name, []).append(server)
+        return servers
+
+    @staticmethod
+    def find(value):
+        """
+        Find one server by IP address, or by hostname when value is not a known IP.
+        - Returns: The Server, or None.
+        """
+        ip = ServerLookup.normalize_ip(value)
+        server = Server.query.filter_by(ip_address=ip).first()
+        if server is None and value:
+            server = Server.query.filter_by(name=value.strip()).order_by(Server.id).first()
+        return server
+
+    @staticmethod
+    def existing_ips(ips):
+        """The subset of ips that already have a server, read from the index only."""
+        ips = sorted({ServerLookup.normalize_ip(ip) for ip in ips if ip})
+        existing = set()
+        for chunk in _chunks(ips, INGEST_CHUNK_SIZE):
+            existing.update(db.session.execute(
+                db.select(Server.ip_address).where(Server.ip_address.in_(chunk))
+            ).scalars())
+        return existing
+
+    @staticmethod
+    def in_cidrs(cidrs):
+        """
+        Query for the servers inside CIDR blocks, as indexed range scans on Server.ip_packed.
+        - cidrs: Iterable of CIDR strings or ipaddress networks.
+        - Returns: A query ordered by address.
+        """
+        return Server.query.filter(cidr_filter(Server.ip_packed, cidrs)).order_by(Server.ip_packed)
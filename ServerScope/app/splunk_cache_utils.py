@@ -0,0 +1,220 @@
+# splunk_cache_utils.py
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from app.log_analysis_utils import splunk_time_to_epoch
+
+SPLUNK_CACHE_BUCKET = int(os.getenv('SPLUNK_CACHE_BUCKET', 300))  # seconds per cached time bucket
+SPLUNK_CACHE_BUCKET_TTL = int(os.getenv('SPLUNK_CACHE_BUCKET_TTL', 6 * 3600))  # seconds a completed bucket is reused
+SPLUNK_CACHE_PARTIAL_TTL = int(os.getenv('SPLUNK_CACHE_PARTIAL_TTL', 30))  # seconds the newest, still filling bucket is reused
+SPLUNK_CACHE_SETTLE = int(os.getenv('SPLUNK_CACHE_SETTLE', 120))  # seconds after its end before a bucket counts as complete
+SPLUNK_CACHE_MAX_ENTRIES = int(os.getenv('SPLUNK_CACHE_MAX_ENTRIES', 10000))
+SPLUNK_CACHE_MAX_EVENTS = int(os.getenv('SPLUNK_CACHE_MAX_EVENTS', 500000))  # results held across all entries
+SPLUNK_CACHE_MAX_SEARCH_EVENTS = int(os.getenv('SPLUNK_CACHE_MAX_SEARCH_EVENTS', 5000))  # results buffered per search
+
+# Relative time modifiers the cache resolves itself: now, epoch seconds, or -<n><unit>.
+# Snapped times (-1d@d) depend on Splunk's timezone and are cached as a whole query instead.
+_RELATIVE = re.compile(r'^-(\d+)(s|sec|secs|m|min|mins|h|hr|hrs|d|day|days|w|week|weeks)$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def resolve_time(value, now):
+    """
+    Resolve a Splunk earliest/latest value to epoch seconds.
+    - Returns: The epoch seconds, or None for modifiers the cache does not resolve.
+    """
+    value = (value or 'now').strip().lower()
+    if value == 'now':
+        return now
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    match = _RELATIVE.match(value)
+    if match is None:
+        return None
+    return now - int(match.group(1)) * _UNIT_SECONDS[match.group(2)[0]]
+
+
+def normalize_query(search_query):
+    """Cache key of a query: the SPL Splunk runs, with whitespace collapsed."""
+    query = ' '.join(search_query.split())
+    return query if query.startswith('|') or query.startswith('search ') else f"search {query}"
+
+
+class SplunkQueryCache:
+    def __init__(self, bucket_seconds=SPLUNK_CACHE_BUCKET, bucket_ttl=SPLUNK_CACHE_BUCKET_TTL,
+                 partial_ttl=SPLUNK_CACHE_PARTIAL_TTL, settle_seconds=SPLUNK_CACHE_SETTLE,
+                 max_entries=SPLUNK_CACHE_MAX_ENTRIES, max_events=SPLUNK_CACHE_MAX_EVENTS,
+                 max_search_events=SPLUNK_CACHE_MAX_SEARCH_EVENTS):
+        """
+        Cache of Splunk search results split into time buckets. A relative window such as -24h
+        is aligned to bucket boundaries; completed buckets are reused across calls and only the
+        missing ones and the newest, still filling bucket are searched again. Event searches
+        without a pipe are split by _time; other queries are cached whole for partial_ttl.
+        - bucket_seconds: Width of a bucket.
+        - bucket_ttl: Seconds a completed bucket is reused.
+        - partial_ttl: Seconds the newest bucket (and a whole, unsplittable query) is reused.
+        - settle_seconds: Seconds after a bucket's end before it is complete, for late events.
+        - max_entries: Cached buckets kept before the least recently used one is evicted.
+        - max_events: Results kept across all entries.
+        - max_search_events: Results buffered while a search streams; once a search returns
+          more, buffering stops and the search is passed through uncached.
+        """
+        self.bucket_seconds = bucket_seconds
+        self.bucket_ttl = bucket_ttl
+        self.partial_ttl = partial_ttl
+        self.settle_seconds = settle_seconds
+        self.max_entries = max_entries
+        self.max_events = max_events
+        self.max_search_events = min(max_search_events, max_events)
+        self._entries = OrderedDict()  # key -> (expires_at, results)
+        self._events = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'searches': 0, 'evictions': 0, 'uncached': 0}
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[1]
+                self._drop(key)
+            self._stats['misses'] += 1
+            return None
+
+    def _drop(self, key):
+        """Remove an entry (called with the lock held)."""
+        _, results = self._entries.pop(key)
+        self._events -= len(results)
+
+    def _put(self, key, results, ttl):
+        if ttl <= 0 or len(results) > self.max_events:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, results)
+            self._events += len(results)
+            while len(self._entries) > self.max_entries or self._events > self.max_events:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def _fetch(self, fetch, query, earliest, latest, buckets):
+        """
+        Run one search and yield its results while collecting them per bucket start, as long
+        as they fit in max_search_events and all carry a _time.
+        - buckets: Dictionary filled with bucket start -> results, or cleared if not cacheable.
+        """
+        with self._lock:
+            self._stats['searches'] += 1
+        collected = 0
+        collecting = True
+        for result in fetch(query, earliest=earliest, latest=latest):
+            if collecting:
+                moment = splunk_time_to_epoch(result.get('_time'))
+                collected += 1
+                if moment is None or collected > self.max_search_events:
+                    collecting = False
+                    buckets.clear()
+                    with self._lock:
+                        self._stats['uncached'] += 1
+                else:
+                    start = int(moment // self.bucket_seconds * self.bucket_seconds)
+                    buckets.setdefault(start, []).append(result)
+            yield result
+        if not collecting:
+            buckets.clear()
+            buckets[None] = None  # marks the search as not cacheable
+
+    def _whole(self, fetch, query, earliest, latest):
+        key = ('whole', query, earliest, latest)
+        cached = self._get(key)
+        if cached is not None:
+            yield from cached
+            return
+        with self._lock:
+            self._stats['searches'] += 1
+        results = []
+        for result in fetch(query, earliest=earliest, latest=latest):
+            if results is not None:
+                results.append(result)
+                if len(results) > self.max_search_events:
+                    results = None
+                    with self._lock:
+                        self._stats['uncached'] += 1
+            yield result
+        if results is not None:
+            self._put(key, results, self.partial_ttl)
+
+    def _bucket_run(self, fetch, query, starts):
+        """Search a run of consecutive missing complete buckets at once and cache each of them."""
+        buckets = {}
+        yield from self._fetch(fetch, query, str(starts[-1]), str(starts[0] + self.bucket_seconds), buckets)
+        if None not in buckets:
+            for start in starts:
+                self._put(('bucket', query, start), buckets.get(start, []), self.bucket_ttl)
+
+    def search(self, fetch, search_query, earliest="-24h", latest="now", now=None):
+        """
+        Yield the results of a search, from the cache where possible, newest bucket first.
+        - fetch: Callable(query, earliest=..., latest=...) yielding results (e.g. SplunkUtils.search).
+        - now: Current epoch seconds (time.time() by default).
+        """
+        now = time.time() if now is None else now
+        query = normalize_query(search_query)
+        start, end = resolve_time(earliest, now), resolve_time(latest, now)
+        if start is None or end is None or '|' in query:
+            yield from self._whole(fetch, query, earliest, latest)
+            return
+
+        size = self.bucket_seconds
+        first = int(start // size * size)
+        complete_end = min(int(end // size * size), int((now - self.settle_seconds) // size * size))
+
+        # Piece at the end of the window that is not a whole completed bucket
+        if end > complete_end and end > first:
+            piece_start = max(first, complete_end)
+            key = ('piece', query, piece_start, end if end <= now - self.settle_seconds else 'now')
+            cached = self._get(key)
+            if cached is not None:
+                yield from cached
+            else:
+                buckets = {}
+                latest_value = 'now' if key[3] == 'now' else str(end)
+                yield from self._fetch(fetch, query, str(piece_start), latest_value, buckets)
+                if None not in buckets:
+                    ttl = self.partial_ttl if key[3] == 'now' else self.bucket_ttl
+                    self._put(key, [result for results in buckets.values() for result in results], ttl)
+
+        # Completed buckets, newest first; consecutive misses are searched together
+        missing = []
+        for bucket in range(complete_end - size, first - 1, -size):
+            cached = self._get(('bucket', query, bucket))
+            if cached is None:
+                missing.append(bucket)
+                continue
+            if missing:
+                yield from self._bucket_run(fetch, query, missing)
+                missing = []
+            yield from cached
+        if missing:
+            yield from self._bucket_run(fetch, query, missing)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._events = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), events=self._events)
+
+
+# Shared cache in front of SplunkUtils.query_splunk
+splunk_cache = SplunkQueryCache()
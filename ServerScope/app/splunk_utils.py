@@ -1,20 +1,49 @@
 import requests
 import os
 import json
+import time
 from app.models import SplunkConfig, SplunkAnalysis
+from app.log_analysis_utils import LogAnalyzer
+from app.splunk_cache_utils import splunk_cache
+from app.http_utils import http_client
 from datetime import datetime
 from app import db
 from flask import render_template, flash, redirect, url_for
 from sqlalchemy import create_engine, MetaData, Table, Column, Integer, Text, DateTime
 from sqlalchemy.exc import OperationalError
 
+SPLUNK_REQUEST_TIMEOUT = int(os.getenv('SPLUNK_REQUEST_TIMEOUT', 30))  # seconds per HTTP request
+SPLUNK_JOB_TIMEOUT = int(os.getenv('SPLUNK_JOB_TIMEOUT', 600))  # seconds a search job may run before it is cancelled
+SPLUNK_POLL_INTERVAL = float(os.getenv('SPLUNK_POLL_INTERVAL', 0.5))  # first wait between job status checks
+SPLUNK_POLL_MAX_INTERVAL = float(os.getenv('SPLUNK_POLL_MAX_INTERVAL', 5.0))  # the wait doubles up to this
+SPLUNK_PAGE_SIZE = int(os.getenv('SPLUNK_PAGE_SIZE', 5000))  # results fetched per /results request
+
+
+class SplunkSearchError(Exception):
+    """A Splunk search job failed, was cancelled or did not finish in time."""
+
 
 class SplunkUtils:
-    def __init__(self):
+    def __init__(self, config=None, page_size=SPLUNK_PAGE_SIZE, job_timeout=SPLUNK_JOB_TIMEOUT,
+                 poll_interval=SPLUNK_POLL_INTERVAL, poll_max_interval=SPLUNK_POLL_MAX_INTERVAL, cache=splunk_cache,
+                 http=http_client):
         """
         Initialize the SplunkUtils class by loading the Splunk config from the database.
+        - config: Dictionary with 'server_url' and 'auth_token', used instead of the database config.
+        - page_size: Results fetched per request when paging through a job's results.
+        - job_timeout: Seconds to wait for a search job before cancelling it.
+        - poll_interval: First wait between job status checks, doubled after each check.
+        - poll_max_interval: Longest wait between job status checks.
+        - cache: SplunkQueryCache used by query_splunk (None searches Splunk on every call).
+        - http: HttpClient the REST calls go through (pooled connections, retries, metrics).
         """
-        self.config = self.load_splunk_config()
+        self.config = config or self.load_splunk_config()
+        self.page_size = page_size
+        self.job_timeout = job_timeout
+        self.poll_interval = poll_interval
+        self.poll_max_interval = poll_max_interval
+        self.cache = cache
+        self.http = http
 
     def load_splunk_config(self):
         """
@@ -29,62 +58,165 @@ class SplunkUtils:
             'auth_token': config.auth_token
         }
 
-    def query_splunk(self, search_query, earliest="-24h", latest="now"):
+    def _headers(self):
+        return {'Authorization': f"Bearer {self.config['auth_token']}"}
+
+    def _url(self, path):
+        return f"{self.config['server_url'].rstrip('/')}/services/search/{path}"
+
+    @staticmethod
+    def _search_string(search_query):
+        """Splunk runs the query as SPL, so plain terms need the leading search command."""
+        query = search_query.strip()
+        if query.startswith('|') or query.startswith('search '):
+            return query
+        return f"search {query}"
+
+    def create_search_job(self, search_query, earliest="-24h", latest="now"):
         """
-        Query the Splunk instance using the REST API.
-        - search_query: The search query string.
-        - earliest: The earliest time for the search (default: -24 hours).
-        - latest: The latest time for the search (default: now).
-        - Returns: The search results in JSON format.
+        Start a search job on Splunk.
+        - Returns: The job's search ID (sid).
+        - Raises: SplunkSearchError if the job could not be created.
         """
         try:
-            search_url = f"{self.config['server_url']}/services/search/jobs"
-            headers = {
-                'Authorization': f"Bearer {self.config['auth_token']}",
-                'Content-Type': 'application/json'
-            }
-            payload = {
-                'search': f"search {search_query}",
+            response = self.http.post(self._url('jobs'), endpoint='splunk.jobs.create', headers=self._headers(),
+                                      timeout=SPLUNK_REQUEST_TIMEOUT, data={
+                'search': self._search_string(search_query),
                 'earliest_time': earliest,
                 'latest_time': latest,
                 'output_mode': 'json'
-            }
-            response = requests.post(search_url, headers=headers, data=json.dumps(payload))
+            })
             response.raise_for_status()
-            
-            search_results = response.json()
-            return search_results
+            return response.json()['sid']
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            raise SplunkSearchError(f"Failed to create Splunk search job: {e}")
 
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to query Splunk: {e}")
+    def job_status(self, sid):
+        """
+        - Returns: The job's content dictionary (dispatchState, isDone, isFailed, resultCount, messages...).
+        """
+        response = self.http.get(self._url(f'jobs/{sid}'), endpoint='splunk.jobs.status', headers=self._headers(),
+                                 timeout=SPLUNK_REQUEST_TIMEOUT, params={'output_mode': 'json'})
+        response.raise_for_status()
+        return response.json()['entry'][0]['content']
+
+    def cancel_job(self, sid):
+        """Cancel a search job; errors are ignored since the job expires on its own."""
+        try:
+            self.http.post(self._url(f'jobs/{sid}/control'), endpoint='splunk.jobs.control', headers=self._headers(),
+                           timeout=SPLUNK_REQUEST_TIMEOUT, data={'action': 'cancel'})
+        except requests.exceptions.RequestException:
+            pass
+
+    def wait_for_job(self, sid):
+        """
+        Poll a search job until it is done, waiting poll_interval, then twice as long after each
+        check up to poll_max_interval. The job is cancelled if it takes longer than job_timeout.
+        - Returns: The job's final content dictionary.
+        """
+        deadline = time.monotonic() + self.job_timeout
+        delay = self.poll_interval
+        while True:
+            try:
+                status = self.job_status(sid)
+            except (requests.exceptions.RequestException, ValueError, KeyError, IndexError) as e:
+                raise SplunkSearchError(f"Failed to check Splunk search job {sid}: {e}")
+            if status.get('isFailed') or status.get('dispatchState') == 'FAILED':
+                messages = '; '.join(message.get('text', '') for message in status.get('messages', []))
+                raise SplunkSearchError(f"Splunk search job {sid} failed: {messages or 'no details'}")
+            if status.get('isDone') or status.get('dispatchState') == 'DONE':
+                return status
+            if time.monotonic() + delay > deadline:
+                self.cancel_job(sid)
+                raise SplunkSearchError(f"Splunk search job {sid} did not finish within {self.job_timeout}s")
+            time.sleep(delay)
+            delay = min(delay * 2, self.poll_max_interval)
+
+    def iter_results(self, sid):
+        """
+        Page through a finished job's results with count/offset, one page in memory at a time.
+        - Yields: Result dictionaries (with '_raw', '_time', 'host'... as returned by Splunk).
+        """
+        offset = 0
+        while True:
+            try:
+                response = self.http.get(self._url(f'jobs/{sid}/results'), endpoint='splunk.jobs.results',
+                                         headers=self._headers(), timeout=SPLUNK_REQUEST_TIMEOUT,
+                                        params={'output_mode': 'json', 'count': self.page_size, 'offset': offset})
+                response.raise_for_status()
+                page = response.json().get('results', [])
+            except (requests.exceptions.RequestException, ValueError) as e:
+                raise SplunkSearchError(f"Failed to fetch results of Splunk search job {sid} at offset {offset}: {e}")
+            yield from page
+            if len(page) < self.page_size:
+                return
+            offset += len(page)
+
+    def search(self, search_query, earliest="-24h", latest="now"):
+        """
+        Run a search as a job: create it, wait for it with backoff and stream its results.
+        - Yields: Result dictionaries.
+        """
+        sid = self.create_search_job(search_query, earliest, latest)
+        self.wait_for_job(sid)
+        try:
+            yield from self.iter_results(sid)
+        except GeneratorExit:
+            self.cancel_job(sid)  # the caller stopped reading; free the job's results on Splunk
+            raise
 
-    def analyze_logs(self, search_query, earliest="-24h", latest="now"):
+    def export_search(self, search_query, earliest="-24h", latest="now"):
+        """
+        Stream results from the export endpoint as Splunk produces them, without a job to poll.
+        Suited to one-pass reads; the results cannot be paged again afterwards.
+        - Yields: Result dictionaries.
+        """
+        try:
+            with self.http.post(self._url('jobs/export'), endpoint='splunk.jobs.export', headers=self._headers(),
+                                timeout=SPLUNK_REQUEST_TIMEOUT, stream=True, data={
+                                    'search': self._search_string(search_query),
+                                    'earliest_time': earliest,
+                                    'latest_time': latest,
+                                    'output_mode': 'json'
+                                }) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    if 'result' in row and not row.get('preview'):
+                        yield row['result']
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise SplunkSearchError(f"Failed to export Splunk search: {e}")
+
+    def query_splunk(self, search_query, earliest="-24h", latest="now"):
+        """
+        Query the Splunk instance using the REST API.
+        - search_query: The search query string.
+        - earliest: The earliest time for the search (default: -24 hours).
+        - latest: The latest time for the search (default: now).
+        - Returns: A dictionary whose 'results' is an iterator over the search results,
+          fetched page by page as it is consumed (see search). Completed time buckets of the
+          window are served from the cache and only the rest is searched (see SplunkQueryCache).
+        """
+        if self.cache is None:
+            return {'results': self.search(search_query, earliest, latest)}
+        return {'results': self.cache.search(self.search, search_query, earliest, latest)}
+
+    def analyze_logs(self, search_query, earliest="-24h", latest="now", analyzer=None):
         """
         Analyze the Splunk logs and categorize them based on log levels (errors, warnings, info).
+        The results are streamed through a LogAnalyzer, so memory does not grow with their number.
         - search_query: The search query string (e.g., "error OR warn OR info").
         - earliest: The earliest time for the search (default: -24 hours).
         - latest: The latest time for the search (default: now).
-        - Returns: A dictionary summarizing log levels.
+        - analyzer: LogAnalyzer to use (a default one is created otherwise).
+        - Returns: A dictionary summarizing log levels: a sample of messages under 'errors',
+          'warnings' and 'info', and exact counts per severity, host and time bucket
+          (see LogAnalyzer.summary).
         """
         logs = self.query_splunk(search_query, earliest, latest)
-
-        summary = {
-            'errors': [],
-            'warnings': [],
-            'info': []
-        }
-
-        # Extract log messages based on severity
-        for entry in logs['results']:
-            message = entry.get('_raw', '')
-            if "error" in message.lower():
-                summary['errors'].append(message)
-            elif "warn" in message.lower():
-                summary['warnings'].append(message)
-            else:
-                summary['info'].append(message)
-
-        return summary
+        return (analyzer or LogAnalyzer()).consume(logs['results']).summary()
 
     def check_db_connection(self):
         """
@@ -156,12 +288,8 @@ class SplunkUtils:
         - Returns: A list of running jobs.
         """
         try:
-            jobs_url = f"{self.config['server_url']}/services/search/jobs"
-            headers = {
-                'Authorization': f"Bearer {self.config['auth_token']}",
-                'Content-Type': 'application/json'
-            }
-            response = requests.get(jobs_url, headers=headers)
+            response = self.http.get(self._url('jobs'), endpoint='splunk.jobs.list', headers=self._headers(),
+                                     timeout=SPLUNK_REQUEST_TIMEOUT, params={'output_mode': 'json'})
             response.raise_for_status()
 
             jobs = response.json()
@@ -182,7 +310,8 @@ class SplunkUtils:
 
         return {
             'errors': analysis['errors'],
-            'warnings': analysis['warnings']
+            'warnings': analysis['warnings'],
+            'counts': {severity: analysis['counts'][severity] for severity in ('errors', 'warnings')}
         }
 
     def fetch_splunk_logs(self, earliest="-24h", latest="now"):
@@ -190,7 +319,7 @@ class SplunkUtils:
         Fetch all logs from Splunk within a given time range.
         - earliest: The earliest time for the search (default: -24 hours).
         - latest: The latest time for the search (default: now).
-        - Returns: All log entries.
+        - Returns: An iterator over all log entries, fetched page by page.
         """
         search_query = "*"
         logs = self.query_splunk(search_query, earliest, latest)
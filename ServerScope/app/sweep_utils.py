@@ -0,0 +1,247 @@
+# sweep_utils.py
+
+import os
+import time
+import random
+import threading
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from app.models import Server, db
+from app.command_utils import CommandExecutor
+from app.async_command_utils import async_command_executor
+from app.health_utils import HealthCollector
+from app.timeseries_utils import health_store
+
+HEALTH_SWEEP_INTERVAL = int(os.getenv('HEALTH_SWEEP_INTERVAL', 60))  # seconds for a full pass over the fleet
+HEALTH_SWEEP_SLOTS = int(os.getenv('HEALTH_SWEEP_SLOTS', 12))  # one slot of the fleet is checked per tick
+HEALTH_SWEEP_CONCURRENCY = int(os.getenv('HEALTH_SWEEP_CONCURRENCY', 32))
+HEALTH_SWEEP_JITTER = int(os.getenv('HEALTH_SWEEP_JITTER', 2))  # seconds of random delay per tick
+HEALTH_SWEEP_TIMEOUT = int(os.getenv('HEALTH_SWEEP_TIMEOUT', 30))  # seconds per host
+HEALTH_SWEEP_BACKEND = os.getenv('HEALTH_SWEEP_BACKEND', 'threads')  # 'threads' or 'asyncio' (needs asyncssh)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[int(fraction * (len(values) - 1))], 3)
+
+
+class HealthSweeper:
+    def __init__(self, interval=HEALTH_SWEEP_INTERVAL, slots=HEALTH_SWEEP_SLOTS,
+                 max_concurrency=HEALTH_SWEEP_CONCURRENCY, timeout=HEALTH_SWEEP_TIMEOUT,
+                 check=None, on_critical=None, store=None, app=None, backend=HEALTH_SWEEP_BACKEND,
+                 async_executor=None):
+        """
+        Fleet-wide health sweep driven by a single scheduler job. Servers are sharded
+        into slots by id and each tick checks one slot on a bounded worker pool, so the
+        checks are spread over the interval instead of all firing on the same boundary.
+        - interval: Seconds for a full pass over every slot.
+        - slots: Number of slots, i.e. ticks per pass.
+        - max_concurrency: Maximum number of hosts checked at the same time.
+        - timeout: Seconds a single health check may take.
+        - check: Callable(target, timeout) returning a health record. Defaults to
+          CommandExecutor.get_server_health.
+        - on_critical: Optional callable(target, health) called when a server turns Critical.
+        - store: HealthStore receiving the samples (the shared health_store by default).
+        - app: Flask app whose context is pushed for database work.
+        - backend: 'threads' runs check on the worker pool; 'asyncio' multiplexes the checks
+          on the event loop of async_executor instead, with no thread per host.
+        - async_executor: SyncCommandExecutor used by the asyncio backend (the shared one by default).
+        """
+        if backend not in ('threads', 'asyncio'):
+            raise ValueError(f"Unknown health sweep backend: {backend}")
+        self.interval = interval
+        self.slots = max(1, slots)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.check = check or self._default_check
+        self.on_critical = on_critical
+        self.store = store or health_store
+        self.app = app
+        self.backend = backend
+        self.async_executor = async_executor or async_command_executor
+        self._pool = (ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='health-sweep')
+                      if backend == 'threads' else None)
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._results = []  # (target, health) waiting to be persisted
+        self._last_started = {}  # server_id -> monotonic start of its previous check
+        self._next_slot = 0
+        self._sweep = None
+        self._stats = {
+            'ticks': 0,
+            'checked': 0,
+            'errors': 0,
+            'skipped_in_flight': 0,
+            'last_tick': None,
+            'last_sweep': None
+        }
+
+    @property
+    def tick_interval(self):
+        """Seconds between ticks; the scheduler job runs at this interval."""
+        return self.interval / self.slots
+
+    def _default_check(self, target, timeout):
+        return CommandExecutor.get_server_health(target['ip'], target['username'], target['password'],
+                                                 os_type=target['os_type'], timeout=timeout)
+
+    def _context(self):
+        return self.app.app_context() if self.app is not None else nullcontext()
+
+    def _load_slot(self, slot):
+        """Fetch the plain fields of the servers in one slot, so no ORM object crosses threads."""
+        rows = (db.session.query(Server.id, Server.name, Server.ip_address, Server.username,
+                                 Server.password, Server.os_type, Server.status)
+                .filter(Server.id % self.slots == slot)
+                .all())
+        return [{'id': row[0], 'name': row[1], 'ip': row[2], 'username': row[3],
+                 'password': row[4], 'os_type': row[5], 'status': row[6]} for row in rows]
+
+    def _new_sweep(self, now):
+        return {'started': now, 'finished': None, 'hosts': 0, 'skipped_in_flight': 0,
+                'outstanding': 0, 'dispatch_done': False, 'queue_lags': [], 'schedule_lags': []}
+
+    def _close_sweep(self, sweep, now):
+        """Record a finished pass (called with the lock held)."""
+        sweep['finished'] = now
+        self._stats['last_sweep'] = {
+            'duration': round(now - sweep['started'], 3),
+            'hosts': sweep['hosts'],
+            'skipped_in_flight': sweep['skipped_in_flight'],
+            'queue_lag_p95': _percentile(sweep['queue_lags'], 0.95),
+            'queue_lag_max': _percentile(sweep['queue_lags'], 1.0),
+            'schedule_lag_max': _percentile(sweep['schedule_lags'], 1.0)
+        }
+
+    def _run_check(self, target, sweep, dispatched_at):
+        started = time.monotonic()
+        try:
+            health = self.check(target, self.timeout)
+        except Exception as e:
+            health = HealthCollector.error_record(f"Error: {e}")
+        self._finish_check(target, sweep, dispatched_at, started, health)
+
+    def _dispatch_async(self, target, sweep, dispatched_at):
+        """Start a check on the asyncio backend; it is recorded when its future completes."""
+        future = self.async_executor.submit('get_server_health', target['ip'], target['username'],
+                                            target['password'], os_type=target['os_type'], timeout=self.timeout)
+        future.add_done_callback(partial(self._finish_async, target, sweep, dispatched_at))
+
+    def _finish_async(self, target, sweep, dispatched_at, future):
+        try:
+            health = future.result()
+        except Exception as e:
+            health = HealthCollector.error_record(f"Error: {e}")
+        self._finish_check(target, sweep, dispatched_at, dispatched_at, health)
+
+    def _finish_check(self, target, sweep, dispatched_at, started, health):
+        with self._lock:
+            self._in_flight.discard(target['id'])
+            self._results.append((target, health))
+            sweep['queue_lags'].append(started - dispatched_at)
+            sweep['outstanding'] -= 1
+            if sweep['dispatch_done'] and sweep['outstanding'] == 0:
+                self._close_sweep(sweep, time.monotonic())
+
+    def tick(self):
+        """
+        Persist finished checks and dispatch the next slot. Hosts whose previous
+        check is still running are skipped instead of being queued a second time.
+        - Returns: A dictionary describing the tick.
+        """
+        with self._context():
+            self.persist_results()
+            targets = self._load_slot(self._next_slot)
+            random.shuffle(targets)
+
+            now = time.monotonic()
+            with self._lock:
+                slot = self._next_slot
+                self._next_slot = (slot + 1) % self.slots
+                if slot == 0 or self._sweep is None:
+                    self._sweep = self._new_sweep(now)
+                sweep = self._sweep
+
+                to_run = []
+                for target in targets:
+                    if target['id'] in self._in_flight:
+                        sweep['skipped_in_flight'] += 1
+                        continue
+                    previous = self._last_started.get(target['id'])
+                    if previous is not None:
+                        # How late this host is compared to one check per interval
+                        sweep['schedule_lags'].append(max(0.0, now - previous - self.interval))
+                    self._last_started[target['id']] = now
+                    self._in_flight.add(target['id'])
+                    to_run.append(target)
+                sweep['hosts'] += len(to_run)
+                sweep['outstanding'] += len(to_run)
+                if slot == self.slots - 1:
+                    sweep['dispatch_done'] = True
+                    if sweep['outstanding'] == 0:
+                        self._close_sweep(sweep, now)
+
+                skipped = len(targets) - len(to_run)
+                self._stats['ticks'] += 1
+                self._stats['skipped_in_flight'] += skipped
+                tick = {'slot': slot, 'hosts': len(targets), 'dispatched': len(to_run),
+                        'skipped_in_flight': skipped, 'in_flight': len(self._in_flight)}
+                self._stats['last_tick'] = tick
+
+            for target in to_run:
+                if self.backend == 'asyncio':
+                    self._dispatch_async(target, sweep, now)
+                else:
+                    self._pool.submit(self._run_check, target, sweep, now)
+            return tick
+
+    def persist_results(self):
+        """
+        Write finished checks with one bulk status update and buffered health samples.
+        - Returns: The number of results written.
+        """
+        with self._lock:
+            results, self._results = self._results, []
+        if not results:
+            return 0
+
+        updates = []
+        for target, health in results:
+            updates.append({'id': target['id'], 'status': health['status'],
+                            'last_health_check': health['collected_at']})
+            self.store.record(target['id'], health, flush=False)
+            if health['status'] == 'Critical' and target['status'] != 'Critical' and self.on_critical:
+                try:
+                    self.on_critical(target, health)
+                except Exception as e:
+                    print(f"Failed to send critical health alert for {target['name']}: {e}")
+        try:
+            db.session.bulk_update_mappings(Server, updates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.store.flush_if_due()
+
+        with self._lock:
+            self._stats['checked'] += len(results)
+            self._stats['errors'] += sum(1 for _, health in results
+                                         if health['status'] in ('Unreachable', 'Unknown'))
+        return len(results)
+
+    def stats(self):
+        """Return counters plus details of the last tick and the last completed sweep."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+            stats['slots'] = self.slots
+            stats['interval'] = self.interval
+            return stats
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
@@ -0,0 +1,306 @@
+# timeseries_utils.py
+
+import os
+import sys
+import zlib
+import time
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, timedelta, time as dt_time
+from app.models import HealthSeries, db
+
+# Metrics kept in the time series, in storage order
+SERIES_METRICS = ('cpu_percent', 'load_1', 'mem_used_percent', 'swap_used_percent',
+                  'disk_max_used_percent', 'inode_max_used_percent')
+
+RAW_RESOLUTION = 60  # seconds per raw sample slot
+ROLLUP_RESOLUTIONS = (300, 3600)
+
+HEALTH_RAW_RETENTION_DAYS = int(os.getenv('HEALTH_RAW_RETENTION_DAYS', 30))
+HEALTH_5MIN_RETENTION_DAYS = int(os.getenv('HEALTH_5MIN_RETENTION_DAYS', 90))
+HEALTH_1H_RETENTION_DAYS = int(os.getenv('HEALTH_1H_RETENTION_DAYS', 365))
+HEALTH_FLUSH_BATCH_SIZE = int(os.getenv('HEALTH_FLUSH_BATCH_SIZE', 500))  # buffered samples
+HEALTH_FLUSH_INTERVAL = int(os.getenv('HEALTH_FLUSH_INTERVAL', 300))  # seconds
+HEALTH_MAX_PENDING = int(os.getenv('HEALTH_MAX_PENDING', 50000))  # buffered samples kept while flushes fail
+
+RETENTION_DAYS = {
+    RAW_RESOLUTION: HEALTH_RAW_RETENTION_DAYS,
+    300: HEALTH_5MIN_RETENTION_DAYS,
+    3600: HEALTH_1H_RETENTION_DAYS
+}
+
+# Values are stored as unsigned 16-bit fixed point with two decimals (0 - 655.34)
+MISSING = 0xFFFF
+SCALE = 100.0
+
+
+def _slots(resolution):
+    return 86400 // resolution
+
+
+def _fields(resolution):
+    """Raw rows hold one value per slot; rollup rows hold an average and a maximum."""
+    return 1 if resolution == RAW_RESOLUTION else 2
+
+
+def encode_value(value):
+    if value is None:
+        return MISSING
+    return max(0, min(MISSING - 1, int(round(value * SCALE))))
+
+
+def decode_value(raw):
+    return None if raw == MISSING else raw / SCALE
+
+
+def empty_block(resolution):
+    return array('H', [MISSING]) * (len(SERIES_METRICS) * _fields(resolution) * _slots(resolution))
+
+
+def pack_block(block):
+    """Compress a block of uint16 slots (stored little-endian)."""
+    if sys.byteorder == 'big':
+        block = array('H', block)
+        block.byteswap()
+    return zlib.compress(block.tobytes(), 6)
+
+
+def unpack_block(data):
+    block = array('H')
+    block.frombytes(zlib.decompress(data))
+    if sys.byteorder == 'big':
+        block.byteswap()
+    return block
+
+
+def _is_filled(block, resolution, slot):
+    """Whether any metric has a value in a slot."""
+    slots = _slots(resolution)
+    fields = _fields(resolution)
+    return any(block[m * fields * slots + slot] != MISSING for m in range(len(SERIES_METRICS)))
+
+
+def update_rollup(raw_block, block, resolution, buckets):
+    """
+    Recompute some avg/max slots of a rollup block from a raw (1-minute) day block.
+    - buckets: Slot indexes of the rollup block to recompute.
+    - Returns: The change in the number of non-empty slots.
+    """
+    raw_slots = _slots(RAW_RESOLUTION)
+    slots = _slots(resolution)
+    width = raw_slots // slots
+    change = 0
+    for s in buckets:
+        was_filled = _is_filled(block, resolution, s)
+        for m in range(len(SERIES_METRICS)):
+            base = m * raw_slots + s * width
+            values = [v for v in raw_block[base:base + width] if v != MISSING]
+            avg_index = (m * 2) * slots + s
+            block[avg_index] = int(round(sum(values) / len(values))) if values else MISSING
+            block[avg_index + slots] = max(values) if values else MISSING
+        change += _is_filled(block, resolution, s) - was_filled
+    return change
+
+
+def rollup_block(raw_block, resolution):
+    """
+    Downsample a raw (1-minute) day block into avg/max slots of the given resolution.
+    - Returns: A tuple of (block, number of non-empty slots).
+    """
+    block = empty_block(resolution)
+    filled = update_rollup(raw_block, block, resolution, range(_slots(resolution)))
+    return block, filled
+
+
+class HealthStore:
+    def __init__(self, batch_size=HEALTH_FLUSH_BATCH_SIZE, flush_interval=HEALTH_FLUSH_INTERVAL,
+                 max_pending=HEALTH_MAX_PENDING):
+        """
+        Compact health history. Each server has one row per day and resolution holding
+        a compressed, metric-major array of fixed-point samples, so a day of 1-minute
+        data for one server is a single row and range queries read one row per day.
+        Samples are buffered in memory and written in batches; on flush only the 5-minute
+        and 1-hour rollup slots that received new samples are recomputed.
+        - batch_size: Number of buffered samples that triggers a flush.
+        - flush_interval: Seconds after which buffered samples are flushed on the next record().
+        - max_pending: Most samples kept in memory; the oldest are dropped beyond it, so a
+          database outage cannot grow the buffer without limit.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0  # samples discarded because the buffer was full
+        self._pending = deque(maxlen=max_pending)  # (server_id, datetime, {metric: value})
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, server_id, health, flush=True):
+        """
+        Buffer one health record (see HealthCollector.parse) for a server.
+        Unreachable or empty records are skipped.
+        - flush: Flush when the batch size or flush interval is reached.
+        - Returns: True if the sample was buffered.
+        """
+        values = {metric: health.get(metric) for metric in SERIES_METRICS}
+        if all(value is None for value in values.values()):
+            return False
+        with self._lock:
+            if len(self._pending) == self.max_pending:
+                self.dropped += 1
+            self._pending.append((server_id, health.get('collected_at') or datetime.utcnow(), values))
+        if flush:
+            self.flush_if_due()
+        return True
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush_if_due(self):
+        """Flush when the batch size or the flush interval has been reached."""
+        with self._lock:
+            due = self._pending and (len(self._pending) >= self.batch_size
+                                     or time.monotonic() - self._last_flush >= self.flush_interval)
+        return self.flush() if due else 0
+
+    def flush(self):
+        """
+        Write buffered samples. Existing day rows are loaded with one query, merged
+        in memory and written back in one transaction.
+        - Returns: The number of samples written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, deque(maxlen=self.max_pending)
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+
+            by_day = {}
+            for server_id, collected_at, values in pending:
+                by_day.setdefault((server_id, collected_at.date()), []).append((collected_at, values))
+
+            server_ids = {key[0] for key in by_day}
+            days = {key[1] for key in by_day}
+            existing = {
+                (row.server_id, row.resolution, row.day): row
+                for row in HealthSeries.query.filter(HealthSeries.server_id.in_(server_ids),
+                                                     HealthSeries.day.in_(days)).all()
+            }
+
+            try:
+                raw_slots = _slots(RAW_RESOLUTION)
+                for (server_id, day), samples in by_day.items():
+                    raw_row = existing.get((server_id, RAW_RESOLUTION, day))
+                    block = unpack_block(raw_row.data) if raw_row else empty_block(RAW_RESOLUTION)
+                    count = raw_row.sample_count if raw_row else 0
+                    touched = set()
+                    for collected_at, values in samples:
+                        slot = (collected_at.hour * 3600 + collected_at.minute * 60 + collected_at.second) // RAW_RESOLUTION
+                        was_filled = _is_filled(block, RAW_RESOLUTION, slot)
+                        for m, metric in enumerate(SERIES_METRICS):
+                            block[m * raw_slots + slot] = encode_value(values[metric])
+                        count += _is_filled(block, RAW_RESOLUTION, slot) - was_filled
+                        touched.add(slot)
+                    self._store(existing, server_id, RAW_RESOLUTION, day, block, count)
+
+                    for resolution in ROLLUP_RESOLUTIONS:
+                        width = raw_slots // _slots(resolution)
+                        row = existing.get((server_id, resolution, day))
+                        rollup = unpack_block(row.data) if row else empty_block(resolution)
+                        filled = row.sample_count if row else 0
+                        filled += update_rollup(block, rollup, resolution, {slot // width for slot in touched})
+                        self._store(existing, server_id, resolution, day, rollup, filled)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Keep the samples so the next flush can retry them, newest first if the buffer is full
+                with self._lock:
+                    retry = deque(pending, maxlen=self.max_pending)
+                    retry.extend(self._pending)
+                    self.dropped += len(pending) + len(self._pending) - len(retry)
+                    self._pending = retry
+                raise
+            return len(pending)
+
+    @staticmethod
+    def _store(existing, server_id, resolution, day, block, count):
+        row = existing.get((server_id, resolution, day))
+        if row is None:
+            row = HealthSeries(server_id=server_id, resolution=resolution, day=day)
+            db.session.add(row)
+            existing[(server_id, resolution, day)] = row
+        row.data = pack_block(block)
+        row.sample_count = count
+
+    @staticmethod
+    def pick_resolution(start, end):
+        """Choose the coarsest resolution that still gives useful detail for a range."""
+        span = end - start
+        if span <= timedelta(days=1) and start >= datetime.utcnow() - timedelta(days=HEALTH_RAW_RETENTION_DAYS):
+            return RAW_RESOLUTION
+        if span <= timedelta(days=7) and start >= datetime.utcnow() - timedelta(days=HEALTH_5MIN_RETENTION_DAYS):
+            return 300
+        return 3600
+
+    @staticmethod
+    def series(server_id, metric, start, end, resolution=None, aggregate='avg'):
+        """
+        Return a server's metric series over a time range.
+        - metric: One of SERIES_METRICS.
+        - start, end: UTC datetimes bounding the range.
+        - resolution: 60, 300 or 3600 seconds; picked from the range length if omitted.
+        - aggregate: 'avg' or 'max' for rollup resolutions.
+        - Returns: A list of (timestamp, value) tuples for slots that have data.
+        """
+        if metric not in SERIES_METRICS:
+            raise ValueError(f"Unknown health metric: {metric}")
+        resolution = resolution or HealthStore.pick_resolution(start, end)
+        slots = _slots(resolution)
+        m = SERIES_METRICS.index(metric)
+        if resolution == RAW_RESOLUTION:
+            offset = m * slots
+        else:
+            offset = (m * 2 + (1 if aggregate == 'max' else 0)) * slots
+
+        rows = (HealthSeries.query
+                .filter(HealthSeries.server_id == server_id,
+                        HealthSeries.resolution == resolution,
+                        HealthSeries.day >= start.date(),
+                        HealthSeries.day <= end.date())
+                .order_by(HealthSeries.day)
+                .all())
+        points = []
+        for row in rows:
+            block = unpack_block(row.data)
+            midnight = datetime.combine(row.day, dt_time())
+            for s in range(slots):
+                raw = block[offset + s]
+                if raw == MISSING:
+                    continue
+                timestamp = midnight + timedelta(seconds=s * resolution)
+                if start <= timestamp <= end:
+                    points.append((timestamp, decode_value(raw)))
+        return points
+
+    @staticmethod
+    def apply_retention(now=None):
+        """
+        Delete day rows older than the retention period of their resolution.
+        - Returns: The number of rows deleted.
+        """
+        today = (now or datetime.utcnow()).date()
+        deleted = 0
+        for resolution, days in RETENTION_DAYS.items():
+            deleted += (HealthSeries.query
+                        .filter(HealthSeries.resolution == resolution,
+                                HealthSeries.day < today - timedelta(days=days))
+                        .delete(synchronize_session=False))
+        db.session.commit()
+        return deleted
+
+
+# Shared store fed by the health checks
+health_store = HealthStore()
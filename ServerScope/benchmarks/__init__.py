@@ -0,0 +1,4 @@
+# benchmarks/__init__.py
+
+# Standalone performance benchmarks. Run them from the ServerScope directory, e.g.:
+#   python -m benchmarks.bench_fleet_fanout
@@ -0,0 +1,86 @@
+# bench_async_health.py
+#
+# Run many concurrent health checks through the asyncio backend against a local
+# asyncssh stand-in running in a separate process, and report wall time and the
+# peak number of client threads.
+#   python -m benchmarks.bench_async_health --hosts 1000
+
+import time
+import asyncio
+import argparse
+import threading
+import multiprocessing
+import asyncssh
+from app.async_command_utils import AsyncCommandExecutor
+from app.health_utils import LINUX_HEALTH_COMMAND
+
+
+def _serve(port_queue, command_delay):
+    """Stand-in SSH server: accepts any password and answers every command after a delay."""
+    async def handle(process):
+        await asyncio.sleep(command_delay)
+        process.stdout.write("==loadavg==\n0.10 0.20 0.30 1/100 1\n==nproc==\n4\n")
+        process.exit(0)
+
+    async def main():
+        key = asyncssh.generate_private_key('ssh-ed25519')
+        server = await asyncssh.create_server(
+            lambda: _AcceptAll(), '127.0.0.1', 0, server_host_keys=[key], process_factory=handle,
+            backlog=4096
+        )
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    class _AcceptAll(asyncssh.SSHServer):
+        def begin_auth(self, username):
+            return True
+
+        def password_auth_supported(self):
+            return True
+
+        def validate_password(self, username, password):
+            return True
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=1000)
+    parser.add_argument('--command-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(port_queue, args.command_delay), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=30)
+
+    peak_threads = threading.active_count()
+
+    async def run():
+        nonlocal peak_threads
+        executor = AsyncCommandExecutor(max_concurrency=args.hosts)
+        # Distinct usernames give every simulated host its own connection
+        tasks = [executor.execute_ssh_command('127.0.0.1', f"user{i}", 'x', LINUX_HEALTH_COMMAND, port=port)
+                 for i in range(args.hosts)]
+        gathered = asyncio.gather(*tasks)
+        while not gathered.done():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.05)
+        results = gathered.result()
+        await executor.close()
+        return results
+
+    start = time.monotonic()
+    results = asyncio.run(run())
+    elapsed = time.monotonic() - start
+    failures = [r for r in results if r.startswith('Error')]
+    print(f"{args.hosts} concurrent health checks in {elapsed:.2f}s, "
+          f"{len(failures)} failures, peak client threads: {peak_threads}")
+    if failures:
+        print(f"first failure: {failures[0]}")
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
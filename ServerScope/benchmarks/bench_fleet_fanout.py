@@ -0,0 +1,65 @@
+# bench_fleet_fanout.py
+#
+# Compare sequential per-host execution with FleetExecutor against a local SSH stand-in.
+#   python -m benchmarks.bench_fleet_fanout --hosts 100 --workers 32
+
+import time
+import argparse
+from types import SimpleNamespace
+from app.command_utils import CommandExecutor
+from app.connection_pool import ssh_pool
+from app.fleet_utils import FleetExecutor
+from benchmarks.ssh_standin import SSHStandIn
+
+
+def make_servers(count):
+    # Distinct usernames give every simulated host its own pooled connection
+    return [SimpleNamespace(id=i, name=f"host{i}", ip_address='127.0.0.1', username=f"user{i}",
+                            password='x', os_type='Linux') for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--handshake-delay', type=float, default=0.2)
+    parser.add_argument('--command-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    standin = SSHStandIn(handshake_delay=args.handshake_delay, command_delay=args.command_delay).start()
+    servers = make_servers(args.hosts)
+
+    def run_on_standin(server_ip, username, password, command, os_type, timeout=None):
+        return CommandExecutor.execute_ssh_command(server_ip, username, password, command,
+                                                   port=standin.port, timeout=timeout)
+
+    try:
+        start = time.monotonic()
+        for server in servers:
+            run_on_standin(server.ip_address, server.username, server.password, 'uptime', server.os_type)
+        sequential = time.monotonic() - start
+        ssh_pool.close_all()
+
+        fleet = FleetExecutor(max_workers=args.workers, run_on_host=run_on_standin)
+        for label in ('fan-out (cold pool)', 'fan-out (warm pool)'):
+            start = time.monotonic()
+            first = None
+            results = []
+            for result in fleet.run_command(servers, 'uptime'):
+                if first is None:
+                    first = time.monotonic() - start
+                results.append(result)
+            elapsed = time.monotonic() - start
+            summary = FleetExecutor.summarize(results)
+            print(f"{label}: {elapsed:.2f}s total, first result after {first:.3f}s, "
+                  f"ok={summary['ok']} p50={summary['latency_p50']}s p95={summary['latency_p95']}s")
+
+        print(f"sequential (1 request per host): {sequential:.2f}s")
+        print(f"stand-in handled {standin.connections} connections, {standin.commands} commands")
+    finally:
+        ssh_pool.close_all()
+        standin.stop()
+
+
+if __name__ == '__main__':
+    main()
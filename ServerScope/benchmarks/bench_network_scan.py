@@ -0,0 +1,38 @@
+# bench_network_scan.py
+#
+# Measure NetworkScanner wall time against the number of workers, replaying nmap
+# XML (synthesized, or captured with `nmap -sn -oX scan.xml <range>`).
+#   python -m benchmarks.bench_network_scan --range 10.20.0.0/18 --workers 1 4 16
+#   python -m benchmarks.bench_network_scan --range 10.20.0.0/16 --xml scan.xml
+
+import time
+import argparse
+from app.network_scan_utils import NetworkScanner
+from benchmarks.nmap_replay import ReplayPortScanner, load_hosts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--range', default='10.20.0.0/18')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--shard-prefix', type=int, default=24)
+    parser.add_argument('--xml', help='Captured nmap -sn XML to replay instead of synthesized hosts')
+    parser.add_argument('--seconds-per-address', type=float, default=0.0005)
+    args = parser.parse_args()
+
+    hosts = load_hosts(args.xml) if args.xml else None
+    baseline = None
+    for workers in args.workers:
+        scanner = NetworkScanner(args.range, max_workers=workers, shard_prefix=args.shard_prefix,
+                                 scanner_factory=lambda: ReplayPortScanner(
+                                     hosts=hosts, seconds_per_address=args.seconds_per_address))
+        start = time.monotonic()
+        results = scanner.scan_network()
+        elapsed = time.monotonic() - start
+        baseline = baseline or elapsed
+        print(f"workers={workers:<3} blocks={len(scanner.shards()):<4} hosts up={len(results):<6} "
+              f"wall={elapsed:.2f}s speedup={baseline / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# bench_scan_ingest.py
+#
+# Measure how fast scan results are written to the database: the per-host
+# add-and-commit path (NetworkScanner.add_new_server) against ScanIngestor's
+# chunked multi-row statements, on a temporary SQLite file.
+#   python -m benchmarks.bench_scan_ingest --hosts 5000 --chunk-size 500
+
+import os
+import time
+import argparse
+import tempfile
+from flask import Flask
+from app.models import db, Server
+from app.network_scan_utils import NetworkScanner
+from app.ingest_utils import ScanIngestor
+
+
+def make_results(count):
+    return [{'ip': f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", 'hostname': f"host-{i}.lan",
+             'status': 'up'} for i in range(count)]
+
+
+def timed(label, func, rows):
+    db.drop_all()
+    db.create_all()
+    start = time.monotonic()
+    func()
+    elapsed = time.monotonic() - start
+    assert Server.query.count() == rows
+    print(f"{label:<26} rows={rows:<7} wall={elapsed:.2f}s rows/sec={rows / elapsed:,.0f}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=5000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    results = make_results(args.hosts)
+    with tempfile.TemporaryDirectory() as directory:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        with app.app_context():
+            scanner = NetworkScanner("10.0.0.0/24")
+            legacy = timed("per-host commit", lambda: [scanner.add_new_server(result) for result in results],
+                           args.hosts)
+            ingestor = ScanIngestor(chunk_size=args.chunk_size)
+            bulk = timed(f"bulk (chunk={args.chunk_size})", lambda: ingestor.ingest_servers(results), args.hosts)
+            print(f"speedup={legacy / bulk:.1f}x")
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# bench_severity_classifier.py
+#
+# Measure severity classification of log messages: the substring loop analyze_logs
+# used ("error" in message.lower()) against SeverityClassifier, per message and in
+# batches, on a synthetic corpus whose true severities are known, so the accuracy
+# of each classifier is reported along with its speed. TEMPLATES are the cases the
+# rules were written against; HELD_OUT_TEMPLATES were added afterwards and are
+# reported separately, as a check on how the rules do on messages they were not
+# tuned on. Expect the classifier to be roughly 12x slower than the substring loop
+# (about 0.3M against 3.7M messages per second); it is there for accuracy.
+#   python -m benchmarks.bench_severity_classifier --lines 2000000 --batch-size 2000
+
+import time
+import random
+import argparse
+from app.log_analysis_utils import SeverityClassifier, substring_classify
+
+# (template, true severity, weight)
+TEMPLATES = [
+    ("{ts} web{n} sshd[{pid}]: Accepted publickey for deploy from 10.0.{a}.{b} port {port} ssh2", 'info', 40),
+    ("{ts} web{n} nginx: 10.0.{a}.{b} - - \"GET /api/v1/items/{pid} HTTP/1.1\" 200 {port}", 'info', 25),
+    ("{ts} web{n} app[{pid}]: ERROR failed to connect to db{n} after {a} retries", 'errors', 6),
+    ("{ts} web{n} app[{pid}]: Traceback (most recent call last): ValueError: bad id {b}", 'errors', 2),
+    ("{ts} web{n} app[{pid}]: WARN slow query took {port}ms on table items", 'warnings', 6),
+    ("{ts} web{n} cron[{pid}]: health check passed, no errors found in {a} checks", 'info', 8),
+    ("{ts} web{n} kernel: Out of memory: Killed process {pid} (java)", 'errors', 1),
+    ("{ts} web{n} app[{pid}]: job {b} completed after {a} non-fatal retries", 'info', 2),
+    ('{{"ts":"{ts}","host":"web{n}","level":"info","msg":"request {pid} served, error budget ok"}}', 'info', 5),
+    ('{{"ts":"{ts}","host":"web{n}","level":"warning","msg":"cache miss ratio {a}%"}}', 'warnings', 3),
+    ("<11>{ts} web{n} postfix[{pid}]: connect to relay timed out", 'errors', 1),
+    ("{ts} web{n} stderr: worker {pid} started", 'info', 1),
+]
+
+# Not used when writing the rules; some are expected to be misclassified
+HELD_OUT_TEMPLATES = [
+    ("{ts} web{n} systemd[1]: Started Session {pid} of user deploy.", 'info', 20),
+    ("{ts} web{n} app[{pid}]: user alert preferences updated for account {b}", 'info', 5),
+    ("{ts} web{n} app[{pid}]: metrics flushed: errors=0 retries=0 queued={a}", 'info', 10),
+    ("{ts} web{n} app[{pid}]: content filter flagged 'terror' in upload {b}", 'info', 1),
+    ("{ts} web{n} kernel: EXT4-fs error (device sda1): ext4_find_entry: reading lblock {a}", 'errors', 2),
+    ("{ts} web{n} app[{pid}]: Unhandled IOError while reading /data/{b}.csv", 'errors', 2),
+    ("{ts} web{n} smartd[{pid}]: Device: /dev/sda, SMART Failure: DATA CHANNEL IMPENDING FAILURE", 'errors', 1),
+    ("{ts} web{n} sshd[{pid}]: Invalid user admin from 10.0.{a}.{b} port {port}", 'warnings', 4),
+    ("{ts} web{n} kernel: nfs: server nas{n} not responding, still trying", 'warnings', 2),
+    ("{ts} web{n} app[{pid}]: request {b} took {port}ms, above the 1000ms budget", 'warnings', 3),
+]
+
+
+def make_corpus(lines, templates=TEMPLATES, seed=7):
+    rng = random.Random(seed)
+    templates, weights = [template[:2] for template in templates], [template[2] for template in templates]
+    messages, labels = [], []
+    for template, label in rng.choices(templates, weights, k=lines):
+        messages.append(template.format(ts=f"2024-05-01T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+                                        n=rng.randrange(50), pid=rng.randrange(1, 65536), a=rng.randrange(256),
+                                        b=rng.randrange(256), port=rng.randrange(1024, 65536)))
+        labels.append(label)
+    return messages, labels
+
+
+def timed(label, func, labels):
+    start = time.monotonic()
+    severities = func()
+    elapsed = time.monotonic() - start
+    correct = sum(1 for severity, expected in zip(severities, labels) if severity == expected)
+    print(f"{label:<26} lines={len(labels):<9} wall={elapsed:.2f}s msgs/sec={len(labels) / elapsed:,.0f} "
+          f"accuracy={100.0 * correct / len(labels):.2f}%")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=2000000)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    messages, labels = make_corpus(args.lines)
+    classifier = SeverityClassifier()
+    substring = timed("substring (old loop)", lambda: [substring_classify(message) for message in messages], labels)
+    single = timed("classifier per message", lambda: [classifier.classify(message) for message in messages], labels)
+    batched = timed(f"classifier batch={args.batch_size}",
+                    lambda: [severity for start in range(0, len(messages), args.batch_size)
+                             for severity in classifier.classify_batch(messages[start:start + args.batch_size])],
+                    labels)
+    print(f"batching speedup={single / batched:.1f}x classifier slowdown vs substring={batched / substring:.1f}x")
+
+    held_out, held_out_labels = make_corpus(max(1, args.lines // 10), templates=HELD_OUT_TEMPLATES)
+    print("held-out messages:")
+    timed("substring (old loop)", lambda: [substring_classify(message) for message in held_out], held_out_labels)
+    timed(f"classifier batch={args.batch_size}",
+          lambda: [severity for start in range(0, len(held_out), args.batch_size)
+                   for severity in classifier.classify_batch(held_out[start:start + args.batch_size])],
+          held_out_labels)
+
+
+if __name__ == '__main__':
+    main()
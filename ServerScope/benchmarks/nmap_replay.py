@@ -0,0 +1,63 @@
+# nmap_replay.py
+#
+# A PortScanner that replays nmap XML instead of running the nmap binary, with a
+# simulated scan time per address. Hosts come from a captured `nmap -sn -oX` file
+# or are synthesized (every Nth address up).
+
+import time
+import ipaddress
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+import nmap
+
+
+def load_hosts(xml_path):
+    """Read (ip, hostname) pairs of the up hosts in a captured nmap XML file."""
+    hosts = []
+    for host in ET.parse(xml_path).getroot().iter('host'):
+        status = host.find('status')
+        address = host.find("address[@addrtype='ipv4']")
+        if status is None or address is None or status.get('state') != 'up':
+            continue
+        hostname = host.find('hostnames/hostname')
+        hosts.append((address.get('addr'), hostname.get('name') if hostname is not None else ''))
+    return hosts
+
+
+def render_xml(target, hosts, total, elapsed):
+    """Build `nmap -sn -oX -` output for the given up hosts."""
+    lines = ['<?xml version="1.0"?>',
+             f'<nmaprun scanner="nmap" args={quoteattr("nmap -oX - -sn " + target)} start="0" version="7.94">']
+    for ip, hostname in hosts:
+        names = f'<hostname name={quoteattr(hostname)} type="PTR"/>' if hostname else ''
+        lines.append(f'<host><status state="up" reason="echo-reply"/><address addr="{ip}" addrtype="ipv4"/>'
+                     f'<hostnames>{names}</hostnames></host>')
+    lines.append(f'<runstats><finished time="0" timestr="" elapsed="{elapsed:.2f}"/>'
+                 f'<hosts up="{len(hosts)}" down="{total - len(hosts)}" total="{total}"/></runstats></nmaprun>')
+    return '\n'.join(lines)
+
+
+class ReplayPortScanner(nmap.PortScanner):
+    def __init__(self, hosts=None, up_every=4, base_delay=0.05, seconds_per_address=0.0005):
+        # Skip PortScanner.__init__, which looks for the nmap binary
+        self._nmap_path = 'nmap'
+        self._scan_result = {}
+        self._nmap_version_number = 7
+        self._nmap_subversion_number = 94
+        self._nmap_last_output = ''
+        self.hosts = hosts
+        self.up_every = up_every
+        self.base_delay = base_delay
+        self.seconds_per_address = seconds_per_address
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        network = ipaddress.ip_network(hosts, strict=False)
+        if self.hosts is not None:
+            up = [(ip, name) for ip, name in self.hosts if ipaddress.ip_address(ip) in network]
+        else:
+            up = [(str(address), f"host-{int(address) & 0xffff}.lan")
+                  for index, address in enumerate(network) if index % self.up_every == 1]
+        elapsed = self.base_delay + self.seconds_per_address * network.num_addresses
+        time.sleep(elapsed)
+        self._nmap_last_output = render_xml(hosts, up, network.num_addresses, elapsed)
+        return self.analyse_nmap_xml_scan(self._nmap_last_output)
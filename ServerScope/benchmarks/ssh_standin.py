@@ -0,0 +1,110 @@
+# ssh_standin.py
+
+import time
+import socket
+import threading
+import paramiko
+
+
+class _StandInInterface(paramiko.ServerInterface):
+    def __init__(self, standin):
+        self.standin = standin
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        # Emulate the cost of a real key exchange + authentication
+        time.sleep(self.standin.handshake_delay)
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_OPEN_FAILED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.standin._respond, args=(channel, command), daemon=True).start()
+        return True
+
+
+class SSHStandIn:
+    def __init__(self, handshake_delay=0.2, command_delay=0.05, responses=None):
+        """
+        A local SSH server for benchmarks. It accepts any password and never runs
+        anything: each command is answered with a canned response after a delay.
+        - handshake_delay: Seconds added to every authentication.
+        - command_delay: Seconds added to every command.
+        - responses: Optional dict mapping a command to its (stdout, stderr, exit_status).
+        """
+        self.handshake_delay = handshake_delay
+        self.command_delay = command_delay
+        self.responses = responses or {}
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.connections = 0
+        self.commands = 0
+        self._sock = None
+        self._transports = []
+        self._running = False
+        self.port = None
+
+    def start(self):
+        """Listen on an ephemeral port on 127.0.0.1."""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(1024)
+        self._sock.settimeout(0.5)
+        self.port = self._sock.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        for transport in self._transports:
+            transport.close()
+        if self._sock:
+            self._sock.close()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        self._transports.append(transport)
+        self.connections += 1
+        try:
+            transport.start_server(server=_StandInInterface(self))
+        except (paramiko.SSHException, EOFError):
+            return
+        # Drain the accept queue, holding on to open channels until they close
+        channels = []
+        while transport.is_active() and self._running:
+            channel = transport.accept(1)
+            channels = [c for c in channels if not c.closed]
+            if channel is not None:
+                channels.append(channel)
+
+    def _respond(self, channel, command):
+        if isinstance(command, bytes):
+            command = command.decode()
+        self.commands += 1
+        time.sleep(self.command_delay)
+        stdout, stderr, exit_status = self.responses.get(command, (f"ok: {command}\n", "", 0))
+        try:
+            if stdout:
+                channel.sendall(stdout.encode())
+            if stderr:
+                channel.sendall_stderr(stderr.encode())
+            channel.send_exit_status(exit_status)
+        finally:
+            channel.close()
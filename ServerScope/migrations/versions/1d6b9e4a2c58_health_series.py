@@ -0,0 +1,34 @@
+"""Add health_series, the compressed per-day health history of each server
+
+Revision ID: 1d6b9e4a2c58
+Revises:
+Create Date: 2026-10-18 08:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d6b9e4a2c58'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'health_series',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('server_id', sa.Integer, sa.ForeignKey('servers.id'), nullable=False),
+        sa.Column('resolution', sa.Integer, nullable=False),
+        sa.Column('day', sa.Date, nullable=False),
+        sa.Column('data', sa.LargeBinary, nullable=False),
+        sa.Column('sample_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime, nullable=True),
+        sa.UniqueConstraint('server_id', 'resolution', 'day', name='uq_health_series_slot'),
+    )
+
+
+def downgrade():
+    op.drop_table('health_series')
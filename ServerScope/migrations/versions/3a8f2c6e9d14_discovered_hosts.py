@@ -0,0 +1,41 @@
+"""Add discovered_hosts, the per-address discovery state, and the scan mode of scan results
+
+Revision ID: 3a8f2c6e9d14
+Revises: 1d6b9e4a2c58
+Create Date: 2026-10-18 08:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8f2c6e9d14'
+down_revision = '1d6b9e4a2c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'discovered_hosts',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('ip_address', sa.String(45), nullable=False, unique=True),
+        sa.Column('hostname', sa.String(255), nullable=True),
+        sa.Column('first_seen', sa.DateTime, nullable=True),
+        sa.Column('last_seen', sa.DateTime, nullable=True),
+        sa.Column('last_checked', sa.DateTime, nullable=False),
+        sa.Column('last_status', sa.String(20), nullable=False),
+    )
+    op.create_index('idx_discovered_last_checked', 'discovered_hosts', ['last_checked'])
+    # Existing results all come from full scans
+    op.add_column('network_scan_results', sa.Column('scan_mode', sa.String(20), nullable=True, server_default='full'))
+    op.add_column('network_scan_results', sa.Column('hosts_probed', sa.Integer, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('network_scan_results') as batch_op:
+        batch_op.drop_column('hosts_probed')
+        batch_op.drop_column('scan_mode')
+    op.drop_index('idx_discovered_last_checked', table_name='discovered_hosts')
+    op.drop_table('discovered_hosts')
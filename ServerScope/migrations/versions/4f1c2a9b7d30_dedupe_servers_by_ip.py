@@ -0,0 +1,95 @@
+"""Merge servers sharing an IP address and index servers by IP address and name
+
+Revision ID: 4f1c2a9b7d30
+Revises: 5c2e7b1d8f63
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a9b7d30'
+down_revision = '5c2e7b1d8f63'
+branch_labels = None
+depends_on = None
+
+servers = sa.table(
+    'servers',
+    sa.column('id', sa.Integer),
+    sa.column('ip_address', sa.String),
+    sa.column('username', sa.String),
+    sa.column('last_health_check', sa.DateTime),
+    sa.column('status', sa.String),
+)
+
+
+def _survivor(rows):
+    """Keep the server with real credentials (scans add 'unknown' ones), then the oldest."""
+    return min(rows, key=lambda row: (row.username == 'unknown', row.id))
+
+
+def _move_rows(bind, table, key_columns, survivor_id, duplicate_ids):
+    """
+    Point a child table's rows at the survivor. Rows that would collide with one the
+    survivor already has on key_columns are dropped instead.
+    """
+    child = sa.table(table, sa.column('server_id', sa.Integer), *(sa.column(name) for name in key_columns))
+    if key_columns:
+        taken = {tuple(row) for row in bind.execute(
+            sa.select(*(child.c[name] for name in key_columns)).where(child.c.server_id == survivor_id))}
+        for duplicate_id in duplicate_ids:
+            for row in bind.execute(sa.select(*(child.c[name] for name in key_columns))
+                                    .where(child.c.server_id == duplicate_id)).all():
+                match = sa.and_(child.c.server_id == duplicate_id,
+                                *(child.c[name] == value for name, value in zip(key_columns, row)))
+                if tuple(row) in taken:
+                    bind.execute(sa.delete(child).where(match))
+                else:
+                    bind.execute(sa.update(child).where(match).values(server_id=survivor_id))
+                    taken.add(tuple(row))
+    else:
+        bind.execute(sa.update(child).where(child.c.server_id.in_(duplicate_ids)).values(server_id=survivor_id))
+
+
+def merge_duplicate_servers(bind):
+    """
+    Merge every group of servers sharing an IP address into one row: child rows are
+    moved to the survivor, which keeps the latest health check, then the others are deleted.
+    - Returns: The number of rows deleted.
+    """
+    tables = set(sa.inspect(bind).get_table_names())
+    duplicated = sa.select(servers.c.ip_address).group_by(servers.c.ip_address).having(sa.func.count() > 1)
+    groups = {}
+    for row in bind.execute(sa.select(servers).where(servers.c.ip_address.in_(duplicated))).all():
+        groups.setdefault(row.ip_address, []).append(row)
+
+    # (table, columns that must stay unique per server)
+    children = [('jobs', []), ('nfs_files', []), ('server_tags', ['tag_id']),
+                ('health_series', ['resolution', 'day'])]
+    deleted = 0
+    for rows in groups.values():
+        survivor = _survivor(rows)
+        duplicate_ids = [row.id for row in rows if row.id != survivor.id]
+        for table, key_columns in children:
+            if table in tables:
+                _move_rows(bind, table, key_columns, survivor.id, duplicate_ids)
+        checks = [row.last_health_check for row in rows if row.last_health_check]
+        bind.execute(sa.update(servers).where(servers.c.id == survivor.id).values(
+            last_health_check=max(checks) if checks else None,
+            status=survivor.status or next((row.status for row in rows if row.status), None)))
+        bind.execute(sa.delete(servers).where(servers.c.id.in_(duplicate_ids)))
+        deleted += len(duplicate_ids)
+    return deleted
+
+
+def upgrade():
+    merge_duplicate_servers(op.get_bind())
+    op.create_index('ix_servers_ip_address', 'servers', ['ip_address'], unique=True)
+    op.create_index('ix_servers_name', 'servers', ['name'])
+
+
+def downgrade():
+    op.drop_index('ix_servers_name', table_name='servers')
+    op.drop_index('ix_servers_ip_address', table_name='servers')
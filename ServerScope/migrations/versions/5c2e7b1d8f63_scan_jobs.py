@@ -0,0 +1,40 @@
+"""Add scan_jobs, the background network scans and their progress
+
+Revision ID: 5c2e7b1d8f63
+Revises: 3a8f2c6e9d14
+Create Date: 2026-10-18 08:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e7b1d8f63'
+down_revision = '3a8f2c6e9d14'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ['blocks_total', 'blocks_done', 'blocks_failed', 'hosts_total', 'hosts_probed', 'hosts_found',
+            'new_machines', 'existing_machines']
+
+
+def upgrade():
+    op.create_table(
+        'scan_jobs',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('network_range', sa.String(255), nullable=False),
+        sa.Column('scan_mode', sa.String(20), nullable=False, server_default='incremental'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('requested_by', sa.String(80), nullable=True),
+        sa.Column('created_at', sa.DateTime, nullable=True),
+        sa.Column('started_at', sa.DateTime, nullable=True),
+        sa.Column('finished_at', sa.DateTime, nullable=True),
+        *(sa.Column(name, sa.Integer, nullable=False, server_default='0') for name in COUNTERS),
+        sa.Column('error', sa.Text, nullable=True),
+        sa.Column('report_id', sa.Integer, sa.ForeignKey('network_scan_results.id'), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('scan_jobs')
@@ -0,0 +1,63 @@
+"""Add 16-byte packed IP columns with range indexes to servers and discovered hosts
+
+Revision ID: 8b3e5d1f2c47
+Revises: 4f1c2a9b7d30
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+import ipaddress
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e5d1f2c47'
+down_revision = '4f1c2a9b7d30'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# (table, index name)
+TABLES = [('servers', 'ix_servers_ip_packed'), ('discovered_hosts', 'idx_discovered_ip_packed')]
+
+
+def pack_ip(value):
+    """Same encoding as app.ip_utils.pack_ip: IPv4 as IPv4-mapped IPv6, 16 bytes big-endian."""
+    try:
+        address = ipaddress.ip_address((value or '').strip())
+    except ValueError:
+        return None
+    number = int(address) | (0xffff << 32) if address.version == 4 else int(address)
+    return number.to_bytes(16, 'big')
+
+
+def backfill(bind, name):
+    """Fill ip_packed for every row, BATCH_SIZE rows per executemany."""
+    table = sa.table(name, sa.column('id', sa.Integer), sa.column('ip_address', sa.String),
+                     sa.column('ip_packed', sa.LargeBinary))
+    update = (sa.update(table).where(table.c.id == sa.bindparam('b_id'))
+              .values(ip_packed=sa.bindparam('b_ip_packed')))
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.select(table.c.id, table.c.ip_address)
+                            .where(table.c.id > last_id).order_by(table.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        bind.execute(update, [{'b_id': row.id, 'b_ip_packed': pack_ip(row.ip_address)} for row in rows])
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    for name, index in TABLES:
+        op.add_column(name, sa.Column('ip_packed', sa.LargeBinary(16), nullable=True))
+        backfill(bind, name)
+        op.create_index(index, name, ['ip_packed'])
+
+
+def downgrade():
+    for name, index in TABLES:
+        op.drop_index(index, table_name=name)
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('ip_packed')
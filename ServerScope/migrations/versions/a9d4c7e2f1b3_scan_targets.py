@@ -0,0 +1,53 @@
+"""Add scan targets with adaptive intervals, and record scan durations
+
+Revision ID: a9d4c7e2f1b3
+Revises: e7a3f9c2b8d1
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4c7e2f1b3'
+down_revision = 'e7a3f9c2b8d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scan_targets',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('network_range', sa.String(255), nullable=False, unique=True),
+        sa.Column('enabled', sa.Boolean, nullable=False, server_default=sa.true()),
+        sa.Column('interval', sa.Integer, nullable=False),
+        sa.Column('current_interval', sa.Integer, nullable=False),
+        sa.Column('churn', sa.Float, nullable=True),
+        sa.Column('next_run_at', sa.DateTime, nullable=True),
+        sa.Column('last_run_at', sa.DateTime, nullable=True),
+        sa.Column('last_duration', sa.Float, nullable=True),
+        sa.Column('last_status', sa.String(20), nullable=True),
+        sa.Column('last_error', sa.Text, nullable=True),
+        sa.Column('last_report_id', sa.Integer, sa.ForeignKey('network_scan_results.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime, nullable=True),
+    )
+    op.create_index('idx_scan_targets_next_run', 'scan_targets', ['enabled', 'next_run_at'])
+    with op.batch_alter_table('scan_jobs') as batch_op:
+        batch_op.add_column(sa.Column('target_id', sa.Integer, nullable=True))
+        batch_op.create_foreign_key('fk_scan_jobs_target_id', 'scan_targets', ['target_id'], ['id'])
+    op.add_column('network_scan_results', sa.Column('hosts_up', sa.Integer, nullable=True))
+    op.add_column('network_scan_results', sa.Column('duration', sa.Float, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('network_scan_results') as batch_op:
+        batch_op.drop_column('duration')
+        batch_op.drop_column('hosts_up')
+    with op.batch_alter_table('scan_jobs') as batch_op:
+        batch_op.drop_constraint('fk_scan_jobs_target_id', type_='foreignkey')
+        batch_op.drop_column('target_id')
+    op.drop_index('idx_scan_targets_next_run', table_name='scan_targets')
+    op.drop_table('scan_targets')
@@ -0,0 +1,31 @@
+"""Add the splunk_analysis table used by SplunkUtils.save_analysis_to_db
+
+Revision ID: b5e1d8a3c6f2
+Revises: a9d4c7e2f1b3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d8a3c6f2'
+down_revision = 'a9d4c7e2f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'splunk_analysis',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('created_at', sa.DateTime, nullable=True),
+        sa.Column('error_logs', sa.Text, nullable=True),
+        sa.Column('warning_logs', sa.Text, nullable=True),
+        sa.Column('info_logs', sa.Text, nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('splunk_analysis')
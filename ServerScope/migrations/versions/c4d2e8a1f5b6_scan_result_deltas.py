@@ -0,0 +1,38 @@
+"""Store the network range, host snapshot and delta to the previous scan with scan results
+
+Revision ID: c4d2e8a1f5b6
+Revises: 8b3e5d1f2c47
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d2e8a1f5b6'
+down_revision = '8b3e5d1f2c47'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column('network_range', sa.String(255), nullable=True),
+    sa.Column('hosts_added', sa.Integer, nullable=True),
+    sa.Column('hosts_removed', sa.Integer, nullable=True),
+    sa.Column('hosts_changed', sa.Integer, nullable=True),
+    sa.Column('snapshot', sa.LargeBinary, nullable=True),
+    sa.Column('delta', sa.LargeBinary, nullable=True),
+]
+
+
+def upgrade():
+    for column in COLUMNS:
+        op.add_column('network_scan_results', column)
+    op.create_index('idx_scan_results_range_time', 'network_scan_results', ['network_range', 'scan_time'])
+
+
+def downgrade():
+    op.drop_index('idx_scan_results_range_time', table_name='network_scan_results')
+    with op.batch_alter_table('network_scan_results') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
@@ -0,0 +1,33 @@
+"""Cache the management transport and OS family found by the fingerprint scan per IP
+
+Revision ID: e7a3f9c2b8d1
+Revises: c4d2e8a1f5b6
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3f9c2b8d1'
+down_revision = 'c4d2e8a1f5b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'host_fingerprints',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('ip_address', sa.String(45), nullable=False, unique=True),
+        sa.Column('transport', sa.String(20), nullable=True),
+        sa.Column('os_type', sa.String(50), nullable=False, server_default='unknown'),
+        sa.Column('ssh_banner', sa.String(255), nullable=True),
+        sa.Column('open_ports', sa.String(100), nullable=True),
+        sa.Column('checked_at', sa.DateTime, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('host_fingerprints')
@@ -2,6 +2,7 @@ import os
 import yaml
 from app import db
 from app.models import Server
+from app.server_lookup_utils import ServerLookup
 from app.logging_utils import log_action
 import sys
 
@@ -31,29 +32,29 @@ def import_servers_from_inventory(inventory_data):
     imported_servers = 0
     existing_servers = 0
 
+    # Collect every host first so existing servers are resolved in one batch, not one query per host
+    hosts = {}
     for group_name, group_data in inventory_data.items():
         if 'hosts' in group_data:
-            for host, host_data in group_data['hosts'].items():
+            for host, host_data in (group_data['hosts'] or {}).items():
                 # Extract server details
-                ip_address = host_data.get('ansible_host', host)
-                os_type = host_data.get('ansible_os_family', 'Unknown')
+                host_data = host_data or {}
+                ip_address = ServerLookup.normalize_ip(host_data.get('ansible_host', host))
+                hosts.setdefault(ip_address, (host, host_data))
 
-                # Check if the server already exists in the database
-                existing_server = Server.query.filter_by(ip=ip_address).first()
-                if existing_server:
-                    existing_servers += 1
-                    print(f"Server '{host}' already exists in the database.")
-                else:
-                    # Create a new server entry
-                    new_server = Server(name=host, ip=ip_address, os=os_type)
-                    try:
-                        db.session.add(new_server)
-                    except Exception as e:
-                        db.session.rollback()
-                        print(f"Error committing server '{host}' to the database: {e}")
-                    else:
-                        imported_servers += 1
-                        print(f"Imported new server '{host}' (IP: {ip_address}, OS: {os_type}).")
+    existing_ips = ServerLookup.existing_ips(hosts)
+    for ip_address, (host, host_data) in hosts.items():
+        if ip_address in existing_ips:
+            existing_servers += 1
+            print(f"Server '{host}' already exists in the database.")
+        else:
+            # Create a new server entry
+            os_type = host_data.get('ansible_os_family', 'Unknown')
+            new_server = Server(name=host, ip_address=ip_address, username=host_data.get('ansible_user', "unknown"),
+                                password="unknown", os_type=os_type)
+            db.session.add(new_server)
+            imported_servers += 1
+            print(f"Imported new server '{host}' (IP: {ip_address}, OS: {os_type}).")
 
     # Commit all new servers in one batch
     try:
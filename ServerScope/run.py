@@ -37,5 +37,10 @@ if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_DEBUG', 'True') == 'True'
     port = int(os.getenv('PORT', 5000))
 
+    # Schedule the fleet-wide jobs; with the debug reloader only its child process runs them
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app.scheduler import init_app as init_scheduler
+        init_scheduler(app)
+
     # Run the app on specified host, port, and debug mode
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
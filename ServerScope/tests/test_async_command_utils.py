@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.async_command_utils import AsyncCommandExecutor, SyncCommandExecutor, _AsyncSSHConnection
+
+def make_process(stdout="ok", stderr=""):
+    """Build a fake asyncssh process whose wait() returns the given output."""
+    process = MagicMock()
+    process.wait = AsyncMock(return_value=MagicMock(stdout=stdout, stderr=stderr))
+    return process
+
+def make_connection(stdout="ok", stderr=""):
+    """Build a fake asyncssh connection whose processes return the given output."""
+    conn = MagicMock()
+    conn.create_process = AsyncMock(side_effect=lambda command: make_process(stdout, stderr))
+    return conn
+
+class TestAsyncCommandUtils(unittest.TestCase):
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_execute_ssh_command_success(self, mock_connect):
+        """Test a successful command over the asyncio backend."""
+        mock_connect.return_value = make_connection("Command executed successfully")
+        executor = AsyncCommandExecutor()
+
+        result = asyncio.run(executor.execute_ssh_command("192.168.1.1", "user", "password", "ls"))
+
+        self.assertEqual(result, "Command executed successfully")
+        self.assertEqual(mock_connect.call_args.args, ("192.168.1.1",))
+        self.assertEqual(mock_connect.call_args.kwargs['username'], "user")
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_execute_ssh_command_error(self, mock_connect):
+        """Test that stderr output is reported like CommandExecutor does."""
+        mock_connect.return_value = make_connection("", "Command failed")
+        executor = AsyncCommandExecutor()
+
+        result = asyncio.run(executor.execute_ssh_command("192.168.1.1", "user", "password", "ls"))
+
+        self.assertEqual(result, "Error: Command failed")
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_execute_ssh_command_connection_failure(self, mock_connect):
+        """Test that connection failures are returned as an error string."""
+        mock_connect.side_effect = OSError("Connection refused")
+        executor = AsyncCommandExecutor()
+
+        result = asyncio.run(executor.execute_ssh_command("192.168.1.1", "user", "password", "ls"))
+
+        self.assertEqual(result, "Error connecting to 192.168.1.1 via SSH: Connection refused")
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_concurrent_commands_share_one_connection(self, mock_connect):
+        """Test that many concurrent commands to one host open a single connection."""
+        mock_connect.return_value = make_connection()
+        executor = AsyncCommandExecutor()
+
+        async def run_many():
+            return await asyncio.gather(*(executor.execute_ssh_command("192.168.1.1", "user", "password", "uptime")
+                                          for _ in range(50)))
+
+        results = asyncio.run(run_many())
+
+        self.assertEqual(results, ["ok"] * 50)
+        mock_connect.assert_called_once()
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_fleet_health_runs_without_extra_threads(self, mock_connect):
+        """Test that a large health sweep does not spawn a thread per host."""
+        async def slow_wait(check=False, timeout=None):
+            await asyncio.sleep(0.05)
+            return MagicMock(stdout="==loadavg==\n0.10 0.20 0.30 1/100 1\n==nproc==\n4\n", stderr="")
+
+        async def create_process(command):
+            process = MagicMock()
+            process.wait = slow_wait
+            return process
+
+        async def connect(host, **kwargs):
+            conn = MagicMock()
+            conn.create_process = create_process
+            return conn
+
+        mock_connect.side_effect = connect
+        sync_executor = SyncCommandExecutor()
+        threads_before = threading.active_count()
+        servers = [(i, f"10.0.{i // 256}.{i % 256}", "user", "password", 'Linux') for i in range(1000)]
+
+        try:
+            health = sync_executor.get_fleet_health(servers)
+        finally:
+            sync_executor.close()
+
+        self.assertEqual(len(health), 1000)
+        self.assertEqual(health[999]['status'], 'Healthy')
+        self.assertEqual(health[999]['load_1'], 0.1)
+        # Only the background event loop thread is added
+        self.assertLessEqual(threading.active_count(), threads_before + 1)
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_connections_are_keyed_by_credential(self, mock_connect):
+        """Test that a connection opened with one password is not reused for another."""
+        mock_connect.side_effect = lambda host, **kwargs: make_connection(kwargs['password'])
+        executor = AsyncCommandExecutor()
+
+        async def run_both():
+            first = await executor.execute_ssh_command("192.168.1.1", "user", "password", "whoami")
+            second = await executor.execute_ssh_command("192.168.1.1", "user", "other", "whoami")
+            return first, second
+
+        self.assertEqual(asyncio.run(run_both()), ("password", "other"))
+        self.assertEqual(mock_connect.call_count, 2)
+        self.assertNotIn("other", repr(list(executor._connections)))
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_dead_connection_is_retried_only_before_the_command_starts(self, mock_connect):
+        """Test that a channel that fails to open is retried, but a command that started is not rerun."""
+        stale = make_connection()
+        stale.create_process = AsyncMock(side_effect=ConnectionResetError("reset"))
+        fresh = make_connection("ok")
+        mock_connect.side_effect = [stale, fresh]
+        executor = AsyncCommandExecutor()
+
+        self.assertEqual(asyncio.run(executor.execute_ssh_command("192.168.1.1", "user", "password", "ls")), "ok")
+
+        dropped = make_process()
+        dropped.wait = AsyncMock(side_effect=ConnectionResetError("connection lost"))
+        fresh.create_process = AsyncMock(return_value=dropped)
+        result = asyncio.run(executor.execute_ssh_command("192.168.1.1", "user", "password", "reboot"))
+
+        self.assertTrue(result.startswith("Error"))
+        fresh.create_process.assert_called_once_with("reboot")
+
+    @patch('app.async_command_utils.asyncssh.connect', new_callable=AsyncMock)
+    def test_failed_connects_do_not_keep_locks(self, mock_connect):
+        """Test that connect locks are only kept for open connections."""
+        mock_connect.side_effect = OSError("Connection refused")
+        executor = AsyncCommandExecutor()
+
+        async def run_many():
+            await asyncio.gather(*(executor.execute_ssh_command(f"10.0.0.{i}", "user", "password", "ls")
+                                   for i in range(20)))
+
+        asyncio.run(run_many())
+
+        self.assertEqual(executor._connect_locks, {})
+
+    @patch.object(AsyncCommandExecutor, 'execute_winrm_command', new_callable=AsyncMock)
+    def test_windows_health_uses_winrm(self, mock_winrm):
+        """Test that a Windows server's health is collected with the CIM command over WinRM."""
+        mock_winrm.return_value = "cpu_percent=12\ncpu_count=4\n"
+        executor = AsyncCommandExecutor()
+
+        health = asyncio.run(executor.get_server_health("10.0.0.2", "user", "password", os_type='Windows'))
+
+        self.assertIn("Win32_OperatingSystem", mock_winrm.call_args.args[3])
+        self.assertEqual(health['cpu_percent'], 12.0)
+
+    def test_idle_connections_are_evicted_in_the_background(self):
+        """Test that the background loop closes idle connections without being asked."""
+        executor = AsyncCommandExecutor(idle_timeout=0)
+        sync_executor = SyncCommandExecutor(executor=executor, evict_interval=0.01)
+        conn = make_connection()
+        key = ("10.0.0.1", 22, "user", "digest")
+
+        async def add_connection():
+            executor._connections[key] = _AsyncSSHConnection(conn)
+
+        try:
+            sync_executor.run(add_connection())
+            for _ in range(100):
+                if not executor._connections:
+                    break
+                threading.Event().wait(0.01)
+        finally:
+            sync_executor.close()
+
+        self.assertEqual(executor._connections, {})
+        conn.close.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import time
+import threading
+import unittest
+from unittest.mock import patch
+from app.cache_utils import ResultCache, result_cache
+from app.nfs_utils import NFSUtils, NFS_LIST_COMMAND
+
+class TestCacheUtils(unittest.TestCase):
+
+    def setUp(self):
+        result_cache.clear()
+
+    def test_hit_within_ttl_and_expiry(self):
+        """Test that results are reused until their TTL runs out."""
+        cache = ResultCache()
+        calls = []
+
+        def run():
+            calls.append(1)
+            return f"result {len(calls)}"
+
+        self.assertEqual(cache.get_or_call("10.0.0.1", "uptime", run, max_age=0.1), "result 1")
+        self.assertEqual(cache.get_or_call("10.0.0.1", "uptime", run, max_age=0.1), "result 1")
+        time.sleep(0.15)
+        self.assertEqual(cache.get_or_call("10.0.0.1", "uptime", run, max_age=0.1), "result 2")
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_max_age_is_checked_on_read(self):
+        """Test that each read applies its own max_age and that max_age=0 forces a new call."""
+        cache = ResultCache()
+        calls = []
+
+        def run():
+            calls.append(1)
+            return f"result {len(calls)}"
+
+        cache.get_or_call("10.0.0.1", "uptime", run, max_age=15)
+        time.sleep(0.05)
+        self.assertEqual(cache.get_or_call("10.0.0.1", "uptime", run, max_age=0.01), "result 2")
+        self.assertEqual(cache.get_or_call("10.0.0.1", "uptime", run, max_age=0), "result 3")
+        self.assertEqual(cache.get_or_call("10.0.0.1", "uptime", run, max_age=15), "result 3")  # the forced result was stored
+        self.assertEqual(len(calls), 3)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when the cache is full."""
+        cache = ResultCache(max_entries=2)
+        cache.get_or_call("a", "cmd", lambda: 1)
+        cache.get_or_call("b", "cmd", lambda: 2)
+        cache.get_or_call("a", "cmd", lambda: 0)  # refreshes 'a'
+        cache.get_or_call("c", "cmd", lambda: 3)
+
+        self.assertEqual(cache.get_or_call("a", "cmd", lambda: "missed"), 1)
+        self.assertEqual(cache.get_or_call("b", "cmd", lambda: "missed"), "missed")
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_concurrent_requests_share_one_call(self):
+        """Test that identical requests arriving together run the command once."""
+        cache = ResultCache()
+        calls = []
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "shared"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_call("10.0.0.1", "df", slow)))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["shared"] * 10)
+        self.assertEqual(cache.stats()['coalesced'], 9)
+
+    def test_rejected_results_are_not_cached(self):
+        """Test that errors are returned but not stored."""
+        cache = ResultCache()
+        not_error = lambda result: not result.startswith('Error')
+
+        self.assertEqual(cache.get_or_call("10.0.0.1", "ls", lambda: "Error: down", cache_if=not_error), "Error: down")
+        self.assertEqual(cache.get_or_call("10.0.0.1", "ls", lambda: "ok", cache_if=not_error), "ok")
+
+    @patch('app.nfs_utils.NFSUtils.execute_ssh_command')
+    def test_nfs_changes_invalidate_listing(self, mock_execute):
+        """Test that adding a share invalidates the cached share listing of that server."""
+        mock_execute.return_value = "Export list for host:\n/srv/a 10.0.0.0/24\n"
+        NFSUtils.list_nfs_shares("10.0.0.1", "user", "password", max_age=60)
+        NFSUtils.list_nfs_shares("10.0.0.1", "user", "password", max_age=60)
+        self.assertEqual(mock_execute.call_count, 1)
+
+        NFSUtils.add_nfs_share("10.0.0.1", "user", "password", "/srv/b")
+        mock_execute.return_value = "Export list for host:\n/srv/a 10.0.0.0/24\n/srv/b 10.0.0.0/24\n"
+        shares = NFSUtils.list_nfs_shares("10.0.0.1", "user", "password", max_age=60)
+
+        self.assertEqual([share['path'] for share in shares], ['/srv/a', '/srv/b'])
+        mock_execute.assert_called_with("10.0.0.1", "user", "password", NFS_LIST_COMMAND)
+
+if __name__ == '__main__':
+    unittest.main()
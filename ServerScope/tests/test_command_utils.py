@@ -1,31 +1,86 @@
 import unittest
 from unittest.mock import patch, MagicMock
 from app.command_utils import CommandExecutor
+from app.connection_pool import ssh_pool, winrm_pool, SSHConnectionPool, PoolTimeoutError
 import paramiko
 import winrm
 
+class FakeChannel:
+    """Minimal stand-in for a paramiko channel that has already produced all its output."""
+
+    def __init__(self, stdout=b"", stderr=b"", exit_status=0, chunk_size=None):
+        chunk = chunk_size or max(len(stdout), len(stderr), 1)
+        self.stdout_chunks = [stdout[i:i + chunk] for i in range(0, len(stdout), chunk)]
+        self.stderr_chunks = [stderr[i:i + chunk] for i in range(0, len(stderr), chunk)]
+        self.exit_status = exit_status
+
+    def recv_ready(self):
+        return bool(self.stdout_chunks)
+
+    def recv(self, size):
+        return self.stdout_chunks.pop(0)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr_chunks)
+
+    def recv_stderr(self, size):
+        return self.stderr_chunks.pop(0)
+
+    def exit_status_ready(self):
+        return True
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+def make_exec_result(stdout=b"", stderr=b"", exit_status=0, chunk_size=None):
+    """Build the (stdin, stdout, stderr) triple returned by SSHClient.exec_command."""
+    mock_stdout = MagicMock()
+    mock_stdout.channel = FakeChannel(stdout, stderr, exit_status, chunk_size)
+    return MagicMock(), mock_stdout, MagicMock()
+
+class FakeSessionChannel(FakeChannel):
+    """FakeChannel opened with Transport.open_session; output depends on the command run."""
+
+    def __init__(self, outputs):
+        super().__init__()
+        self.outputs = outputs
+        self.closed = False
+
+    def exec_command(self, command):
+        stdout, stderr, exit_status = self.outputs[command]
+        self.stdout_chunks = [stdout] if stdout else []
+        self.stderr_chunks = [stderr] if stderr else []
+        self.exit_status = exit_status
+
+    def shutdown_write(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
 class TestCommandUtils(unittest.TestCase):
 
+    def setUp(self):
+        """Start every test with empty connection pools."""
+        ssh_pool.close_all()
+        winrm_pool.close_all()
+
     @patch('paramiko.SSHClient')
     def test_execute_ssh_command_success(self, mock_ssh_client):
         """Test successful SSH command execution."""
         # Setup mock SSH client and its behavior
         mock_ssh_instance = MagicMock()
         mock_ssh_client.return_value = mock_ssh_instance
-        mock_stdout = MagicMock()
-        mock_stdout.read.return_value = b"Command executed successfully"
-        mock_stderr = MagicMock()
-        mock_stderr.read.return_value = b""
-        mock_ssh_instance.exec_command.return_value = (None, mock_stdout, mock_stderr)
+        mock_ssh_instance.exec_command.return_value = make_exec_result(b"Command executed successfully", b"")
 
         # Call the function
         result = CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "ls")
 
         # Assertions
         self.assertEqual(result, "Command executed successfully")
-        mock_ssh_instance.connect.assert_called_with("192.168.1.1", username="user", password="password")
-        mock_ssh_instance.exec_command.assert_called_with("ls")
-        mock_ssh_instance.close.assert_called_once()
+        mock_ssh_instance.connect.assert_called_with("192.168.1.1", port=22, username="user", password="password", timeout=ssh_pool.connect_timeout)
+        mock_ssh_instance.exec_command.assert_called_with("ls", timeout=None)
+        mock_ssh_instance.close.assert_not_called()  # Connection is kept in the pool
 
     @patch('paramiko.SSHClient')
     def test_execute_ssh_command_error(self, mock_ssh_client):
@@ -33,20 +88,16 @@ class TestCommandUtils(unittest.TestCase):
         # Setup mock SSH client and its behavior
         mock_ssh_instance = MagicMock()
         mock_ssh_client.return_value = mock_ssh_instance
-        mock_stdout = MagicMock()
-        mock_stdout.read.return_value = b""
-        mock_stderr = MagicMock()
-        mock_stderr.read.return_value = b"Error: Command failed"
-        mock_ssh_instance.exec_command.return_value = (None, mock_stdout, mock_stderr)
+        mock_ssh_instance.exec_command.return_value = make_exec_result(b"", b"Error: Command failed")
 
         # Call the function
         result = CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "ls")
 
         # Assertions
         self.assertEqual(result, "Error: Error: Command failed")
-        mock_ssh_instance.connect.assert_called_with("192.168.1.1", username="user", password="password")
-        mock_ssh_instance.exec_command.assert_called_with("ls")
-        mock_ssh_instance.close.assert_called_once()
+        mock_ssh_instance.connect.assert_called_with("192.168.1.1", port=22, username="user", password="password", timeout=ssh_pool.connect_timeout)
+        mock_ssh_instance.exec_command.assert_called_with("ls", timeout=None)
+        mock_ssh_instance.close.assert_not_called()  # Connection is kept in the pool
 
     @patch('paramiko.SSHClient')
     def test_execute_ssh_command_connection_failure(self, mock_ssh_client):
@@ -61,19 +112,156 @@ class TestCommandUtils(unittest.TestCase):
 
         # Assertions
         self.assertEqual(result, "Error connecting to 192.168.1.1: Connection failed")
-        mock_ssh_instance.connect.assert_called_with("192.168.1.1", username="user", password="password")
+        mock_ssh_instance.connect.assert_called_with("192.168.1.1", port=22, username="user", password="password", timeout=ssh_pool.connect_timeout)
         mock_ssh_instance.close.assert_called_once()
 
+    @patch('paramiko.SSHClient')
+    def test_execute_ssh_command_reuses_pooled_connection(self, mock_ssh_client):
+        """Test that consecutive commands to the same host share one connection."""
+        mock_ssh_instance = MagicMock()
+        mock_ssh_client.return_value = mock_ssh_instance
+        mock_ssh_instance.exec_command.return_value = make_exec_result(b"ok", b"")
+
+        CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "uptime")
+        CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "df -h")
+
+        # One handshake, two channels
+        self.assertEqual(mock_ssh_instance.connect.call_count, 1)
+        self.assertEqual(mock_ssh_instance.exec_command.call_count, 2)
+
+    @patch('paramiko.SSHClient')
+    def test_execute_ssh_command_replaces_dead_connection(self, mock_ssh_client):
+        """Test that a pooled connection whose transport died is replaced."""
+        dead_instance = MagicMock()
+        live_instance = MagicMock()
+        mock_ssh_client.side_effect = [dead_instance, live_instance]
+        for instance in (dead_instance, live_instance):
+            instance.exec_command.return_value = make_exec_result(b"ok", b"")
+
+        CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "uptime")
+        dead_instance.get_transport.return_value.is_active.return_value = False
+        result = CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "uptime")
+
+        self.assertEqual(result, "ok")
+        dead_instance.close.assert_called_once()
+        live_instance.connect.assert_called_once()
+
+    @patch('paramiko.SSHClient')
+    def test_ssh_pool_per_host_limit(self, mock_ssh_client):
+        """Test that the pool refuses to open more than max_per_host connections."""
+        mock_ssh_client.side_effect = lambda: MagicMock()
+        pool = SSHConnectionPool(max_per_host=1, max_total=4, acquire_timeout=0)
+
+        first = pool.acquire("192.168.1.1", "user", "password")
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire("192.168.1.1", "user", "password")
+
+        # Other hosts are unaffected, and releasing frees the slot
+        other = pool.acquire("192.168.1.2", "user", "password")
+        pool.release(first)
+        self.assertIs(pool.acquire("192.168.1.1", "user", "password"), first)
+        pool.release(other)
+
+    @patch('paramiko.SSHClient')
+    def test_ssh_pool_keys_by_credential(self, mock_ssh_client):
+        """Test that a connection opened with one password is not handed out for another."""
+        mock_ssh_client.side_effect = lambda: MagicMock()
+        pool = SSHConnectionPool(acquire_timeout=0)
+
+        first = pool.acquire("192.168.1.1", "user", "password")
+        pool.release(first)
+        other = pool.acquire("192.168.1.1", "user", "wrong")
+
+        self.assertIsNot(other, first)
+        self.assertNotIn("wrong", repr(other.key))
+        pool.release(other)
+        self.assertIs(pool.acquire("192.168.1.1", "user", "password"), first)
+
+    @patch('paramiko.SSHClient')
+    def test_ssh_pool_global_limit_evicts_idle(self, mock_ssh_client):
+        """Test that hitting the global limit closes the least recently used idle connection."""
+        mock_ssh_client.side_effect = lambda: MagicMock()
+        pool = SSHConnectionPool(max_per_host=2, max_total=1, acquire_timeout=0)
+
+        first = pool.acquire("192.168.1.1", "user", "password")
+        pool.release(first)
+        second = pool.acquire("192.168.1.2", "user", "password")
+
+        first.client.close.assert_called_once()
+        self.assertEqual(pool.stats()['open'], 1)
+        pool.release(second)
+
+    @patch('paramiko.SSHClient')
+    def test_ssh_pool_evicts_idle_connections(self, mock_ssh_client):
+        """Test that idle connections past the idle timeout are closed."""
+        mock_ssh_client.side_effect = lambda: MagicMock()
+        pool = SSHConnectionPool(idle_timeout=0)
+
+        conn = pool.acquire("192.168.1.1", "user", "password")
+        pool.release(conn)
+        conn.last_used -= 1
+
+        self.assertEqual(pool.evict_idle(), 1)
+        conn.client.close.assert_called_once()
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_iter_channel_output_interleaves_streams(self):
+        """Test that stdout and stderr chunks are both passed through as they arrive."""
+        channel = FakeChannel(b"line1\nline2\n", b"warn\n", exit_status=3, chunk_size=6)
+
+        events = list(CommandExecutor.iter_channel_output(channel))
+
+        self.assertEqual(events[-1], ('exit', 3))
+        stdout = ''.join(text for stream, text in events if stream == 'stdout')
+        stderr = ''.join(text for stream, text in events if stream == 'stderr')
+        self.assertEqual(stdout, "line1\nline2\n")
+        self.assertEqual(stderr, "warn\n")
+        # The first stderr chunk is read before stdout has been fully drained
+        streams = [stream for stream, _ in events]
+        self.assertLess(streams.index('stderr'), len(streams) - 2)
+
+    def test_iter_channel_output_caps_memory(self):
+        """Test that output past max_bytes is drained but not passed on."""
+        channel = FakeChannel(b"x" * 100, chunk_size=10)
+
+        events = list(CommandExecutor.iter_channel_output(channel, max_bytes=25))
+
+        stdout = ''.join(text for stream, text in events if stream == 'stdout')
+        self.assertEqual(stdout, "x" * 25)
+        self.assertIn(('truncated', 'stdout'), events)
+        self.assertEqual(channel.stdout_chunks, [])
+
+    def test_iter_channel_output_splits_multibyte_characters(self):
+        """Test that UTF-8 characters split across chunks are decoded correctly."""
+        channel = FakeChannel("caf\u00e9 \u00fcber".encode('utf-8'), chunk_size=4)
+
+        events = list(CommandExecutor.iter_channel_output(channel))
+
+        self.assertEqual(''.join(text for stream, text in events if stream == 'stdout'), "caf\u00e9 \u00fcber")
+
+    @patch('paramiko.SSHClient')
+    def test_execute_ssh_command_callback(self, mock_ssh_client):
+        """Test that the callback sees every chunk as it is read."""
+        mock_ssh_instance = MagicMock()
+        mock_ssh_client.return_value = mock_ssh_instance
+        mock_ssh_instance.exec_command.return_value = make_exec_result(b"abcdef", chunk_size=2)
+        chunks = []
+
+        result = CommandExecutor.execute_ssh_command("192.168.1.1", "user", "password", "ls",
+                                                     callback=lambda stream, text: chunks.append((stream, text)))
+
+        self.assertEqual(result, "abcdef")
+        self.assertEqual(chunks, [('stdout', 'ab'), ('stdout', 'cd'), ('stdout', 'ef')])
+
     @patch('winrm.Session')
     def test_execute_winrm_command_success(self, mock_winrm_session):
         """Test successful WinRM command execution."""
         # Setup mock WinRM session and its behavior
         mock_session_instance = MagicMock()
         mock_winrm_session.return_value = mock_session_instance
-        mock_result = MagicMock()
-        mock_result.std_out = b"Command executed successfully"
-        mock_result.std_err = b""
-        mock_session_instance.run_cmd.return_value = mock_result
+        mock_session_instance.protocol.open_shell.return_value = "shell-1"
+        mock_session_instance.protocol.run_command.return_value = "command-1"
+        mock_session_instance.protocol.get_command_output.return_value = (b"Command executed successfully", b"", 0)
 
         # Call the function
         result = CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "dir")
@@ -81,7 +269,8 @@ class TestCommandUtils(unittest.TestCase):
         # Assertions
         self.assertEqual(result, "Command executed successfully")
         mock_winrm_session.assert_called_with('http://192.168.1.100:5985/wsman', auth=("Administrator", "password"))
-        mock_session_instance.run_cmd.assert_called_with("dir")
+        mock_session_instance.protocol.run_command.assert_called_with("shell-1", "dir", ())
+        mock_session_instance.protocol.cleanup_command.assert_called_with("shell-1", "command-1")
 
     @patch('winrm.Session')
     def test_execute_winrm_command_error(self, mock_winrm_session):
@@ -89,10 +278,9 @@ class TestCommandUtils(unittest.TestCase):
         # Setup mock WinRM session and its behavior
         mock_session_instance = MagicMock()
         mock_winrm_session.return_value = mock_session_instance
-        mock_result = MagicMock()
-        mock_result.std_out = b""
-        mock_result.std_err = b"Error: Command failed"
-        mock_session_instance.run_cmd.return_value = mock_result
+        mock_session_instance.protocol.open_shell.return_value = "shell-1"
+        mock_session_instance.protocol.run_command.return_value = "command-1"
+        mock_session_instance.protocol.get_command_output.return_value = (b"", b"Error: Command failed", 1)
 
         # Call the function
         result = CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "dir")
@@ -100,7 +288,82 @@ class TestCommandUtils(unittest.TestCase):
         # Assertions
         self.assertEqual(result, "Error: Error: Command failed")
         mock_winrm_session.assert_called_with('http://192.168.1.100:5985/wsman', auth=("Administrator", "password"))
-        mock_session_instance.run_cmd.assert_called_with("dir")
+        mock_session_instance.protocol.run_command.assert_called_with("shell-1", "dir", ())
+        mock_session_instance.protocol.cleanup_command.assert_called_with("shell-1", "command-1")
+
+    @patch('winrm.Session')
+    def test_execute_winrm_command_stderr_with_success_status(self, mock_winrm_session):
+        """Test that stderr output (e.g. a PowerShell progress record) does not fail a command that exited 0."""
+        mock_session_instance = MagicMock()
+        mock_winrm_session.return_value = mock_session_instance
+        mock_session_instance.protocol.get_command_output.return_value = (b"cpu_percent=12", b"#< CLIXML progress", 0)
+
+        result = CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "health")
+
+        self.assertEqual(result, "cpu_percent=12")
+
+    @patch('winrm.Session')
+    def test_execute_winrm_command_reuses_shell(self, mock_winrm_session):
+        """Test that consecutive WinRM commands share one session and shell."""
+        mock_session_instance = MagicMock()
+        mock_winrm_session.return_value = mock_session_instance
+        mock_session_instance.protocol.get_command_output.return_value = (b"ok", b"", 0)
+
+        CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "hostname")
+        CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "ipconfig")
+
+        mock_winrm_session.assert_called_once()
+        mock_session_instance.protocol.open_shell.assert_called_once()
+        self.assertEqual(mock_session_instance.protocol.run_command.call_count, 2)
+        mock_session_instance.protocol.close_shell.assert_not_called()
+
+    @patch('winrm.Session')
+    def test_execute_winrm_command_recycles_broken_shell(self, mock_winrm_session):
+        """Test that a shell reaped on the server is replaced and the command retried."""
+        stale_session = MagicMock()
+        fresh_session = MagicMock()
+        mock_winrm_session.side_effect = [stale_session, fresh_session]
+        for session in (stale_session, fresh_session):
+            session.protocol.get_command_output.return_value = (b"ok", b"", 0)
+
+        CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "hostname")
+        stale_session.protocol.run_command.side_effect = winrm.exceptions.WSManFaultError(
+            500, "fault", "The request for the Windows Remote Shell with ShellId failed", "", "")
+        result = CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "hostname")
+
+        self.assertEqual(result, "ok")
+        stale_session.protocol.close_shell.assert_called_once()
+        fresh_session.protocol.open_shell.assert_called_once()
+
+    @patch('winrm.Session')
+    def test_execute_winrm_command_not_retried_once_started(self, mock_winrm_session):
+        """Test that a command failing while its output is read is not run a second time."""
+        mock_session_instance = MagicMock()
+        mock_winrm_session.return_value = mock_session_instance
+        mock_session_instance.protocol.get_command_output.return_value = (b"ok", b"", 0)
+
+        CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "hostname")
+        mock_session_instance.protocol.get_command_output.side_effect = winrm.exceptions.WinRMTransportError(
+            'http', 500, "connection reset")
+        CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "hostname")
+
+        self.assertEqual(mock_session_instance.protocol.run_command.call_count, 2)
+        mock_session_instance.protocol.transport.close_session.assert_called_once()
+
+    @patch('winrm.Session')
+    def test_winrm_pool_expires_idle_shells(self, mock_winrm_session):
+        """Test that idle shells are closed after the idle timeout."""
+        mock_session_instance = MagicMock()
+        mock_winrm_session.return_value = mock_session_instance
+        mock_session_instance.protocol.get_command_output.return_value = (b"ok", b"", 0)
+
+        CommandExecutor.execute_winrm_command("192.168.1.100", "Administrator", "password", "hostname")
+        for shells in winrm_pool._idle.values():
+            for shell in shells:
+                shell.last_used -= winrm_pool.idle_timeout + 1
+
+        self.assertEqual(winrm_pool.evict_idle(), 1)
+        mock_session_instance.protocol.close_shell.assert_called_once()
 
     @patch('winrm.Session')
     def test_execute_winrm_command_connection_failure(self, mock_winrm_session):
@@ -117,5 +380,59 @@ class TestCommandUtils(unittest.TestCase):
         self.assertEqual(result, "Error connecting to 192.168.1.100: Connection failed")
         mock_winrm_session.assert_called_with('http://192.168.1.100:5985/wsman', auth=("Administrator", "password"))
 
+    @patch('paramiko.SSHClient')
+    def test_execute_ssh_batch_uses_one_connection(self, mock_ssh_client):
+        """Test that a batch runs every command on its own channel of one connection."""
+        outputs = {"uptime": (b"up 3 days", b"", 0), "df": (b"", b"df: denied", 1)}
+        mock_ssh_instance = MagicMock()
+        mock_ssh_client.return_value = mock_ssh_instance
+        channels = []
+        transport = mock_ssh_instance.get_transport.return_value
+        transport.open_session.side_effect = lambda timeout=None: channels.append(FakeSessionChannel(outputs)) or channels[-1]
+
+        results = CommandExecutor.execute_ssh_batch("192.168.1.1", "user", "password",
+                                                    {"uptime": "uptime", "disk": "df"})
+
+        self.assertEqual(list(results), ["uptime", "disk"])
+        self.assertEqual(results["uptime"], {'stdout': "up 3 days", 'stderr': "", 'exit_status': 0, 'error': None})
+        self.assertEqual(results["disk"]['stderr'], "df: denied")
+        self.assertEqual(results["disk"]['exit_status'], 1)
+        self.assertEqual(mock_ssh_instance.connect.call_count, 1)
+        self.assertTrue(all(channel.closed for channel in channels))
+
+    @patch('paramiko.SSHClient')
+    def test_execute_ssh_batch_shrinks_waves_when_sessions_are_refused(self, mock_ssh_client):
+        """Test that a refused channel is retried once earlier channels are finished."""
+        outputs = {f"cmd{i}": (f"out{i}".encode(), b"", 0) for i in range(5)}
+        mock_ssh_instance = MagicMock()
+        mock_ssh_client.return_value = mock_ssh_instance
+        open_channels = []
+
+        def open_session(timeout=None):
+            if len([channel for channel in open_channels if not channel.closed]) >= 2:
+                raise paramiko.ChannelException(1, "administratively prohibited")
+            open_channels.append(FakeSessionChannel(outputs))
+            return open_channels[-1]
+
+        mock_ssh_instance.get_transport.return_value.open_session.side_effect = open_session
+
+        results = CommandExecutor.execute_ssh_batch("192.168.1.1", "user", "password",
+                                                    [(f"c{i}", f"cmd{i}") for i in range(5)])
+
+        self.assertEqual([result['stdout'] for result in results.values()], [f"out{i}" for i in range(5)])
+        self.assertEqual(len(open_channels), 5)
+
+    @patch('paramiko.SSHClient')
+    def test_execute_ssh_batch_connection_failure(self, mock_ssh_client):
+        """Test that a failed connection is reported for every command."""
+        mock_ssh_instance = MagicMock()
+        mock_ssh_client.return_value = mock_ssh_instance
+        mock_ssh_instance.connect.side_effect = Exception("Connection failed")
+
+        results = CommandExecutor.execute_ssh_batch("192.168.1.1", "user", "password", {"a": "ls", "b": "pwd"})
+
+        self.assertEqual({result['error'] for result in results.values()},
+                         {"Error connecting to 192.168.1.1 via SSH: Connection failed"})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+import time
+import socket
+import asyncio
+import unittest
+from unittest.mock import patch
+from app.discovery_utils import TcpDiscoveryEngine, RateLimiter
+from app.network_scan_utils import NetworkScanner
+
+class TestDiscoveryUtils(unittest.TestCase):
+    """Probes addresses of 127.0.0.0/8, which answer locally without a network."""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.3", 0))
+        self.listener.listen(16)
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_open_port_marks_host_up(self):
+        """Test that only the host with a listening port is up when resets are not counted."""
+        engine = TcpDiscoveryEngine(ports=[self.port], resolve_hostnames=False, refused_is_up=False)
+
+        results = engine.scan([f"127.0.0.{i}" for i in range(1, 7)])
+
+        self.assertEqual(results, [{'ip': "127.0.0.3", 'hostname': "Unknown", 'status': 'up'}])
+
+    def test_refused_connection_marks_host_up(self):
+        """Test that a reset from a closed port counts as a live host by default."""
+        engine = TcpDiscoveryEngine(ports=[self.port], resolve_hostnames=False)
+
+        results = engine.scan(["127.0.0.1", "127.0.0.2"])
+
+        self.assertEqual([result['ip'] for result in results], ["127.0.0.1", "127.0.0.2"])
+
+    def test_silent_host_times_out(self):
+        """Test that a host answering on no port within the timeout is down."""
+        async def never_connects(loop, sock, address):
+            await asyncio.sleep(10)
+
+        engine = TcpDiscoveryEngine(ports=[22, 445], timeout=0.1, resolve_hostnames=False)
+        start = time.monotonic()
+        with patch('asyncio.selector_events.BaseSelectorEventLoop.sock_connect', never_connects):
+            results = engine.scan(["127.0.0.1", "127.0.0.2"])
+
+        self.assertEqual(results, [])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_rate_limiter_spaces_attempts(self):
+        """Test that the global rate limit spaces out connection attempts."""
+        limiter = RateLimiter(100)
+
+        delays = [limiter.reserve() for _ in range(20)]
+
+        self.assertEqual(delays[0], 0.0)
+        self.assertAlmostEqual(delays[-1], 0.19, delta=0.01)
+        self.assertEqual(RateLimiter(0).reserve(), 0.0)
+
+    def test_network_scanner_tcp_backend(self):
+        """Test that NetworkScanner returns the same result dictionaries with the tcp backend."""
+        engine = TcpDiscoveryEngine(ports=[self.port], resolve_hostnames=False, refused_is_up=False)
+        scanner = NetworkScanner("127.0.0.0/29 127.0.0.1-9", max_workers=2, engine=engine)
+
+        results = scanner.scan_network()
+
+        self.assertEqual(results, [{'ip': "127.0.0.3", 'hostname': "Unknown", 'status': 'up'}])
+        self.assertEqual(scanner.failed_shards, ["127.0.0.1-9"])  # nmap-only syntax
+
+if __name__ == '__main__':
+    unittest.main()
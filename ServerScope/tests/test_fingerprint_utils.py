@@ -0,0 +1,158 @@
+import socket
+import asyncio
+import threading
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from app.models import db, Server, HostFingerprint
+from app.connection_pool import WinRMShellPool
+from app.command_utils import CommandExecutor
+from app.fingerprint_utils import Fingerprinter, host_transports, stored_transports
+from app.network_scan_utils import NetworkScanner
+
+class TestFingerprinter(unittest.TestCase):
+
+    def test_classify(self):
+        """Test the transport and OS family inferred from the open ports and SSH banner."""
+        self.assertEqual(Fingerprinter.classify("SSH-2.0-OpenSSH_8.9p1 Ubuntu-3", [22, 5985]), ('winrm', 'Windows'))
+        self.assertEqual(Fingerprinter.classify(None, [5986, 445]), ('winrm-https', 'Windows'))
+        self.assertEqual(Fingerprinter.classify("SSH-2.0-OpenSSH_8.9p1 Ubuntu-3", [22]), ('ssh', 'Linux'))
+        self.assertEqual(Fingerprinter.classify("SSH-2.0-OpenSSH_for_Windows_8.1", [22]), ('ssh', 'Windows'))
+        self.assertEqual(Fingerprinter.classify(None, [445]), (None, 'Windows'))
+        self.assertEqual(Fingerprinter.classify(None, [22]), (None, 'unknown'))
+
+    def test_read_banner(self):
+        """Test reading the banner an SSH server sends on connect."""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.4", 0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+
+        def serve():
+            connection, _ = listener.accept()
+            connection.sendall(b"SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.6\r\n")
+            connection.close()
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        fingerprinter = Fingerprinter(timeout=1.0)
+        try:
+            result = asyncio.run(fingerprinter.read_banner("127.0.0.4", port))
+        finally:
+            thread.join()
+            listener.close()
+
+        self.assertEqual(result, (True, "SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.6"))
+        self.assertFalse(asyncio.run(fingerprinter.port_open("127.0.0.4", port)))
+
+class TestFingerprintCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        host_transports.clear()
+        stored_transports.clear()
+        self.now = datetime(2026, 1, 1)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        host_transports.clear()
+        stored_transports.clear()
+
+    def fake_probe(self, addresses, now=None):
+        return [{'ip_address': address, 'transport': 'ssh', 'os_type': 'Linux', 'ssh_banner': "SSH-2.0-OpenSSH_9.6",
+                 'open_ports': '22', 'checked_at': now} for address in addresses]
+
+    def test_cached_hosts_are_not_probed_again(self):
+        """Test that only hosts without a fresh fingerprint are probed."""
+        fingerprinter = Fingerprinter(ttl=3600)
+        with patch.object(Fingerprinter, 'probe', side_effect=self.fake_probe) as probe:
+            fingerprinter.fingerprint(["10.0.0.1", "10.0.0.2"], self.now)
+            records = fingerprinter.fingerprint(["10.0.0.1", "10.0.0.2", "10.0.0.3"],
+                                                self.now + timedelta(minutes=30))
+            fingerprinter.fingerprint(["10.0.0.1"], self.now + timedelta(hours=2))
+
+        self.assertEqual([call.args[0] for call in probe.call_args_list],
+                         [["10.0.0.1", "10.0.0.2"], ["10.0.0.3"], ["10.0.0.1"]])
+        self.assertEqual(sorted(records), ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual(HostFingerprint.query.count(), 3)
+        self.assertEqual(host_transports["10.0.0.3"], 'ssh')
+
+    def test_apply_to_servers_only_fills_unknown(self):
+        """Test that fingerprints do not override an os_type set by an operator."""
+        db.session.add_all([
+            Server(name="scanned", ip_address="10.0.0.1", username="unknown", password="unknown", os_type="unknown"),
+            Server(name="managed", ip_address="10.0.0.2", username="admin", password="secret", os_type="centos"),
+        ])
+        db.session.commit()
+
+        updated = Fingerprinter.apply_to_servers({record['ip_address']: record for record in
+                                                  self.fake_probe(["10.0.0.1", "10.0.0.2"], self.now)})
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(Server.query.filter_by(ip_address="10.0.0.1").first().os_type, 'Linux')
+        self.assertEqual(Server.query.filter_by(ip_address="10.0.0.2").first().os_type, 'centos')
+
+    def test_scan_fingerprints_only_new_hosts(self):
+        """Test that the fingerprint phase runs for the hosts added since the previous scan."""
+        engine = MagicMock()
+        fingerprinter = MagicMock()
+        fingerprinter.fingerprint.side_effect = lambda addresses, now=None: {
+            record['ip_address']: record for record in self.fake_probe(addresses, now)}
+        scanner = NetworkScanner("10.0.0.0/29", engine=engine, fingerprinter=fingerprinter)
+
+        for up_addresses in ({"10.0.0.1"}, {"10.0.0.1", "10.0.0.2"}):
+            engine.scan.side_effect = lambda addresses: [{'ip': address, 'hostname': "Unknown", 'status': 'up'}
+                                                         for address in addresses if address in up_addresses]
+            comparison = scanner.run_scan_and_store_results()
+
+        self.assertEqual([call.args[0] for call in fingerprinter.fingerprint.call_args_list],
+                         [["10.0.0.1"], ["10.0.0.2"]])
+        self.assertEqual(comparison['fingerprinted'], 1)
+        self.assertEqual(Server.query.filter_by(ip_address="10.0.0.2").first().os_type, 'Linux')
+
+    @patch.object(CommandExecutor, 'execute_winrm_command', return_value="winrm")
+    @patch.object(CommandExecutor, 'execute_ssh_command', return_value="ssh")
+    def test_execute_command_uses_transport_hint(self, mock_ssh, mock_winrm):
+        """Test that a host with an unknown os_type is reached over its fingerprinted transport."""
+        host_transports.update({"10.0.0.1": 'ssh', "10.0.0.2": 'winrm-https'})
+
+        self.assertEqual(CommandExecutor.execute_command("10.0.0.1", "u", "p", "uptime", "unknown"), "ssh")
+        self.assertEqual(CommandExecutor.execute_command("10.0.0.2", "u", "p", "hostname", "unknown"), "winrm")
+        self.assertEqual(CommandExecutor.execute_command("10.0.0.1", "u", "p", "hostname", "Windows"), "winrm")
+        self.assertTrue(CommandExecutor.execute_command("10.0.0.9", "u", "p", "uptime", "unknown").startswith("Error"))
+
+    @patch('app.command_utils.winrm_pool')
+    def test_stored_fingerprint_is_used_on_miss(self, mock_pool):
+        """Test that a host fingerprinted by another process is reached over its stored transport."""
+        db.session.add(HostFingerprint(ip_address="10.0.0.5", transport='winrm-https', os_type='Windows',
+                                       open_ports="5986", checked_at=self.now))
+        db.session.commit()
+        mock_pool.run_cmd.return_value = SimpleNamespace(std_out=b"web5", std_err=b"", status_code=0)
+
+        self.assertEqual(CommandExecutor.execute_command("10.0.0.5", "u", "p", "hostname", "unknown"), "web5")
+        self.assertTrue(mock_pool.run_cmd.call_args.kwargs['https'])
+        self.assertEqual(stored_transports.stats()['entries'], 1)
+
+    @patch('winrm.Session')
+    def test_winrm_pool_keeps_https_and_http_shells_apart(self, mock_winrm_session):
+        """Test that the caller picks the WinRM listener and shells are not shared across them."""
+        pool = WinRMShellPool()
+        pool.release(pool.acquire("10.0.0.5", "u", "p", https=True))
+        pool.acquire("10.0.0.5", "u", "p")
+
+        self.assertEqual([call.args[0] for call in mock_winrm_session.call_args_list],
+                         ['https://10.0.0.5:5986/wsman', 'http://10.0.0.5:5985/wsman'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import unittest
+from types import SimpleNamespace
+from app.fleet_utils import FleetExecutor
+from app.async_command_utils import SyncCommandExecutor
+
+def make_server(server_id, ip):
+    return SimpleNamespace(id=server_id, name=f"server{server_id}", ip_address=ip,
+                           username="user", password="password", os_type="Linux")
+
+class FakeAsyncExecutor:
+    """Stands in for AsyncCommandExecutor; hosts answer after the given delay."""
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    async def execute_command(self, server_ip, username, password, command, os_type, timeout=None):
+        await asyncio.sleep(self.delays.get(server_ip, 0))
+        if server_ip == '10.0.0.2':
+            raise RuntimeError("boom")
+        return f"{command} on {server_ip}"
+
+    async def evict_idle(self):
+        pass
+
+    async def close(self):
+        pass
+
+class TestFleetUtils(unittest.TestCase):
+
+    def test_results_stream_in_completion_order(self):
+        """Test that fast hosts are yielded before slow ones."""
+        delays = {'10.0.0.1': 0.3, '10.0.0.2': 0.0}
+
+        def run_on_host(server_ip, username, password, command, os_type, timeout=None):
+            time.sleep(delays[server_ip])
+            return f"{command} on {server_ip}"
+
+        fleet = FleetExecutor(max_workers=2, timeout=5, run_on_host=run_on_host)
+        servers = [make_server(1, '10.0.0.1'), make_server(2, '10.0.0.2')]
+        results = list(fleet.run_command(servers, 'uptime'))
+
+        self.assertEqual([r['ip'] for r in results], ['10.0.0.2', '10.0.0.1'])
+        self.assertTrue(all(r['status'] == 'ok' for r in results))
+        self.assertEqual(results[1]['output'], 'uptime on 10.0.0.1')
+        self.assertGreaterEqual(results[1]['latency'], 0.3)
+
+    def test_errors_and_timeouts_are_reported_per_host(self):
+        """Test that failing and hanging hosts don't hide the others."""
+        def run_on_host(server_ip, username, password, command, os_type, timeout=None):
+            if server_ip == '10.0.0.1':
+                return "Error connecting to 10.0.0.1 via SSH: refused"
+            if server_ip == '10.0.0.2':
+                raise RuntimeError("boom")
+            if server_ip == '10.0.0.3':
+                time.sleep(2)
+            return "ok"
+
+        fleet = FleetExecutor(max_workers=4, timeout=0.5, run_on_host=run_on_host)
+        servers = [make_server(i, f"10.0.0.{i}") for i in range(1, 5)]
+        results = {r['ip']: r for r in fleet.run_command(servers, 'uptime')}
+
+        self.assertEqual(results['10.0.0.1']['status'], 'error')
+        self.assertEqual(results['10.0.0.2']['status'], 'error')
+        self.assertIn('boom', results['10.0.0.2']['output'])
+        self.assertEqual(results['10.0.0.3']['status'], 'timeout')
+        self.assertEqual(results['10.0.0.4']['status'], 'ok')
+
+        summary = FleetExecutor.summarize(list(results.values()))
+        self.assertEqual((summary['ok'], summary['error'], summary['timeout']), (1, 2, 1))
+
+    def test_worker_pool_is_bounded(self):
+        """Test that no more than max_workers hosts run at once."""
+        active = []
+        peak = []
+
+        def run_on_host(server_ip, username, password, command, os_type, timeout=None):
+            active.append(server_ip)
+            peak.append(len(active))
+            time.sleep(0.05)
+            active.remove(server_ip)
+            return "ok"
+
+        fleet = FleetExecutor(max_workers=3, timeout=5, run_on_host=run_on_host)
+        servers = [make_server(i, f"10.0.1.{i}") for i in range(12)]
+        results = list(fleet.run_command(servers, 'uptime'))
+
+        self.assertEqual(len(results), 12)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_asyncio_backend(self):
+        """Test that the asyncio backend reports results, errors and timeouts per host."""
+        executor = SyncCommandExecutor(executor=FakeAsyncExecutor({'10.0.0.3': 2}))
+        try:
+            fleet = FleetExecutor(timeout=0.5, backend='asyncio', async_executor=executor)
+            servers = [make_server(i, f"10.0.0.{i}") for i in range(1, 4)]
+            results = {r['ip']: r for r in fleet.run_command(servers, 'uptime')}
+        finally:
+            executor.close()
+
+        self.assertEqual(results['10.0.0.1']['status'], 'ok')
+        self.assertEqual(results['10.0.0.1']['output'], 'uptime on 10.0.0.1')
+        self.assertEqual(results['10.0.0.2']['status'], 'error')
+        self.assertIn('boom', results['10.0.0.2']['output'])
+        self.assertEqual(results['10.0.0.3']['status'], 'timeout')
+
+    def test_unknown_backend_is_rejected(self):
+        """Test that a misspelt backend fails early."""
+        with self.assertRaises(ValueError):
+            FleetExecutor(backend='thread')
+
+if __name__ == '__main__':
+    unittest.main()
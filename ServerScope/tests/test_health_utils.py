@@ -0,0 +1,168 @@
+import unittest
+from unittest.mock import patch
+from app.health_utils import HealthCollector, LINUX_HEALTH_COMMAND, WINDOWS_HEALTH_COMMAND
+from app.command_utils import CommandExecutor
+from app.cache_utils import result_cache
+
+LINUX_OUTPUT = """==stat==
+cpu  1000 0 500 8000 500 0 0 0 0 0
+cpu  1100 0 550 8300 550 0 0 0 0 0
+==loadavg==
+0.50 0.40 0.30 2/345 6789
+==nproc==
+4
+==meminfo==
+MemTotal:        8000000 kB
+MemFree:         1000000 kB
+MemAvailable:    2000000 kB
+Buffers:          100000 kB
+Cached:           900000 kB
+SwapTotal:       1000000 kB
+SwapFree:         900000 kB
+==df==
+Filesystem     1024-blocks     Used Available Capacity Mounted on
+/dev/sda1        100000000 96000000   4000000      96% /
+tmpfs              4000000        0   4000000       0% /run
+/dev/sdb1         50000000 10000000  40000000      20% /data
+==dfi==
+Filesystem       Inodes  IUsed    IFree IUse% Mounted on
+/dev/sda1       6000000 600000  5400000   10% /
+/dev/sdb1       3000000 300000  2700000   10% /data
+"""
+
+WINDOWS_OUTPUT = """cpu_percent=12
+cpu_count=8
+mem_total_kb=16000000
+mem_free_kb=4000000
+swap_total_mb=2048
+swap_used_mb=512
+disk=C:,107374182400,53687091200
+"""
+
+class TestHealthUtils(unittest.TestCase):
+
+    def test_parse_linux_output(self):
+        """Test that /proc and df output is turned into numeric metrics."""
+        record = HealthCollector.parse(LINUX_OUTPUT, 'Linux')
+
+        # 500 jiffies elapsed, 350 of them idle or iowait
+        self.assertEqual(record['cpu_percent'], 30.0)
+        self.assertEqual(record['iowait_percent'], 10.0)
+        self.assertEqual((record['load_1'], record['load_5'], record['load_15']), (0.5, 0.4, 0.3))
+        self.assertEqual(record['cpu_count'], 4)
+        self.assertEqual(record['mem_used_percent'], 75.0)
+        self.assertEqual(record['swap_used_percent'], 10.0)
+        self.assertEqual([disk['mount'] for disk in record['disks']], ['/', '/data'])
+        self.assertEqual(record['disk_max_used_percent'], 96.0)
+        self.assertEqual(record['inode_max_used_percent'], 10.0)
+        self.assertEqual(record['status'], 'Critical')
+        self.assertIn("disk_max_used_percent is critical: 96.0", record['alerts'])
+
+    def test_parse_windows_output(self):
+        """Test that the CIM key=value output is parsed."""
+        record = HealthCollector.parse(WINDOWS_OUTPUT, 'Windows')
+
+        self.assertEqual(record['cpu_percent'], 12.0)
+        self.assertEqual(record['cpu_count'], 8)
+        self.assertEqual(record['mem_used_percent'], 75.0)
+        self.assertEqual(record['swap_used_percent'], 25.0)
+        self.assertEqual(record['disks'][0]['mount'], 'C:')
+        self.assertEqual(record['disk_max_used_percent'], 50.0)
+        self.assertEqual(record['status'], 'Healthy')
+
+    def test_error_output_is_unreachable(self):
+        """Test that connection errors produce an Unreachable record."""
+        record = HealthCollector.parse("Error connecting to 10.0.0.1 via SSH: timed out", 'Linux')
+
+        self.assertEqual(record['status'], 'Unreachable')
+        self.assertIsNone(record['cpu_percent'])
+        self.assertIn("timed out", record['error'])
+
+    def test_unrecognized_output_is_unknown(self):
+        """Test that output without any metrics is not reported as healthy."""
+        record = HealthCollector.parse("command not found", 'Linux')
+
+        self.assertEqual(record['status'], 'Unknown')
+
+    def test_malformed_linux_fields_are_skipped(self):
+        """Test that truncated or garbled lines leave their metric unset instead of failing the check."""
+        output = """==stat==
+cpu  1000 0 500 8000 500 0 0 0 0 0
+cpu  1100 0 garbled
+==loadavg==
+0.50 n/a
+==meminfo==
+MemTotal:        8000000 kB
+MemAvailable:
+SwapTotal:       abc kB
+==df==
+Filesystem     1024-blocks     Used Available Capacity Mounted on
+/dev/sda1        100000000        -   4000000      96% /
+/dev/sdb1         50000000 10000000  40000000      20% /data
+==dfi==
+Filesystem       Inodes  IUsed    IFree IUse% Mounted on
+/dev/sdb1             -      -        -     - /data
+"""
+        record = HealthCollector.parse(output, 'Linux')
+
+        self.assertIsNone(record['cpu_percent'])
+        self.assertIsNone(record['load_1'])
+        self.assertEqual(record['mem_total_kb'], 8000000)
+        self.assertIsNone(record['swap_total_kb'])
+        self.assertEqual([disk['mount'] for disk in record['disks']], ['/data'])
+        self.assertIsNone(record['inode_max_used_percent'])
+        self.assertEqual(record['disk_max_used_percent'], 20.0)
+
+    def test_ignored_mounts_match_whole_path_components(self):
+        """Test that /dev and /dev/shm are ignored but /devdata and /running are not."""
+        output = """==df==
+Filesystem     1024-blocks     Used Available Capacity Mounted on
+/dev/sdc1         10000000  9000000   1000000      90% /devdata
+/dev/sdd1         10000000  1000000   9000000      10% /running
+devfs              1000000  1000000         0     100% /dev
+shmfs              1000000  1000000         0     100% /dev/shm
+"""
+        record = HealthCollector.parse(output, 'Linux')
+
+        self.assertEqual([disk['mount'] for disk in record['disks']], ['/devdata', '/running'])
+        self.assertEqual(record['disk_max_used_percent'], 90.0)
+
+    def test_warning_threshold(self):
+        """Test that a metric between the warning and critical thresholds gives a Warning."""
+        record = HealthCollector.parse("==loadavg==\n7.0 1.0 1.0 1/1 1\n==nproc==\n4\n", 'Linux')
+
+        self.assertEqual(record['status'], 'Warning')
+        self.assertEqual(record['alerts'], ["load_per_cpu is high: 1.75"])
+
+    @patch('app.command_utils.CommandExecutor.execute_winrm_command')
+    @patch('app.command_utils.CommandExecutor.execute_ssh_command')
+    def test_get_server_health_dispatches_on_os_type(self, mock_ssh, mock_winrm):
+        """Test that get_server_health uses the collector for the server's OS."""
+        mock_ssh.return_value = LINUX_OUTPUT
+        mock_winrm.return_value = WINDOWS_OUTPUT
+
+        linux = CommandExecutor.get_server_health("10.0.0.1", "user", "password")
+        windows = CommandExecutor.get_server_health("10.0.0.2", "user", "password", os_type="Windows")
+
+        mock_ssh.assert_called_once_with("10.0.0.1", "user", "password", LINUX_HEALTH_COMMAND, timeout=None)
+        mock_winrm.assert_called_once_with("10.0.0.2", "user", "password", WINDOWS_HEALTH_COMMAND)
+        self.assertEqual(linux['cpu_count'], 4)
+        self.assertEqual(windows['cpu_count'], 8)
+
+    @patch('app.command_utils.CommandExecutor.execute_ssh_command')
+    def test_get_server_health_max_age_uses_cache(self, mock_ssh):
+        """Test that health results are reused within max_age but unreachable results are not."""
+        result_cache.clear()
+        mock_ssh.return_value = LINUX_OUTPUT
+        first = CommandExecutor.get_server_health("10.0.0.1", "user", "password", max_age=60)
+        second = CommandExecutor.get_server_health("10.0.0.1", "user", "password", max_age=60)
+        self.assertIs(first, second)
+        self.assertEqual(mock_ssh.call_count, 1)
+
+        mock_ssh.return_value = "Error connecting to 10.0.0.2 via SSH: timed out"
+        CommandExecutor.get_server_health("10.0.0.2", "user", "password", max_age=60)
+        CommandExecutor.get_server_health("10.0.0.2", "user", "password", max_age=60)
+        self.assertEqual(mock_ssh.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import json
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import requests
+from app.http_utils import HttpClient
+
+class FakeService(BaseHTTPRequestHandler):
+    """Keep-alive server that fails the first 'failures' requests with 'status' and records client ports."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        state = self.server.state
+        state['ports'].add(self.client_address[1])
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+        if state['failures'] > 0:
+            state['failures'] -= 1
+            self._send({'error': "busy"}, state['status'])
+        elif self.path.startswith('/missing'):
+            self._send({'error': "not found"}, 404)
+        else:
+            self._send({'ok': True})
+
+    do_POST = do_GET
+
+    def _send(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if status == 429 or (status == 503 and self.server.state['retry_after']):
+            self.send_header('Retry-After', self.server.state['retry_after_seconds'])
+        self.end_headers()
+        self.wfile.write(data)
+
+class TestHttpUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeService)
+        self.server.state = {'ports': set(), 'failures': 0, 'status': 503, 'retry_after': False,
+                             'retry_after_seconds': '0'}
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = HttpClient(connect_timeout=1, read_timeout=2, retries=3, backoff=0.01, pool_size=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_kept_alive_per_host(self):
+        """Test that sequential requests to one host reuse one connection."""
+        for _ in range(5):
+            self.assertEqual(self.client.get(f"{self.url}/ok").json(), {'ok': True})
+
+        self.assertEqual(len(self.server.state['ports']), 1)
+        self.assertIs(self.client.session(f"{self.url}/other"), self.client.session(f"{self.url}/ok"))
+
+    def test_retries_5xx_and_429_with_backoff(self):
+        """Test that 503 and 429 responses are retried, including a POST told to retry, and counted."""
+        self.server.state['failures'] = 2
+        self.assertEqual(self.client.get(f"{self.url}/jobs", endpoint='jobs').status_code, 200)
+
+        self.server.state.update(failures=1, status=429)
+        response = self.client.post(f"{self.url}/jobs", endpoint='jobs', data={'search': "error"})
+        self.assertEqual(response.status_code, 200)
+
+        metrics = self.client.metrics()['jobs']
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['retries'], 3)
+        self.assertEqual(metrics['errors'], 0)
+
+    def test_post_is_retried_only_with_retry_after(self):
+        """Test that a POST answered 5xx is not sent again unless the server asks for it with Retry-After."""
+        self.server.state['failures'] = 2
+        response = self.client.post(f"{self.url}/jobs", endpoint='jobs', data={'search': "error"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.state['failures'], 1)
+
+        self.server.state['retry_after'] = True
+        response = self.client.post(f"{self.url}/jobs", endpoint='jobs', data={'search': "error"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.metrics()['jobs']['retries'], 1)
+
+    def test_post_is_not_retried_after_read_timeout(self):
+        """Test that a POST whose response timed out is not sent a second time."""
+        client = HttpClient(connect_timeout=1, read_timeout=0.1, retries=3, backoff=0.01)
+
+        self.assertRaises(requests.exceptions.RequestException, client.post, f"{self.url}/slow", endpoint='slow')
+        self.assertEqual(len(self.server.state['ports']), 1)
+        client.close()
+
+    def test_long_retry_after_returns_response(self):
+        """Test that a Retry-After above max_retry_after is handed back instead of slept on."""
+        self.server.state.update(failures=2, status=429, retry_after_seconds='3600')
+        started = time.monotonic()
+        response = self.client.get(f"{self.url}/jobs", endpoint='jobs')
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '3600')
+        self.assertEqual(self.server.state['failures'], 1)
+        self.assertEqual(self.client.metrics()['jobs']['retries'], 0)
+
+    def test_exhausted_retries_return_last_response(self):
+        """Test that the final 5xx is returned for the caller to raise and recorded as an error."""
+        self.server.state['failures'] = 10
+        response = self.client.get(f"{self.url}/jobs", endpoint='jobs')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertRaises(requests.exceptions.HTTPError, response.raise_for_status)
+        self.assertEqual(self.server.state['failures'], 6)  # the first attempt and three retries
+        self.assertEqual(self.client.metrics()['jobs']['errors'], 1)
+
+    def test_metrics_per_endpoint(self):
+        """Test that latency and errors are kept per endpoint, by default named after the path."""
+        self.client.get(f"{self.url}/ok")
+        self.client.get(f"{self.url}/missing")
+
+        metrics = self.client.metrics()
+        host = self.url.split('//')[1]
+        self.assertEqual(metrics[f"GET {host}/ok"]['errors'], 0)
+        self.assertEqual(metrics[f"GET {host}/missing"]['errors'], 1)
+        self.assertEqual(metrics[f"GET {host}/missing"]['last_error'], "HTTP 404")
+        self.assertGreater(metrics[f"GET {host}/ok"]['avg_seconds'], 0)
+
+    def test_timeout_raises_and_counts_error(self):
+        """Test that a slow response hits the read timeout instead of hanging."""
+        client = HttpClient(connect_timeout=1, read_timeout=0.1, retries=0)
+
+        self.assertRaises(requests.exceptions.RequestException, client.get, f"{self.url}/slow", endpoint='slow')
+        self.assertEqual(client.metrics()['slow']['errors'], 1)
+        client.close()
+
+    def test_http2_requires_httpx(self):
+        """Test that HTTP/2 without httpx fails clearly."""
+        with patch('app.http_utils.httpx', None):
+            client = HttpClient(http2=True)
+            self.assertRaises(RuntimeError, client.get, f"{self.url}/ok")
+
+if __name__ == "__main__":
+    unittest.main()
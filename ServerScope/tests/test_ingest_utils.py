@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from flask import Flask
+from app.models import db, Server, DiscoveredHost
+from app.ingest_utils import ScanIngestor
+
+def make_result(ip, status='up', hostname="Unknown"):
+    return {'ip': ip, 'hostname': hostname, 'status': status}
+
+class TestIngestUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_ingest_servers_inserts_new_in_chunks(self):
+        """Test that new hosts are inserted and known ones counted, across several chunks."""
+        db.session.add(Server(name="known", ip_address="10.0.0.3", username="u", password="p",
+                              os_type="Linux", status="Healthy"))
+        db.session.add(Server(name="old scan", ip_address="10.0.0.4", username="unknown", password="unknown",
+                              os_type="unknown", status="down"))
+        db.session.commit()
+        results = [make_result(f"10.0.0.{i}") for i in range(1, 11)] + [make_result("10.0.0.1")]
+
+        with patch.object(db.session, 'commit', wraps=db.session.commit) as commit:
+            comparison = ScanIngestor(chunk_size=4).ingest_servers(results)
+
+        self.assertEqual(comparison, {'existing_machines': 2, 'new_machines': 8, 'total_machines': 11})
+        self.assertEqual(commit.call_count, 3)
+        self.assertEqual(Server.query.count(), 10)
+        statuses = {server.ip_address: server.status for server in Server.query.all()}
+        self.assertEqual(statuses["10.0.0.3"], "Healthy")  # health status is kept
+        self.assertEqual(statuses["10.0.0.4"], "up")
+
+    def test_upsert_discovered_keeps_first_seen_and_hostname(self):
+        """Test that the upsert refreshes state without losing history."""
+        ingestor = ScanIngestor()
+        first = datetime(2024, 5, 1)
+        ingestor.upsert_discovered(["10.0.0.1", "10.0.0.2"], [make_result("10.0.0.1", hostname="web1")], first)
+
+        later = first + timedelta(hours=1)
+        ingestor.upsert_discovered(["10.0.0.1", "10.0.0.2"], [make_result("10.0.0.2")], later)
+
+        hosts = {host.ip_address: host for host in DiscoveredHost.query.all()}
+        self.assertEqual(hosts["10.0.0.1"].last_status, 'down')
+        self.assertEqual(hosts["10.0.0.1"].first_seen, first)
+        self.assertEqual(hosts["10.0.0.1"].last_seen, first)
+        self.assertEqual(hosts["10.0.0.1"].hostname, "web1")
+        self.assertEqual(hosts["10.0.0.2"].first_seen, later)
+        self.assertEqual(hosts["10.0.0.2"].last_checked, later)
+
+    @patch('app.ingest_utils.dialect_insert', return_value=None)
+    def test_upsert_discovered_without_native_upsert(self, mock_dialect_insert):
+        """Test the select-then-write fallback gives the same result."""
+        ingestor = ScanIngestor(chunk_size=2)
+        first = datetime(2024, 5, 1)
+        ingestor.upsert_discovered(["10.0.0.1", "10.0.0.2", "10.0.0.3"],
+                                   [make_result("10.0.0.1", hostname="web1")], first)
+        ingestor.upsert_discovered(["10.0.0.1"], [], first + timedelta(hours=1))
+
+        host = DiscoveredHost.query.filter_by(ip_address="10.0.0.1").one()
+        self.assertEqual((host.last_status, host.hostname, host.first_seen), ('down', "web1", first))
+        self.assertEqual(DiscoveredHost.query.count(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+from app.inventory_utils import InventoryProbe
+
+OS_INFO_OUTPUT = """NAME="Ubuntu"
+VERSION_ID="22.04"
+PRETTY_NAME="Ubuntu 22.04.4 LTS"
+==uname==
+Linux 5.15.0-105-generic x86_64
+==hostname==
+web1
+"""
+
+def batch_result(stdout="", stderr="", exit_status=0, error=None):
+    return {'stdout': stdout, 'stderr': stderr, 'exit_status': exit_status, 'error': error}
+
+class TestInventoryUtils(unittest.TestCase):
+
+    def test_parse_os_info(self):
+        """Test parsing of os-release, uname and hostname output."""
+        info = InventoryProbe.parse_os_info(OS_INFO_OUTPUT)
+
+        self.assertEqual(info, {'name': "Ubuntu", 'version': "22.04", 'pretty_name': "Ubuntu 22.04.4 LTS",
+                                'kernel': "Linux 5.15.0-105-generic", 'arch': "x86_64", 'hostname': "web1"})
+
+    @patch('app.inventory_utils.CommandExecutor.execute_ssh_batch')
+    def test_probe_runs_one_batch(self, mock_batch):
+        """Test that the probe sends all commands in a single batch and parses each result."""
+        mock_batch.return_value = {
+            'health': batch_result("==loadavg==\n0.10 0.20 0.30 1/100 1\n==nproc==\n2\n"),
+            'nfs_exports': batch_result("Export list for web1:\n/srv/share 10.0.0.0/24\n"),
+            'os_info': batch_result(OS_INFO_OUTPUT)
+        }
+
+        inventory = InventoryProbe.probe("10.0.0.1", "user", "password")
+
+        mock_batch.assert_called_once_with("10.0.0.1", "user", "password", InventoryProbe.commands(),
+                                           port=22, timeout=None)
+        self.assertEqual(inventory['health']['status'], 'Healthy')
+        self.assertEqual([share['path'] for share in inventory['nfs_shares']], ['/srv/share'])
+        self.assertEqual(inventory['os_info']['hostname'], "web1")
+        self.assertEqual(inventory['errors'], {})
+
+    @patch('app.inventory_utils.CommandExecutor.execute_ssh_batch')
+    def test_probe_without_nfs_server(self, mock_batch):
+        """Test that a host without an NFS server reports no shares rather than an error."""
+        error = "Error connecting to 10.0.0.1 via SSH: timed out"
+        mock_batch.return_value = {
+            'health': batch_result(error=error),
+            'nfs_exports': batch_result(stderr="clnt_create: RPC: Program not registered", exit_status=1),
+            'os_info': batch_result(OS_INFO_OUTPUT)
+        }
+
+        inventory = InventoryProbe.probe("10.0.0.1", "user", "password")
+
+        self.assertEqual(inventory['health']['status'], 'Unreachable')
+        self.assertEqual(inventory['nfs_shares'], [])
+        self.assertEqual(inventory['errors'], {'health': error})
+
+if __name__ == '__main__':
+    unittest.main()
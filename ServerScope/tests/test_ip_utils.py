@@ -0,0 +1,89 @@
+import os
+import unittest
+import importlib.util
+from flask import Flask
+from sqlalchemy import text
+from app.models import db, Server
+from app.ip_utils import pack_ip, unpack_ip, cidr_range, parse_cidrs
+from app.server_lookup_utils import ServerLookup
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions', '8b3e5d1f2c47_packed_ip_columns.py')
+
+class TestIpUtils(unittest.TestCase):
+
+    def test_pack_ip_orders_like_addresses(self):
+        """Test that encoded addresses sort numerically, IPv4 before IPv6 and round-trip."""
+        addresses = ["10.0.0.2", "10.0.0.10", "9.255.255.255", "192.168.1.1", "::1", "2001:db8::1"]
+
+        ordered = sorted(addresses, key=pack_ip)
+
+        self.assertEqual(ordered, ["::1", "9.255.255.255", "10.0.0.2", "10.0.0.10", "192.168.1.1", "2001:db8::1"])
+        self.assertTrue(all(len(pack_ip(address)) == 16 for address in addresses))
+        self.assertEqual([unpack_ip(pack_ip(address)) for address in addresses], addresses)
+        self.assertIsNone(pack_ip("server.lan"))
+
+    def test_cidr_range(self):
+        """Test the first and last address of a block."""
+        start, end = cidr_range("10.20.0.0/16")
+
+        self.assertEqual((unpack_ip(start), unpack_ip(end)), ("10.20.0.0", "10.20.255.255"))
+        self.assertEqual([str(network) for network in parse_cidrs("10.0.0.0/8, 2001:db8::/32")],
+                         ["10.0.0.0/8", "2001:db8::/32"])
+        with self.assertRaises(ValueError):
+            parse_cidrs("10.0.0.0/33")
+
+class TestCidrQueries(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        for ip in ("10.19.255.255", "10.20.0.1", "10.20.7.9", "10.21.0.0", "2001:db8::5", "2001:db9::1"):
+            db.session.add(Server(name=f"host-{ip}", ip_address=ip, username="user", password="password",
+                                  os_type="Linux"))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_in_cidrs_returns_servers_in_blocks(self):
+        """Test that CIDR lookups return exactly the servers inside the blocks."""
+        servers = ServerLookup.in_cidrs(["10.20.0.0/16", "2001:db8::/32"]).all()
+
+        self.assertEqual([server.ip_address for server in servers], ["10.20.0.1", "10.20.7.9", "2001:db8::5"])
+
+    def test_in_cidrs_is_an_index_range_scan(self):
+        """Test that the database answers a CIDR lookup from the ip_packed index."""
+        query = ServerLookup.in_cidrs(["10.20.0.0/16"])
+        compiled = query.statement.compile(db.engine)
+
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        plan = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+
+        self.assertIn("USING INDEX ix_servers_ip_packed", " ".join(row[-1] for row in plan))
+
+    def test_migration_backfills_packed_column(self):
+        """Test that the migration fills ip_packed for existing rows."""
+        db.session.execute(text("UPDATE servers SET ip_packed = NULL"))
+        db.session.commit()
+        spec = importlib.util.spec_from_file_location('packed_ip_columns', MIGRATION)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        with db.engine.begin() as connection:
+            migration.BATCH_SIZE = 4
+            migration.backfill(connection, 'servers')
+
+        db.session.expire_all()
+        self.assertEqual({server.ip_packed for server in Server.query}, {pack_ip(server.ip_address) for server in Server.query})
+        self.assertEqual(ServerLookup.in_cidrs(["10.21.0.0/24"]).one().ip_address, "10.21.0.0")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+from datetime import datetime, timezone
+import os
+import tempfile
+from app.log_analysis_utils import LogAnalyzer, FrequentMessages, SeverityClassifier, substring_classify
+
+def entry(message, host="web1", time="2024-05-01T14:05:00.000+00:00"):
+    return {'_raw': message, 'host': host, '_time': time}
+
+class TestLogAnalysisUtils(unittest.TestCase):
+
+    def test_exact_counts_per_severity_host_and_bucket(self):
+        """Test the exact counters kept while messages are only sampled."""
+        entries = [
+            entry("ERROR disk full", "web1", "2024-05-01T14:05:00.000+00:00"),
+            entry("WARN slow response", "web2", "2024-05-01T14:59:59.000+00:00"),
+            entry("started", "web1", "2024-05-01T15:00:00.000+00:00"),
+            entry("Error: timeout", "web2", "1714575600"),
+        ]
+
+        summary = LogAnalyzer(bucket_seconds=3600).consume(iter(entries)).summary()
+
+        self.assertEqual(summary['counts'], {'errors': 2, 'warnings': 1, 'info': 1})
+        self.assertEqual(summary['hosts']['web2'], {'errors': 1, 'warnings': 1, 'info': 0})
+        self.assertEqual(summary['buckets'], [
+            (datetime(2024, 5, 1, 14, tzinfo=timezone.utc), {'errors': 1, 'warnings': 1, 'info': 0}),
+            (datetime(2024, 5, 1, 15, tzinfo=timezone.utc), {'errors': 1, 'warnings': 0, 'info': 1}),
+        ])
+        self.assertEqual(summary['errors'], ["ERROR disk full", "Error: timeout"])
+
+    def test_memory_stays_bounded(self):
+        """Test that a long stream keeps a fixed-size sample and a bounded set of counters."""
+        analyzer = LogAnalyzer(sample_size=50, top_messages=3, tracked_messages=100, seed=1)
+
+        def stream():
+            for i in range(200000):
+                if i % 4 == 0:
+                    yield entry(f"ERROR connection refused to db pid={i}")
+                elif i % 4 == 1:
+                    yield entry(f"ERROR unique failure {i:x}z")
+                else:
+                    yield entry(f"request {i} served", host=f"web{i % 7}")
+
+        summary = analyzer.consume(stream()).summary()
+
+        self.assertEqual(summary['total'], 200000)
+        self.assertEqual(summary['counts']['errors'], 100000)
+        self.assertEqual((len(summary['errors']), len(summary['info'])), (50, 50))
+        self.assertLessEqual(len(analyzer.frequent['errors'].counts), 100)
+        self.assertEqual(summary['top']['errors'][0][0], "ERROR connection refused to db pid=0")
+        self.assertEqual(summary['top']['info'][0][0], "request 2 served")
+        self.assertEqual(sum(counts['info'] for counts in summary['hosts'].values()), 100000)
+
+    def test_frequent_messages_keep_heavy_hitters(self):
+        """Test that a message above 1/(capacity + 1) of the stream survives distinct noise."""
+        frequent = FrequentMessages(capacity=4)
+        for i in range(1000):
+            frequent.add("heavy", "heavy") if i % 3 == 0 else frequent.add(f"noise{i}", f"noise{i}")
+
+        self.assertEqual(frequent.top(1)[0][0], "heavy")
+        self.assertLessEqual(len(frequent.counts), 4)
+
+    def test_substring_classify(self):
+        self.assertEqual(substring_classify("Kernel ERROR"), 'errors')
+        self.assertEqual(substring_classify("warning: low disk"), 'warnings')
+        self.assertEqual(substring_classify("health check ok, no errors found"), 'errors')
+
+class TestSeverityClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = SeverityClassifier()
+
+    def test_keywords_are_whole_words_and_negations_do_not_count(self):
+        """Test the cases the substring check got wrong."""
+        cases = {
+            "ERROR disk full": 'errors',
+            "health check ok, no errors found": 'info',
+            "retried 3 times (non-fatal)": 'info',
+            "build is error-free": 'info',
+            "stderr redirected to /dev/null": 'info',
+            "errors_total=5": 'info',
+            "java.lang.NullPointerException at Foo.bar": 'errors',
+            "0 failures, 2 warnings": 'warnings',
+            "Out of memory: Killed process 123 (java)": 'errors',
+            "Warning: deprecated API": 'warnings',
+        }
+
+        self.assertEqual(dict(zip(cases, self.classifier.classify_batch(list(cases)))), cases)
+
+    def test_common_words_are_not_errors(self):
+        """Test words that only look like error markers: syslog level names, plain words ending in a keyword, zero counts."""
+        cases = {
+            "user alert settings saved": 'info',
+            "terror alert raised": 'info',
+            "crit path analysis done, emerg contact updated": 'info',
+            "failed=0 ok": 'info',
+            "batch done: errors: 0, warnings: 2": 'warnings',
+            "TERROR of the seas": 'info',
+            "failed=3 ok=10": 'errors',
+            "error: 0x45 at offset 12": 'errors',
+            "raised IOError reading file": 'errors',
+            "caught org.example.customexception in handler": 'errors',
+            "db:connectionerror after 3 retries": 'errors',
+            "level=alert msg=\"disk array degraded\"": 'errors',
+        }
+
+        self.assertEqual(dict(zip(cases, self.classifier.classify_batch(list(cases)))), cases)
+
+    def test_level_fields_decide(self):
+        """Test that JSON, logfmt and syslog severity fields override keywords in the message."""
+        cases = {
+            '{"level":"info","msg":"error handled"}': 'info',
+            '{"severity": "CRITICAL", "msg": "db down"}': 'errors',
+            'ts=1 level=warn msg="retrying"': 'warnings',
+            '<11>May  1 14:00:00 web1 postfix: relay timed out': 'errors',
+            '<14>May  1 14:00:00 web1 app: error in text ignored': 'info',
+        }
+
+        self.assertEqual([self.classifier.classify(message) for message in cases], list(cases.values()))
+
+    def test_batch_matches_single_messages(self):
+        """Test that classifying a batch attributes every match to the right message."""
+        messages = ["ok", "<12>warn from syslog", "", "fatal: x", "error-free", "level=error", "no warnings"] * 50
+
+        self.assertEqual(self.classifier.classify_batch(messages), [self.classifier(message) for message in messages])
+
+    def test_batch_with_characters_that_grow_when_lowered(self):
+        """Test that a message whose lowercase form is longer does not shift the following ones."""
+        messages = ['\u0130' * 10, "fatal", "a", "b" * 30, "Straße error", "\u0130\u0130 warning"]
+
+        self.assertEqual(self.classifier.classify_batch(messages), ['info', 'errors', 'info', 'info', 'errors', 'warnings'])
+        self.assertEqual(self.classifier.classify_batch(["ok", '\u0130' * 10]), ['info', 'info'])  # last in the batch
+
+    def test_rules_from_file(self):
+        """Test a rule file replacing the default error and warning rules."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rules.yaml')
+            with open(path, 'w') as handle:
+                handle.write("errors:\n  keywords: [oops]\n  patterns: ['exit code [1-9]']\n"
+                             "warnings:\n  keywords: [degraded]\n")
+            classifier = SeverityClassifier(SeverityClassifier.load_rules(path))
+
+        self.assertEqual(classifier.classify_batch(["Oops", "process exit code 2", "exit code 0", "Degraded mode",
+                                                    "ERROR ignored now"]),
+                         ['errors', 'errors', 'info', 'warnings', 'info'])
+
+if __name__ == '__main__':
+    unittest.main()
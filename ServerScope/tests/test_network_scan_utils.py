@@ -0,0 +1,217 @@
+import ipaddress
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from flask import Flask
+from app.models import db, DiscoveredHost, NetworkScanResult
+from app.network_scan_utils import NetworkScanner
+
+class FakePortScanner:
+    """Reports the first address of every block as up; blocks listed in fail raise."""
+
+    def __init__(self, calls, fail=()):
+        self.calls = calls
+        self.fail = fail
+        self.hosts = {}
+
+    def scan(self, hosts, arguments):
+        self.calls.append((hosts, arguments))
+        if hosts in self.fail:
+            raise RuntimeError("nmap crashed")
+        first = str(next(ipaddress.ip_network(hosts).hosts()))
+        host = MagicMock()
+        host.state.return_value = 'up'
+        host.hostname.return_value = ''
+        self.hosts = {first: host}
+
+    def all_hosts(self):
+        return list(self.hosts)
+
+    def __getitem__(self, host):
+        return self.hosts[host]
+
+class TestNetworkScanUtils(unittest.TestCase):
+
+    def test_shards_split_large_ranges(self):
+        """Test that CIDRs larger than the shard prefix are split and others are kept."""
+        scanner = NetworkScanner("10.0.0.0/22, 192.168.1.0/28 10.9.9.1-20", shard_prefix=24,
+                                 scanner_factory=MagicMock)
+
+        self.assertEqual(scanner.shards(), ["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24", "10.0.3.0/24",
+                                            "192.168.1.0/28", "10.9.9.1-20"])
+
+    def test_large_and_ipv6_ranges_are_not_expanded(self):
+        """Test that sizes come from num_addresses and oversized or IPv6 ranges are refused, not listed."""
+        self.assertEqual(NetworkScanner("fd00::/100", scanner_factory=MagicMock).addresses(), [])
+        self.assertIsNone(NetworkScanner.shard_addresses("fd00::/100"))
+        self.assertIsNone(NetworkScanner.shard_addresses("10.0.0.0/8"))
+        self.assertEqual(NetworkScanner.shard_size("10.0.0.0/8"), 2 ** 24 - 2)
+        self.assertEqual(NetworkScanner.shard_size("10.0.0.1 10.0.0.2"), 2)
+        self.assertEqual(NetworkScanner.shard_size("scanme.example.org"), 0)
+        with self.assertRaises(ValueError):
+            NetworkScanner("10.0.0.0/8", scanner_factory=MagicMock).addresses()
+
+    def test_validate_range_rejects_options(self):
+        """Test that only addresses, CIDRs and hostnames are accepted as targets."""
+        self.assertEqual(NetworkScanner.validate_range(" 10.0.0.0/24,fd00::1  db01.example.org "),
+                         "10.0.0.0/24 fd00::1 db01.example.org")
+        for network_range in ("", "10.0.0.0/24 --script=smb-brute", "-iL /etc/passwd", "host;reboot", "a/b"):
+            with self.assertRaises(ValueError):
+                NetworkScanner.validate_range(network_range)
+
+    def test_validate_range_rejects_oversized_ranges(self):
+        """Test that ranges covering more than NMAP_MAX_RANGE_ADDRESSES are refused before being sharded."""
+        self.assertEqual(NetworkScanner.validate_range("10.0.0.0/12"), "10.0.0.0/12")
+        for network_range in ("0.0.0.0/0", "10.0.0.0/8", "10.0.0.0/12 10.16.0.0/24", "fd00::/64"):
+            with self.assertRaises(ValueError):
+                NetworkScanner.validate_range(network_range)
+        with patch('app.network_scan_utils.NMAP_MAX_RANGE_ADDRESSES', 256):
+            self.assertEqual(NetworkScanner.validate_range("10.0.0.0/24"), "10.0.0.0/24")
+            self.assertRaises(ValueError, NetworkScanner.validate_range, "10.0.0.0/24 10.0.1.1")
+
+    def test_scan_network_merges_blocks_in_ip_order(self):
+        """Test that every block is scanned and results are merged and sorted."""
+        calls = []
+        scanner = NetworkScanner("10.0.0.0/20", max_workers=4, shard_prefix=24,
+                                 scanner_factory=lambda: FakePortScanner(calls))
+
+        results = scanner.scan_network()
+
+        self.assertEqual(len(calls), 16)
+        self.assertEqual([result['ip'] for result in results], [f"10.0.{i}.1" for i in range(16)])
+        self.assertEqual(results[0], {'ip': "10.0.0.1", 'hostname': "Unknown", 'status': 'up'})
+
+    def test_failed_block_does_not_lose_other_results(self):
+        """Test that a failing block is recorded while the other blocks are returned."""
+        calls = []
+        scanner = NetworkScanner("10.0.0.0/23", max_workers=2, shard_prefix=24,
+                                 scanner_factory=lambda: FakePortScanner(calls, fail=("10.0.1.0/24",)))
+
+        results = scanner.scan_network()
+
+        self.assertEqual([result['ip'] for result in results], ["10.0.0.1"])
+        self.assertEqual(scanner.failed_shards, ["10.0.1.0/24"])
+
+    def test_rate_limit_is_divided_between_workers(self):
+        """Test that the global rate limit is passed to each nmap run as a share."""
+        calls = []
+        scanner = NetworkScanner("10.0.0.0/24", max_workers=4, max_rate=1000,
+                                 scanner_factory=lambda: FakePortScanner(calls))
+
+        scanner.scan_network()
+
+        self.assertEqual(calls, [("10.0.0.0/24", "-sn --max-rate 250")])
+
+class FakeListScanner(FakePortScanner):
+    """Reports the addresses in up as up, for both CIDR and space-separated target lists."""
+
+    def __init__(self, calls, up):
+        super().__init__(calls)
+        self.up = up
+
+    def scan(self, hosts, arguments):
+        self.calls.append((hosts, arguments))
+        probed = NetworkScanner.shard_addresses(hosts)
+        self.hosts = {}
+        for address in probed:
+            if address in self.up:
+                host = MagicMock()
+                host.state.return_value = 'up'
+                host.hostname.return_value = f"host{address.rsplit('.', 1)[1]}"
+                self.hosts[address] = host
+
+class TestIncrementalDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.calls = []
+        self.scanner = NetworkScanner("10.0.0.0/29", shard_prefix=24,
+                                      scanner_factory=lambda: FakeListScanner(self.calls, {"10.0.0.1", "10.0.0.2"}))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def probed_in_call(self, index):
+        return NetworkScanner.shard_addresses(self.calls[index][0])
+
+    def test_first_scan_is_full_and_records_every_address(self):
+        """Test that the first scan sweeps the whole range and records up and down addresses."""
+        comparison = self.scanner.run_incremental_scan()
+
+        self.assertEqual(comparison['scan_mode'], 'full')
+        self.assertEqual(comparison['hosts_probed'], 6)
+        hosts = {host.ip_address: host for host in DiscoveredHost.query.all()}
+        self.assertEqual(len(hosts), 6)
+        self.assertEqual(hosts["10.0.0.1"].last_status, 'up')
+        self.assertEqual(hosts["10.0.0.1"].hostname, "host1")
+        self.assertIsNotNone(hosts["10.0.0.1"].first_seen)
+        self.assertEqual(hosts["10.0.0.5"].last_status, 'down')
+        self.assertIsNone(hosts["10.0.0.5"].first_seen)
+        self.assertEqual(NetworkScanResult.query.one().scan_mode, 'full')
+
+    def test_incremental_scan_skips_recent_and_probes_stale(self):
+        """Test that only stale addresses are probed after a recent full sweep."""
+        start = datetime(2024, 5, 1, 12)
+        self.scanner.run_incremental_scan(now=start)
+
+        # Two hours later: up hosts (1h TTL) are stale, down addresses (6h recheck) are not
+        comparison = self.scanner.run_incremental_scan(now=start + timedelta(hours=2))
+
+        self.assertEqual(comparison['scan_mode'], 'incremental')
+        self.assertEqual(sorted(self.probed_in_call(1)), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(comparison['skipped'], 4)
+
+    def test_full_sweep_of_another_range_does_not_count(self):
+        """Test that a full sweep of a different range does not make this range's sweep current."""
+        start = datetime(2024, 5, 1, 12)
+        other = NetworkScanner("10.1.0.0/29", shard_prefix=24,
+                               scanner_factory=lambda: FakeListScanner(self.calls, set()))
+        other.run_incremental_scan(now=start)
+
+        self.assertFalse(other.full_sweep_due(now=start + timedelta(hours=2)))
+        self.assertTrue(self.scanner.full_sweep_due(now=start + timedelta(hours=2)))
+
+    def test_plan_puts_never_seen_first(self):
+        """Test that never-probed addresses come before stale ones, stalest first."""
+        now = datetime(2024, 5, 1, 12)
+        for address, hours_ago in (("10.0.0.1", 3), ("10.0.0.2", 9), ("10.0.0.3", 0)):
+            db.session.add(DiscoveredHost(ip_address=address, last_status='up',
+                                          last_checked=now - timedelta(hours=hours_ago)))
+        db.session.commit()
+
+        plan = self.scanner.plan_incremental(now, max_targets=4)
+
+        self.assertEqual(plan['targets'], ["10.0.0.4", "10.0.0.5", "10.0.0.6", "10.0.0.2"])
+        self.assertEqual((plan['never_seen'], plan['stale'], plan['skipped']), (3, 2, 2))
+
+    def test_hosts_total_is_counted_without_expanding(self):
+        """Test that the planned address count of a huge block is reported before it is scanned."""
+        updates = []
+        scanner = NetworkScanner("fd00::/100", scanner_factory=lambda: FakePortScanner([]))
+
+        scanner.scan_and_store(scanner.shards(), progress=updates.append)
+
+        self.assertEqual(updates[0]['hosts_total'], 2 ** 28 - 1)
+        self.assertEqual(updates[-1]['blocks_done'], 1)
+
+    def test_range_too_large_to_plan_is_swept_in_full(self):
+        """Test that a range too large for incremental planning falls back to a full sweep."""
+        start = datetime(2024, 5, 1, 12)
+        self.scanner.run_incremental_scan(now=start)
+
+        with patch('app.network_scan_utils.DISCOVERY_MAX_ADDRESSES', 4):
+            comparison = self.scanner.run_incremental_scan(now=start + timedelta(hours=2))
+
+        self.assertEqual(comparison['scan_mode'], 'full')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,9 +11,11 @@ class TestRoutes(unittest.TestCase):
 
     def setUp(self):
         """Set up the test application and database."""
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'  # Use in-memory database for tests
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',  # Use in-memory database for tests
+            'SERVER_NAME': 'localhost'  # Lets url_for build URLs outside a request
+        })
         self.client = self.app.test_client()
         self.ctx = self.app.app_context()
         self.ctx.push()
@@ -22,9 +24,12 @@ class TestRoutes(unittest.TestCase):
         db.create_all()
 
         # Set up some test data (users, servers, etc.)
-        self.user = User(username='testuser', email='test@example.com')
+        self.user = User(username='testuser', email='test@example.com', approved=True)
         self.user.set_password('testpassword')
         db.session.add(self.user)
+        self.admin = User(username='testadmin', email='admin@example.com', role='admin', approved=True)
+        self.admin.set_password('adminpassword')
+        db.session.add(self.admin)
         db.session.commit()
 
     def tearDown(self):
@@ -96,18 +101,58 @@ class TestRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Command executed on server test_server', response.data)
 
-    @patch('app.routes.NetworkScanner.scan_for_ansible_machines')
-    def test_scan_network(self, mock_scan):
-        """Test the network scan route."""
+    @patch('app.routes.FleetExecutor.select_servers')
+    def test_execute_fleet_command_requires_selector(self, mock_select):
+        """Test that a fleet command needs a server selection and numeric server IDs."""
+        self.login('testadmin', 'adminpassword')
+
+        for data in (dict(command='uptime'), dict(command='uptime', server_ids='1,two')):
+            response = self.client.post(url_for('main.execute_fleet_command'), data=data)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('/fleet/execute_command', response.location)
+        mock_select.assert_not_called()
+
+    @patch('app.routes.scan_jobs.submit')
+    def test_scan_network(self, mock_submit):
+        """Test that the network scan route starts a background scan."""
         # Log in first
-        self.login('testuser', 'testpassword')
+        self.login('testadmin', 'adminpassword')
+
+        # Mock the background job runner
+        mock_submit.return_value.id = 1
+
+        response = self.client.post(url_for('main.scan_network'), data=dict(network_range='10.0.0.0/24'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/scan_jobs/1', response.location)
+        mock_submit.assert_called_once_with('10.0.0.0/24', scan_mode='incremental', requested_by='testadmin')
+
+    @patch('app.routes.scan_jobs.submit')
+    def test_scan_network_rejects_nmap_options(self, mock_submit):
+        """Test that a network range carrying nmap options is refused before a scan starts."""
+        self.login('testadmin', 'adminpassword')
+
+        response = self.client.post(url_for('main.scan_network'),
+                                    data=dict(network_range='10.0.0.0/24 --script=smb-brute'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/scan_network', response.location)
+        mock_submit.assert_not_called()
+
+    def test_server_health_series_validates_parameters(self):
+        """Test that unknown resolutions or aggregates and ranges beyond retention are rejected."""
+        self.login('testadmin', 'adminpassword')
+        server = Server(name='web1', ip_address='10.0.0.1', username='root', password='secret', os_type='Linux')
+        db.session.add(server)
+        db.session.commit()
 
-        # Mock the network scanner
-        mock_scan.return_value = (['192.168.1.2', '192.168.1.3'], 'Scan Report')
+        for args in (dict(resolution=61), dict(aggregate='sum'), dict(hours=0), dict(hours=24 * 400),
+                     dict(resolution=60, hours=24 * 60)):
+            response = self.client.get(url_for('main.server_health_series', server_id=server.id, **args))
+            self.assertEqual(response.status_code, 400, args)
 
-        response = self.client.get(url_for('main.scan_network'), follow_redirects=True)
+        response = self.client.get(url_for('main.server_health_series', server_id=server.id,
+                                           resolution=300, aggregate='max', hours=48))
         self.assertEqual(response.status_code, 200)
-        self.assertIn(b'Network scan completed successfully', response.data)
+        self.assertEqual(response.json['points'], [])
 
     def test_admin_dashboard_access_control(self):
         """Test that only admins can access the admin dashboard."""
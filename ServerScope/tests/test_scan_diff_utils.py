@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import MagicMock
+from flask import Flask
+from app.models import db, NetworkScanResult
+from app.ip_utils import pack_ip
+from app.network_scan_utils import NetworkScanner
+from app.scan_diff_utils import ScanDiff
+
+def snapshot(*hosts):
+    return sorted((pack_ip(ip), hostname) for ip, hostname in hosts)
+
+def up(ip, hostname="Unknown"):
+    return {'ip': ip, 'hostname': hostname, 'status': 'up'}
+
+class TestScanDiff(unittest.TestCase):
+
+    def test_diff_of_sorted_snapshots(self):
+        """Test that the merge pass finds added, removed and renamed hosts."""
+        previous = snapshot(("10.0.0.1", "a"), ("10.0.0.2", "b"), ("10.0.0.10", "c"), ("10.0.0.200", ""))
+        current = snapshot(("10.0.0.2", "b"), ("10.0.0.3", "d"), ("10.0.0.10", "c2"), ("2001:db8::1", ""))
+
+        delta = ScanDiff.diff(previous, current)
+
+        self.assertEqual(delta['added'], [("10.0.0.3", "d"), ("2001:db8::1", "")])
+        self.assertEqual(delta['removed'], [("10.0.0.1", "a"), ("10.0.0.200", "")])
+        self.assertEqual(delta['changed'], [("10.0.0.10", "c", "c2")])
+
+    def test_apply_scan_keeps_unprobed_addresses(self):
+        """Test that an incremental scan only changes the state of the addresses it probed."""
+        previous = snapshot(("10.0.0.1", "a"), ("10.0.0.2", "b"), ("10.0.0.5", "e"))
+
+        current = ScanDiff.apply_scan(previous, ["10.0.0.1", "10.0.0.2", "10.0.0.3"],
+                                      [up("10.0.0.1"), up("10.0.0.3", "c")])
+
+        self.assertEqual(current, snapshot(("10.0.0.1", "a"), ("10.0.0.3", "c"), ("10.0.0.5", "e")))
+
+    def test_snapshot_and_delta_round_trip(self):
+        """Test the compact encodings."""
+        hosts = snapshot(*((f"10.1.{i // 256}.{i % 256}", f"host{i}" if i % 3 else "") for i in range(5000)))
+        delta = ScanDiff.diff([], hosts[:3])
+
+        blob = ScanDiff.encode_snapshot(hosts)
+
+        self.assertEqual(ScanDiff.decode_snapshot(blob), hosts)
+        self.assertLess(len(blob), 5000 * 4)
+        self.assertEqual(ScanDiff.decode_snapshot(ScanDiff.encode_snapshot([])), [])
+        self.assertEqual(ScanDiff.decode_delta(ScanDiff.encode_delta(delta))['added'],
+                         [list(host) for host in delta['added']])
+
+class TestScanDeltasStored(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.engine = MagicMock()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def scan(self, up_addresses):
+        self.engine.scan.side_effect = lambda addresses: [up(address) for address in addresses
+                                                         if address in up_addresses]
+        return NetworkScanner("10.0.0.0/29", engine=self.engine).run_scan_and_store_results()
+
+    def test_consecutive_scans_store_delta(self):
+        """Test that each scan stores its delta to the previous scan of the range."""
+        self.scan({"10.0.0.1", "10.0.0.2"})
+        comparison = self.scan({"10.0.0.2", "10.0.0.3"})
+
+        self.assertEqual((comparison['hosts_added'], comparison['hosts_removed']), (1, 1))
+        first, second = NetworkScanResult.query.order_by(NetworkScanResult.id).all()
+        self.assertEqual((first.hosts_added, first.network_range), (2, "10.0.0.0/29"))
+        delta = ScanDiff.decode_delta(second.delta)
+        self.assertEqual((delta['added'], delta['removed']), ([["10.0.0.3", ""]], [["10.0.0.1", ""]]))
+
+if __name__ == '__main__':
+    unittest.main()
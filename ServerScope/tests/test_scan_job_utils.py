@@ -0,0 +1,123 @@
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from app.models import db, ScanJob, ScanTarget, Server, DiscoveredHost, NetworkScanResult
+from app.network_scan_utils import NetworkScanner
+from app.scan_job_utils import ScanJobRunner
+
+class FakeEngine:
+    """Discovery engine reporting the addresses in up as up."""
+
+    def __init__(self, up, fail=False):
+        self.up = up
+        self.fail = fail
+
+    def scan(self, addresses):
+        if self.fail:
+            raise RuntimeError("probe failed")
+        return [{'ip': address, 'hostname': "Unknown", 'status': 'up'} for address in addresses if address in self.up]
+
+class TestScanJobUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database shared with the job thread."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.progress = []
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def runner(self, engine):
+        return ScanJobRunner(scanner_factory=lambda network_range: NetworkScanner(
+            network_range, max_workers=2, shard_prefix=30, engine=engine))
+
+    def test_job_runs_in_background_and_persists_results(self):
+        """Test that a submitted scan completes with its counters and report saved."""
+        runner = self.runner(FakeEngine({"10.0.0.1", "10.0.0.6"}))
+
+        job = runner.submit("10.0.0.0/29", scan_mode='full', requested_by="admin", app=self.app)
+        self.assertEqual(job.status, 'queued')
+        runner.wait(job.id, timeout=10)
+
+        db.session.expire_all()
+        job = db.session.get(ScanJob, job.id)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.blocks_total, job.blocks_done, job.hosts_total, job.hosts_probed),
+                         (2, 2, 4, 4))
+        self.assertEqual((job.hosts_found, job.new_machines), (2, 2))
+        self.assertEqual(job.report.new_machines_count, 2)
+        self.assertEqual(Server.query.count(), 2)
+        self.assertEqual(DiscoveredHost.query.count(), 4)
+
+    def test_failed_blocks_are_counted_not_recorded(self):
+        """Test that a scan whose blocks all fail finishes without marking addresses down."""
+        runner = self.runner(FakeEngine(set(), fail=True))
+
+        job = runner.submit("10.0.0.0/29", scan_mode='full', app=self.app)
+        runner.wait(job.id, timeout=10)
+
+        db.session.expire_all()
+        job = db.session.get(ScanJob, job.id)
+        self.assertEqual((job.status, job.blocks_failed, job.hosts_probed), ('completed', 2, 0))
+        self.assertEqual(DiscoveredHost.query.count(), 0)
+
+    def test_job_failure_is_recorded(self):
+        """Test that an exception outside the block scans marks the job failed."""
+        def broken_factory(network_range):
+            raise ValueError("bad range")
+        runner = ScanJobRunner(scanner_factory=broken_factory)
+
+        job = runner.submit("nonsense", app=self.app)
+        runner.wait(job.id, timeout=10)
+
+        db.session.expire_all()
+        job = db.session.get(ScanJob, job.id)
+        self.assertEqual((job.status, job.error), ('failed', "bad range"))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(NetworkScanResult.query.count(), 0)
+
+    def test_orphaned_jobs_are_failed_at_startup(self):
+        """Test that jobs a stopped process left queued or running are marked failed, and only those."""
+        started = datetime(2024, 5, 1, 12)
+        target = ScanTarget(name="office", network_range="10.0.0.0/24", interval=3600, current_interval=3600,
+                            last_status='queued')
+        db.session.add(target)
+        db.session.flush()
+        db.session.add_all([
+            ScanJob(network_range="10.0.0.0/24", status='running', created_at=started, started_at=started),
+            ScanJob(network_range="10.0.0.0/24", status='queued', created_at=started, target_id=target.id),
+            ScanJob(network_range="10.0.1.0/24", status='completed', created_at=started, finished_at=started),
+            ScanJob(network_range="10.0.2.0/24", status='queued', created_at=started + timedelta(hours=2))
+        ])
+        db.session.commit()
+
+        self.assertEqual(ScanJobRunner.fail_orphaned(before=started + timedelta(hours=1)), 2)
+
+        statuses = [job.status for job in ScanJob.query.order_by(ScanJob.id)]
+        self.assertEqual(statuses, ['failed', 'failed', 'completed', 'queued'])
+        self.assertIsNotNone(db.session.get(ScanJob, 1).finished_at)
+        self.assertEqual(db.session.get(ScanTarget, target.id).last_status, 'failed')
+
+    def test_progress_estimates_time_remaining(self):
+        """Test the ETA from the share of addresses probed so far."""
+        started = datetime(2024, 5, 1, 12)
+        job = ScanJob(id=1, network_range="10.0.0.0/16", scan_mode='full', status='running',
+                      started_at=started, blocks_total=256, blocks_done=64, blocks_failed=0,
+                      hosts_total=65024, hosts_probed=16256, hosts_found=300)
+
+        progress = ScanJobRunner.progress(job, now=started + timedelta(seconds=30))
+
+        self.assertEqual((progress['percent'], progress['elapsed_seconds'], progress['eta_seconds']),
+                         (25.0, 30.0, 90.0))
+        self.assertFalse(progress['finished'])
+
+if __name__ == '__main__':
+    unittest.main()
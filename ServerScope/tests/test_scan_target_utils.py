@@ -0,0 +1,113 @@
+import itertools
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from flask import Flask
+from app.models import db, ScanTarget, ScanJob, NetworkScanResult
+from app.network_scan_utils import NetworkScanner
+from app.scan_target_utils import ScanTargetScheduler
+
+class FakeEngine:
+    """Discovery engine reporting the addresses in up as up."""
+
+    def __init__(self, up):
+        self.up = up
+
+    def scan(self, addresses):
+        return [{'ip': address, 'hostname': "Unknown", 'status': 'up'} for address in addresses if address in self.up]
+
+class TestScanTargetUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database shared with the job threads."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.engine = FakeEngine({"10.0.0.1", "10.0.0.2"})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def scheduler(self, max_concurrency=2):
+        return ScanTargetScheduler(max_concurrency=max_concurrency, app=self.app, scanner_factory=lambda network_range:
+                                   NetworkScanner(network_range, max_workers=1, engine=self.engine))
+
+    def test_adapt_follows_churn_within_bounds(self):
+        """Test that churn shortens the interval, stability lengthens it, and both are bounded."""
+        target = ScanTarget(name="lab", network_range="10.0.0.0/24", interval=3600, current_interval=3600)
+
+        self.assertEqual(ScanTargetScheduler.adapt(target, 0.5), 1800)
+        self.assertEqual(ScanTargetScheduler.adapt(target, 0.5), 900)
+        self.assertEqual(ScanTargetScheduler.adapt(target, 0.5), 900)  # floor: interval / 4
+        for _ in range(20):
+            ScanTargetScheduler.adapt(target, 0.0)
+        self.assertEqual(target.current_interval, 8 * 3600)  # ceiling: interval * 8
+        self.assertLess(target.churn, 0.01)
+
+    def test_churn(self):
+        """Test the churn of a scan relative to the hosts up in the range."""
+        comparison = {'hosts_added': 3, 'hosts_removed': 2, 'hosts_changed': 1, 'hosts_up': 98}
+
+        self.assertAlmostEqual(ScanTargetScheduler.churn(comparison), 6 / 100)
+        self.assertIsNone(ScanTargetScheduler.churn({'hosts_up': None}))
+
+    def test_tick_runs_due_targets_with_bounded_concurrency(self):
+        """Test that only due targets are queued, at most max_concurrency at a time."""
+        scheduler = self.scheduler(max_concurrency=1)
+        job_ids = itertools.count(1)
+        scheduler.runner.submit = MagicMock(side_effect=lambda *args, **kwargs: MagicMock(id=next(job_ids)))
+        first = ScanTargetScheduler.add_target("a", "10.0.0.0/30", 3600)
+        ScanTargetScheduler.add_target("b", "10.0.1.0/30", 3600)
+        later = ScanTargetScheduler.add_target("c", "10.0.2.0/30", 3600)
+        later.next_run_at = datetime.utcnow() + timedelta(hours=1)
+        db.session.commit()
+
+        self.assertEqual(len(scheduler.tick()['dispatched']), 1)
+        self.assertEqual(scheduler.tick(), {'dispatched': [], 'in_flight': 1})
+        self.assertEqual(scheduler.runner.submit.call_args.kwargs['target_id'], first.id)
+
+    def test_tick_outside_app_context(self):
+        """Test that a scheduler given the app ticks from a thread with no app context."""
+        scheduler = self.scheduler()
+        scheduler.runner.submit = MagicMock(side_effect=lambda *args, **kwargs: MagicMock(id=1))
+        ScanTargetScheduler.add_target("a", "10.0.0.0/30", 3600)
+        ticks = []
+
+        thread = threading.Thread(target=lambda: ticks.append(scheduler.tick()))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(ticks, [{'dispatched': [1], 'in_flight': 1}])
+        self.assertIs(scheduler.runner.submit.call_args.kwargs['app'], self.app)
+
+    def test_scheduled_runs_record_duration_and_adapt(self):
+        """Test that finished runs are recorded on the target and a stable range backs off."""
+        scheduler = self.scheduler()
+        target = ScanTargetScheduler.add_target("lab", "10.0.0.0/29", 600)
+
+        tick = scheduler.tick()
+        scheduler.wait(tick['dispatched'], timeout=10)
+        db.session.expire_all()
+        target = db.session.get(ScanTarget, target.id)
+        job = db.session.get(ScanJob, tick['dispatched'][0])
+        self.assertEqual((job.target_id, target.last_status, target.current_interval), (target.id, 'completed', 600))
+        self.assertEqual(target.next_run_at, job.started_at + timedelta(seconds=600))
+        self.assertIsNotNone(target.last_duration)
+        self.assertEqual(db.session.get(NetworkScanResult, target.last_report_id).duration, target.last_duration)
+        self.assertEqual(scheduler.tick()['dispatched'], [])
+
+        tick = scheduler.tick(target.next_run_at + timedelta(seconds=1))
+        scheduler.wait(tick['dispatched'], timeout=10)
+        db.session.expire_all()
+        target = db.session.get(ScanTarget, target.id)
+        self.assertEqual((target.churn, target.current_interval), (0.0, 900))
+
+if __name__ == '__main__':
+    unittest.main()
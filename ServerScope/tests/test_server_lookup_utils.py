@@ -0,0 +1,104 @@
+import os
+import unittest
+import importlib.util
+from datetime import datetime
+from unittest.mock import patch
+from flask import Flask
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Server, Job, Tag, server_tags
+from app.server_lookup_utils import ServerLookup
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions', '4f1c2a9b7d30_dedupe_servers_by_ip.py')
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('dedupe_servers_by_ip', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_server(ip, name=None, username="user", **kwargs):
+    return Server(name=name or f"host-{ip}", ip_address=ip, username=username, password="password",
+                  os_type="Linux", **kwargs)
+
+class TestServerLookupUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def count_queries(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        return statements
+
+    def test_by_ips_resolves_batch_in_chunked_queries(self):
+        """Test that a batch of IPs is resolved with one query per chunk."""
+        db.session.add_all([make_server(f"10.0.0.{i}") for i in range(1, 11)])
+        db.session.commit()
+        statements = self.count_queries()
+
+        with patch('app.server_lookup_utils.INGEST_CHUNK_SIZE', 4):
+            servers = ServerLookup.by_ips([f"10.0.0.{i}" for i in range(1, 13)] + [" 10.0.0.1 "])
+
+        self.assertEqual(sorted(servers), sorted(f"10.0.0.{i}" for i in range(1, 11)))
+        self.assertEqual(len(statements), 3)
+
+    def test_find_by_ip_or_hostname(self):
+        """Test that find accepts either an IP address or a hostname."""
+        db.session.add(make_server("10.0.0.1", name="web1"))
+        db.session.commit()
+
+        self.assertEqual(ServerLookup.find(" 10.0.0.1").name, "web1")
+        self.assertEqual(ServerLookup.find("web1").ip_address, "10.0.0.1")
+        self.assertIsNone(ServerLookup.find("db1"))
+        self.assertEqual(list(ServerLookup.by_names(["web1", "db1"])), ["web1"])
+
+    def test_ip_address_is_unique(self):
+        """Test that a second server with the same IP address is rejected."""
+        db.session.add(make_server("10.0.0.1"))
+        db.session.commit()
+        db.session.add(make_server("10.0.0.1", name="duplicate"))
+
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_migration_merges_duplicates(self):
+        """Test that the dedupe migration keeps one server per IP and moves its children."""
+        db.session.execute(text("DROP INDEX ix_servers_ip_address"))
+        scanned = make_server("10.0.0.1", name="scanned", username="unknown", status='up')
+        real = make_server("10.0.0.1", name="web1", last_health_check=datetime(2024, 5, 1))
+        other = make_server("10.0.0.2")
+        tag = Tag(name="prod")
+        db.session.add_all([scanned, real, other, tag])
+        db.session.commit()
+        db.session.add(Job(job_type='backup', server_id=scanned.id, status='Pending', schedule_time=datetime(2024, 5, 2)))
+        db.session.execute(server_tags.insert(), [{'server_id': scanned.id, 'tag_id': tag.id},
+                                                  {'server_id': real.id, 'tag_id': tag.id}])
+        db.session.commit()
+
+        with db.engine.begin() as connection:
+            deleted = load_migration().merge_duplicate_servers(connection)
+
+        db.session.expire_all()
+        self.assertEqual(deleted, 1)
+        survivor = Server.query.filter_by(ip_address="10.0.0.1").one()
+        self.assertEqual((survivor.name, survivor.status), ("web1", 'up'))
+        self.assertEqual(Job.query.one().server_id, survivor.id)
+        self.assertEqual(db.session.execute(server_tags.select()).all(), [(survivor.id, tag.id)])
+        self.assertEqual(Server.query.count(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
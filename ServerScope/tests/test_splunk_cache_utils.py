@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch
+from app.splunk_cache_utils import SplunkQueryCache, normalize_query, resolve_time
+
+NOW = 1_700_000_000  # a multiple of 300 plus 200 seconds
+
+class FakeSplunk:
+    """Search function returning one event per minute that falls inside earliest/latest."""
+
+    def __init__(self, now):
+        self.now = now
+        self.calls = []
+
+    def __call__(self, query, earliest, latest):
+        self.calls.append((query, earliest, latest))
+        start = float(earliest)
+        end = self.now if latest == 'now' else float(latest)
+        moment = int(end // 60 * 60)
+        if moment == end:
+            moment -= 60
+        while moment >= start:
+            yield {'_time': moment, '_raw': f"{query} at {moment}"}
+            moment -= 60
+
+class TestSplunkCacheUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SplunkQueryCache(bucket_seconds=300, bucket_ttl=3600, partial_ttl=30, settle_seconds=60)
+        self.splunk = FakeSplunk(NOW)
+
+    def test_resolve_and_normalize(self):
+        """Test the relative times the cache understands and the query key."""
+        self.assertEqual(resolve_time("-24h", NOW), NOW - 86400)
+        self.assertEqual(resolve_time("now", NOW), NOW)
+        self.assertEqual(resolve_time("1699990000", NOW), 1699990000)
+        self.assertIsNone(resolve_time("-1d@d", NOW))
+        self.assertEqual(normalize_query("  error   OR warn "), "search error OR warn")
+
+    def test_repeat_view_fetches_only_partial_bucket(self):
+        """Test that a second view reuses the completed buckets and searches only the newest one."""
+        cache = SplunkQueryCache(bucket_seconds=300, bucket_ttl=3600, partial_ttl=0, settle_seconds=60)
+        first = list(cache.search(self.splunk, "error", "-1h", "now", now=NOW))
+        self.assertEqual(len(self.splunk.calls), 2)  # the partial piece, then all completed buckets at once
+
+        self.splunk.calls.clear()
+        self.splunk.now = NOW + 40
+        second = list(cache.search(self.splunk, "error", "-1h", "now", now=NOW + 40))
+
+        self.assertEqual(len(self.splunk.calls), 1)
+        self.assertEqual(self.splunk.calls[0][2], 'now')
+        self.assertEqual(second, first)
+        times = [event['_time'] for event in second]
+        self.assertEqual(times, sorted(times, reverse=True))
+        self.assertEqual(times[-1], (NOW - 3600) // 300 * 300)  # the window start is aligned down
+
+    def test_fresh_partial_bucket_is_reused(self):
+        """Test that a view within partial_ttl does not search at all."""
+        list(self.cache.search(self.splunk, "error", "-1h", "now", now=NOW))
+        self.splunk.calls.clear()
+
+        list(self.cache.search(self.splunk, "search   error", "-1h", "now", now=NOW))
+
+        self.assertEqual(self.splunk.calls, [])
+        self.assertGreater(self.cache.stats()['hits'], 0)
+
+    def test_moving_window_searches_new_buckets_only(self):
+        """Test that after time moves past a bucket boundary only the gap is searched."""
+        list(self.cache.search(self.splunk, "error", "-1h", "now", now=NOW))
+        self.splunk.calls.clear()
+        later = NOW + 600
+        self.splunk.now = later
+
+        events = list(self.cache.search(self.splunk, "error", "-1h", "now", now=later))
+
+        self.assertEqual(len(self.splunk.calls), 2)  # the new partial piece and the buckets it left behind
+        self.assertEqual(len(events), len({event['_time'] for event in events}))
+
+    def test_piped_query_is_cached_whole(self):
+        """Test that a transforming search is cached as one entry for partial_ttl."""
+        calls = []
+
+        def fetch(query, earliest, latest):
+            calls.append((query, earliest, latest))
+            yield {'count': "12"}
+
+        self.assertEqual(list(self.cache.search(fetch, "error | stats count", "-1h", "now", now=NOW)), [{'count': "12"}])
+        list(self.cache.search(fetch, "error | stats count", "-1h", "now", now=NOW))
+        list(self.cache.search(fetch, "error", "-1d@d", "now", now=NOW))  # snapped times are not split either
+
+        self.assertEqual(calls, [("search error | stats count", "-1h", "now"), ("search error", "-1d@d", "now")])
+        with patch('app.splunk_cache_utils.time.monotonic', return_value=1e9):
+            list(self.cache.search(fetch, "error | stats count", "-1h", "now", now=NOW))
+        self.assertEqual(len(calls), 3)
+
+    def test_size_limits_evict_least_recently_used(self):
+        """Test that entries beyond max_entries or max_events are evicted, oldest first."""
+        cache = SplunkQueryCache(bucket_seconds=300, bucket_ttl=3600, partial_ttl=30, settle_seconds=60,
+                                 max_entries=4, max_events=1000)
+        list(cache.search(self.splunk, "error", "-1h", "now", now=NOW))
+
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 4)
+        self.assertGreater(stats['evictions'], 0)
+
+        small = SplunkQueryCache(bucket_seconds=300, bucket_ttl=3600, partial_ttl=30, settle_seconds=60, max_events=10)
+        events = list(small.search(self.splunk, "error", "-1h", "now", now=NOW))
+        self.assertEqual(len(events), 64)
+        self.assertLessEqual(small.stats()['events'], 10)
+
+    def test_large_search_stops_buffering(self):
+        """Test that a search returning more than max_search_events streams through uncached."""
+        cache = SplunkQueryCache(bucket_seconds=300, bucket_ttl=3600, partial_ttl=30, settle_seconds=60,
+                                 max_search_events=20)
+        events = list(cache.search(self.splunk, "error", "-1h", "now", now=NOW))
+        self.assertEqual(len(events), 64)
+        stats = cache.stats()
+        self.assertEqual(stats['uncached'], 1)
+        self.assertLessEqual(stats['events'], 20)
+
+        piped = list(cache.search(self.splunk, "error | stats count", str(NOW - 7200), "now", now=NOW))
+        self.assertEqual(len(piped), 120)
+        self.assertEqual(cache.stats()['uncached'], 2)
+
+    def test_results_without_time_are_not_cached(self):
+        """Test that results the cache cannot place in a bucket are passed through uncached."""
+        def fetch(query, earliest, latest):
+            yield {'_raw': "no time"}
+
+        self.assertEqual(list(self.cache.search(fetch, "error", "-1h", "now", now=NOW)), [{'_raw': "no time"}] * 2)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import json
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from app.splunk_utils import SplunkUtils, SplunkSearchError
+
+class FakeSplunk(BaseHTTPRequestHandler):
+    """Stand-in for the Splunk search REST API, serving server.events from one search job."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _form(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+
+    def do_POST(self):
+        state = self.server.state
+        form = self._form()
+        path = urlparse(self.path).path
+        state['requests'].append(('POST', path, form))
+        if path == '/services/search/jobs':
+            self._send({'sid': 'job1'}, 201)
+        elif path == '/services/search/jobs/job1/control':
+            state['cancelled'] = True
+            self._send({'messages': []})
+        elif path == '/services/search/jobs/export':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'preview': True, 'result': {'_raw': 'partial'}}).encode() + b"\n")
+            for event in self.server.events:
+                self.wfile.write(json.dumps({'preview': False, 'result': event}).encode() + b"\n")
+        else:
+            self._send({'messages': [{'type': 'ERROR', 'text': 'Not found'}]}, 404)
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        state['requests'].append(('GET', url.path, params))
+        if url.path == '/services/search/jobs/job1':
+            state['polls'] += 1
+            done = state['polls'] > state['polls_until_done']
+            content = {'dispatchState': 'DONE' if done else 'RUNNING', 'isDone': done,
+                       'isFailed': state['failed'], 'resultCount': len(self.server.events),
+                       'messages': [{'type': 'FATAL', 'text': 'Unknown search command'}] if state['failed'] else []}
+            self._send({'entry': [{'name': 'job1', 'content': content}]})
+        elif url.path == '/services/search/jobs/job1/results':
+            offset, count = int(params['offset']), int(params['count'])
+            state['pages'] += 1
+            self._send({'results': self.server.events[offset:offset + count]})
+        else:
+            self._send({'messages': [{'type': 'ERROR', 'text': 'Not found'}]}, 404)
+
+class TestSplunkUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Start the stand-in Splunk on a free local port."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSplunk)
+        self.server.events = [{'_raw': f"event {i}", 'host': f"web{i % 3}"} for i in range(2500)]
+        self.server.state = {'requests': [], 'polls': 0, 'polls_until_done': 2, 'failed': False,
+                             'pages': 0, 'cancelled': False}
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        config = {'server_url': f"http://127.0.0.1:{self.server.server_address[1]}", 'auth_token': "token"}
+        self.splunk = SplunkUtils(config=config, page_size=1000, poll_interval=0.01, poll_max_interval=0.02,
+                                   cache=None)  # the stand-in ignores time ranges
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_search_polls_job_and_pages_results(self):
+        """Test that the job is polled until done and its results are read in count/offset pages."""
+        results = self.splunk.search("error OR warn", earliest="-1h")
+
+        self.assertEqual(self.server.state['requests'], [])  # nothing runs until the results are read
+        events = list(results)
+
+        self.assertEqual(len(events), 2500)
+        self.assertEqual(events[1000]['_raw'], "event 1000")
+        self.assertEqual(self.server.state['polls'], 3)
+        self.assertEqual(self.server.state['pages'], 3)
+        method, path, form = self.server.state['requests'][0]
+        self.assertEqual((method, path), ('POST', '/services/search/jobs'))
+        self.assertEqual((form['search'], form['earliest_time']), ("search error OR warn", "-1h"))
+        offsets = [params['offset'] for method, path, params in self.server.state['requests'] if path.endswith('/results')]
+        self.assertEqual(offsets, ['0', '1000', '2000'])
+
+    def test_stopping_early_cancels_the_job(self):
+        """Test that a consumer reading only part of the results does not fetch the other pages."""
+        results = self.splunk.search("| tstats count")
+        first = [next(results) for _ in range(10)]
+        results.close()
+
+        self.assertEqual(len(first), 10)
+        self.assertEqual(self.server.state['pages'], 1)
+        self.assertTrue(self.server.state['cancelled'])
+        self.assertEqual(self.server.state['requests'][0][2]['search'], "| tstats count")
+
+    def test_failed_job_raises(self):
+        """Test that a failed job raises with Splunk's message."""
+        self.server.state['failed'] = True
+
+        with self.assertRaises(SplunkSearchError) as error:
+            list(self.splunk.search("bad | command"))
+        self.assertIn("Unknown search command", str(error.exception))
+
+    def test_job_creation_failure_raises(self):
+        """Test that a search job Splunk refuses to create raises SplunkSearchError."""
+        self.splunk.config['server_url'] += "/missing"
+
+        with self.assertRaises(SplunkSearchError) as error:
+            self.splunk.create_search_job("index=main")
+        self.assertIn("Failed to create Splunk search job", str(error.exception))
+
+    def test_slow_job_is_cancelled(self):
+        """Test that a job still running after job_timeout is cancelled."""
+        self.server.state['polls_until_done'] = 10 ** 6
+        self.splunk.job_timeout = 0.1
+
+        with self.assertRaises(SplunkSearchError):
+            list(self.splunk.search("index=main"))
+        self.assertTrue(self.server.state['cancelled'])
+
+    def test_export_streams_final_results(self):
+        """Test that the export endpoint is read line by line, skipping previews."""
+        events = list(self.splunk.export_search("index=main"))
+
+        self.assertEqual(len(events), 2500)
+        self.assertEqual(events[0]['_raw'], "event 0")
+
+    def test_analyze_logs_consumes_stream(self):
+        """Test that the existing analysis reads the paged results."""
+        summary = self.splunk.analyze_logs("*")
+
+        self.assertEqual(summary['counts'], {'errors': 0, 'warnings': 0, 'info': 2500})
+        self.assertEqual(summary['hosts']['web0']['info'], 834)
+        self.assertEqual(len(summary['info']), 100)
+
+if __name__ == '__main__':
+    unittest.main()
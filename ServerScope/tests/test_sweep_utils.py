@@ -0,0 +1,185 @@
+import time
+import asyncio
+import threading
+import unittest
+from datetime import datetime
+from flask import Flask
+from app.models import db, Server
+from app.sweep_utils import HealthSweeper
+from app.timeseries_utils import HealthStore
+from app.async_command_utils import SyncCommandExecutor
+
+def make_health(status='Healthy'):
+    return {'collected_at': datetime.utcnow(), 'status': status, 'cpu_percent': 10.0, 'load_1': 0.1,
+            'mem_used_percent': 20.0, 'swap_used_percent': 0.0, 'disk_max_used_percent': 30.0,
+            'inode_max_used_percent': 1.0}
+
+class FakeAsyncExecutor:
+    """Stands in for AsyncCommandExecutor; one host fails, the rest are healthy."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_server_health(self, server_ip, username, password, os_type='Linux', timeout=None):
+        self.calls.append((server_ip, os_type, timeout))
+        await asyncio.sleep(0.01)
+        if server_ip == '10.0.0.0':
+            raise RuntimeError("boom")
+        return make_health()
+
+    async def evict_idle(self):
+        pass
+
+    async def close(self):
+        pass
+
+class TestSweepUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with twelve servers."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        for i in range(12):
+            db.session.add(Server(name=f"server{i}", ip_address=f"10.0.0.{i}", username="user",
+                                  password="password", os_type="Linux"))
+        db.session.commit()
+        self.store = HealthStore(batch_size=1000, flush_interval=3600)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def wait_idle(self, sweeper):
+        deadline = time.monotonic() + 5
+        while sweeper.stats()['in_flight'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_each_tick_checks_one_slot(self):
+        """Test that the fleet is split evenly across slots and every server is covered once."""
+        seen = []
+        sweeper = HealthSweeper(interval=60, slots=4, max_concurrency=4, store=self.store,
+                                check=lambda target, timeout: seen.append(target['id']) or make_health())
+        try:
+            ticks = [sweeper.tick() for _ in range(4)]
+            self.wait_idle(sweeper)
+        finally:
+            sweeper.shutdown()
+
+        self.assertEqual([tick['hosts'] for tick in ticks], [3, 3, 3, 3])
+        self.assertEqual(sorted(seen), list(range(1, 13)))
+        self.assertEqual(sweeper.stats()['last_sweep']['hosts'], 12)
+
+    def test_tick_outside_app_context(self):
+        """Test that a sweeper given the app ticks from a scheduler thread with no app context."""
+        seen = []
+        errors = []
+        sweeper = HealthSweeper(interval=60, slots=1, max_concurrency=4, store=self.store, app=self.app,
+                                check=lambda target, timeout: seen.append(target['id']) or make_health())
+
+        def tick():
+            try:
+                sweeper.tick()
+            except Exception as e:
+                errors.append(e)
+
+        try:
+            thread = threading.Thread(target=tick)
+            thread.start()
+            thread.join()
+            self.wait_idle(sweeper)
+        finally:
+            sweeper.shutdown()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(seen), 12)
+
+    def test_concurrency_is_capped(self):
+        """Test that no more than max_concurrency checks run at once."""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def check(target, timeout):
+            with lock:
+                running.append(target['id'])
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(target['id'])
+            return make_health()
+
+        sweeper = HealthSweeper(interval=60, slots=1, max_concurrency=3, store=self.store, check=check)
+        try:
+            sweeper.tick()
+            self.wait_idle(sweeper)
+        finally:
+            sweeper.shutdown()
+
+        self.assertEqual(len(peak), 12)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_in_flight_hosts_are_skipped(self):
+        """Test that a host still being checked is not dispatched again."""
+        release = threading.Event()
+        sweeper = HealthSweeper(interval=60, slots=1, max_concurrency=12, store=self.store,
+                                check=lambda target, timeout: release.wait(5) and make_health())
+        try:
+            sweeper.tick()
+            second = sweeper.tick()
+            release.set()
+            self.wait_idle(sweeper)
+        finally:
+            sweeper.shutdown()
+
+        self.assertEqual(second['dispatched'], 0)
+        self.assertEqual(second['skipped_in_flight'], 12)
+        self.assertEqual(sweeper.stats()['skipped_in_flight'], 12)
+
+    def test_results_are_persisted_on_next_tick(self):
+        """Test that statuses are written in bulk and critical transitions are reported once."""
+        alerts = []
+        sweeper = HealthSweeper(interval=60, slots=1, max_concurrency=4, store=self.store,
+                                check=lambda target, timeout: make_health('Critical'),
+                                on_critical=lambda target, health: alerts.append(target['id']))
+        try:
+            sweeper.tick()
+            self.wait_idle(sweeper)
+            self.assertEqual(sweeper.persist_results(), 12)
+            sweeper.tick()
+            self.wait_idle(sweeper)
+            sweeper.persist_results()
+        finally:
+            sweeper.shutdown()
+
+        self.assertEqual({server.status for server in Server.query.all()}, {'Critical'})
+        self.assertEqual(len(alerts), 12)
+        self.assertEqual(self.store.pending_count(), 24)
+        self.assertEqual(sweeper.stats()['checked'], 24)
+
+    def test_asyncio_backend(self):
+        """Test that the asyncio backend checks the slot on the event loop and records every host."""
+        fake = FakeAsyncExecutor()
+        executor = SyncCommandExecutor(executor=fake)
+        sweeper = HealthSweeper(interval=60, slots=1, timeout=7, store=self.store,
+                                backend='asyncio', async_executor=executor)
+        try:
+            sweeper.tick()
+            self.wait_idle(sweeper)
+            self.assertEqual(sweeper.persist_results(), 12)
+        finally:
+            sweeper.shutdown()
+            executor.close()
+
+        self.assertEqual(len(fake.calls), 12)
+        self.assertEqual({(os_type, timeout) for _, os_type, timeout in fake.calls}, {('Linux', 7)})
+        self.assertEqual(Server.query.filter_by(ip_address='10.0.0.0').one().status, 'Unreachable')
+        self.assertEqual(sweeper.stats()['errors'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from flask import Flask
+from app.models import db, Server, HealthSeries
+from app.timeseries_utils import HealthStore, pack_block, unpack_block, empty_block, rollup_block, RAW_RESOLUTION
+
+def make_health(collected_at, cpu, mem=50.0):
+    return {'collected_at': collected_at, 'cpu_percent': cpu, 'load_1': 0.5, 'mem_used_percent': mem,
+            'swap_used_percent': 0.0, 'disk_max_used_percent': 40.0, 'inode_max_used_percent': 5.0}
+
+class TestTimeseriesUtils(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with one server."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        server = Server(name="web1", ip_address="10.0.0.1", username="user", password="password", os_type="Linux")
+        db.session.add(server)
+        db.session.commit()
+        self.server_id = server.id
+        self.store = HealthStore(batch_size=1000, flush_interval=3600)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_block_round_trip(self):
+        """Test that blocks survive compression."""
+        block = empty_block(RAW_RESOLUTION)
+        block[10] = 1234
+        self.assertEqual(unpack_block(pack_block(block)), block)
+
+    def test_flush_batches_one_row_per_day_and_resolution(self):
+        """Test that a day of samples becomes one raw row plus two rollup rows."""
+        start = datetime(2024, 5, 1)
+        for minute in range(120):
+            self.store.record(self.server_id, make_health(start + timedelta(minutes=minute), cpu=minute % 10))
+        self.assertEqual(self.store.pending_count(), 120)
+
+        self.assertEqual(self.store.flush(), 120)
+
+        rows = HealthSeries.query.order_by(HealthSeries.resolution).all()
+        self.assertEqual([row.resolution for row in rows], [60, 300, 3600])
+        self.assertEqual([row.sample_count for row in rows], [120, 24, 2])
+        self.assertEqual(self.store.pending_count(), 0)
+
+    def test_series_queries_raw_and_rollups(self):
+        """Test raw, averaged and maximum series over a range."""
+        start = datetime(2024, 5, 1, 12)
+        for minute in range(10):
+            self.store.record(self.server_id, make_health(start + timedelta(minutes=minute), cpu=float(minute)))
+        self.store.flush()
+        end = start + timedelta(minutes=9)
+
+        raw = HealthStore.series(self.server_id, 'cpu_percent', start, end, resolution=60)
+        self.assertEqual(len(raw), 10)
+        self.assertEqual(raw[3], (start + timedelta(minutes=3), 3.0))
+
+        avg = HealthStore.series(self.server_id, 'cpu_percent', start, end, resolution=300)
+        self.assertEqual(avg, [(start, 2.0), (start + timedelta(minutes=5), 7.0)])
+        peak = HealthStore.series(self.server_id, 'cpu_percent', start, end, resolution=3600, aggregate='max')
+        self.assertEqual(peak, [(start, 9.0)])
+
+    def test_later_flush_merges_into_existing_day(self):
+        """Test that a second batch updates the same day row."""
+        start = datetime(2024, 5, 1)
+        self.store.record(self.server_id, make_health(start, cpu=10.0))
+        self.store.flush()
+        self.store.record(self.server_id, make_health(start + timedelta(minutes=1), cpu=20.0))
+        self.store.flush()
+
+        self.assertEqual(HealthSeries.query.filter_by(resolution=60).count(), 1)
+        series = HealthStore.series(self.server_id, 'cpu_percent', start, start + timedelta(hours=1), resolution=60)
+        self.assertEqual([value for _, value in series], [10.0, 20.0])
+
+    def test_incremental_rollups_match_a_full_rebuild(self):
+        """Test that rollups updated flush by flush equal rollups rebuilt from the whole raw day."""
+        start = datetime(2024, 5, 1, 9, 58)
+        for batch in range(3):
+            for minute in range(batch * 7, batch * 7 + 7):
+                self.store.record(self.server_id, make_health(start + timedelta(minutes=minute), cpu=float(minute)))
+            self.store.flush()
+
+        rows = {row.resolution: row for row in HealthSeries.query.all()}
+        raw = unpack_block(rows[60].data)
+        self.assertEqual(rows[60].sample_count, 21)
+        for resolution in (300, 3600):
+            block, filled = rollup_block(raw, resolution)
+            self.assertEqual(unpack_block(rows[resolution].data), block)
+            self.assertEqual(rows[resolution].sample_count, filled)
+
+    def test_pending_samples_are_capped_when_flushes_fail(self):
+        """Test that a failing database cannot grow the buffer past max_pending."""
+        store = HealthStore(batch_size=1000, flush_interval=3600, max_pending=5)
+        start = datetime(2024, 5, 1)
+        for minute in range(4):
+            store.record(self.server_id, make_health(start + timedelta(minutes=minute), cpu=1.0))
+
+        with patch.object(db.session, 'commit', side_effect=RuntimeError("database is down")):
+            with self.assertRaises(RuntimeError):
+                store.flush()
+        self.assertEqual(store.pending_count(), 4)
+
+        for minute in range(4, 8):
+            store.record(self.server_id, make_health(start + timedelta(minutes=minute), cpu=1.0))
+        self.assertEqual(store.pending_count(), 5)
+        self.assertEqual(store.dropped, 3)
+
+        self.assertEqual(store.flush(), 5)
+        series = HealthStore.series(self.server_id, 'cpu_percent', start, start + timedelta(hours=1), resolution=60)
+        self.assertEqual([timestamp.minute for timestamp, _ in series], [3, 4, 5, 6, 7])
+
+    def test_unreachable_records_are_skipped(self):
+        """Test that records without metrics are not stored."""
+        self.assertFalse(self.store.record(self.server_id, {'collected_at': datetime.utcnow(), 'cpu_percent': None}))
+        self.assertEqual(self.store.pending_count(), 0)
+
+    def test_retention_removes_expired_rows(self):
+        """Test that raw rows expire before rollups."""
+        now = datetime(2024, 6, 15)
+        self.store.record(self.server_id, make_health(now - timedelta(days=40), cpu=10.0))
+        self.store.record(self.server_id, make_health(now - timedelta(days=1), cpu=10.0))
+        self.store.flush()
+
+        deleted = HealthStore.apply_retention(now=now)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(HealthSeries.query.filter_by(resolution=60).count(), 1)
+        self.assertEqual(HealthSeries.query.filter_by(resolution=300).count(), 2)
+
+if __name__ == '__main__':
+    unittest.main()